@@ -1,13 +1,12 @@
 from agents import (
     Agent as OpenAIAgent,
-    ItemHelpers,
     Runner,
     function_tool,
     WebSearchTool,
 )
+from agent_framework import session_state, stream_text_deltas
 from pydantic import BaseModel, Field
 from typing import Dict, Optional
-import asyncio
 
 # Define input validation models and tools
 
@@ -95,13 +94,17 @@ class WealthWiseAI(OpenAIAgent):
             """,
             tools=[WebSearchTool(), get_financial_advice],
         )
-        self.context: Dict[str, str] = {}
         self.handlers = [
             self._handle_missing_risk_tolerance,
             self._handle_missing_income,
             self._handle_missing_goals,
         ]
 
+    @property
+    def context(self) -> Dict[str, str]:
+        # The answers collected so far belong to the current conversation
+        return session_state()
+
     async def _handle_missing_risk_tolerance(self, input_text: str) -> Optional[str]:
         if "risk_tolerance" not in self.context:
             return await ConversationHandler.handle_initial_query(self, input_text)
@@ -134,13 +137,6 @@ class Agent:
     async def stream(self, query_text: str):
         result = Runner.run_streamed(self.agent, query_text)
 
-        async for event in result.stream_events():
-            if (
-                event.type == "run_item_stream_event"
-                and event.item.type == "message_output_item"
-            ):
-                message = ItemHelpers.text_message_output(event.item)
-                # Split into words for better streaming
-                for word in message.split():
-                    yield word + " "  # Add space after each word
-                    await asyncio.sleep(0.05)  # Small delay for realistic streaming
+        # Forward tokens as the model produces them
+        async for delta in stream_text_deltas(result):
+            yield delta
@@ -1,33 +1,39 @@
 import os
 import json
 import time
-import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional, List, Any
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.auth.transport.requests import Request
-import base64
 import json
 from pydantic import BaseModel, Field
-import asyncio
 import random
 import dotenv
 import requests
 
 from agents import (
     Agent as OpenAIAgent,
-    ItemHelpers,
     Runner,
     FunctionTool,
     RunContextWrapper,
     set_default_openai_key,
 )
+from agent_framework import (
+    CredentialsCache,
+    GoogleServices,
+    authorized_user_from_env,
+    current_session,
+    lazy_import,
+    offload,
+    session_state,
+    stream_text_deltas,
+)
 from zep_cloud.client import AsyncZep
 from zep_cloud.types import Message as ZepMessage
 from zep_cloud import NotFoundError
 
+# Only the calendar tools need the Google client libraries; importing them
+# on first use keeps them off the cold start path
+google_errors = lazy_import("googleapiclient.errors")
+
 # Load environment variables
 dotenv.load_dotenv()
 
@@ -70,42 +76,10 @@ def fix_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
 
 
 # Google Calendar Tools (Unchanged from ExecuVibe)
-# def get_credentials():
-#     creds = None
-#     if os.path.exists("token.json"):
-#         creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-#     if not creds or not creds.valid:
-#         if creds and creds.expired and creds.refresh_token:
-#             creds.refresh(Request())
-#         else:
-#             flow = InstalledAppFlow.from_client_secrets_file("new-creds.json", SCOPES)
-#             creds = flow.run_local_server(port=0)
-#         with open("token.json", "w") as token:
-#             token.write(creds.to_json())
-#     return creds
-
-
-def get_credentials():
-    # Load the Base64-encoded token from the environment variable
-    token_base64 = os.environ.get("TOKEN_BASE64")
-
-    if not token_base64:
-        raise ValueError("TOKEN_BASE64 environment variable is not set.")
-
-    # Decode the Base64 string to get the token JSON
-    token_json = base64.b64decode(token_base64).decode("utf-8")
-
-    # Load the credentials from the token JSON
-    creds = Credentials.from_authorized_user_info(json.loads(token_json), SCOPES)
-
-    # Check if the credentials are valid and refresh if necessary
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            raise ValueError("Credentials are invalid and cannot be refreshed.")
-
-    return creds
+# Credentials are refreshed only when close to expiry and calendar clients are
+# reused per tool thread, instead of decoding the token and building the
+# client from a fetched discovery document on every call
+google_services = GoogleServices(CredentialsCache(authorized_user_from_env(SCOPES)))
 
 
 class CreateEventInput(BaseModel):
@@ -118,11 +92,11 @@ class CreateEventInput(BaseModel):
     )
 
 
-async def run_create_calendar_event(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_create_calendar_event(ctx: RunContextWrapper[Any], args: str) -> str:
     try:
         parsed = CreateEventInput.model_validate_json(args)
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
+        service = google_services.service("calendar", "v3")
         event_datetime = datetime.fromisoformat(parsed.start_time)
         event = {
             "summary": parsed.title,
@@ -135,7 +109,7 @@ async def run_create_calendar_event(ctx: RunContextWrapper[Any], args: str) -> s
         }
         event = service.events().insert(calendarId="primary", body=event).execute()
         return f"Locked in your '{parsed.title}'! Event ID: {event.get('id')}"
-    except HttpError as error:
+    except google_errors.HttpError as error:
         return f"Oops, hit a snag: {error}"
     except ValueError as ve:
         return f"Invalid start time. Use ISO format (e.g., 2025-06-01T08:00:00): {ve}"
@@ -157,7 +131,8 @@ class SearchWebInput(BaseModel):
     )
 
 
-async def run_search_web(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_search_web(ctx: RunContextWrapper[Any], args: str) -> str:
     try:
         parsed = SearchWebInput.model_validate_json(args)
         if not TAVILY_API_KEY:
@@ -229,7 +204,8 @@ class SaveNoteInput(BaseModel):
     )
 
 
-async def run_save_note(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_save_note(ctx: RunContextWrapper[Any], args: str) -> str:
     try:
         parsed = SaveNoteInput.model_validate_json(args)
         notes_file = "travel_notes.json"
@@ -304,28 +280,42 @@ make_suggestion_tool = FunctionTool(
 
 # AsyncZep Memory Manager (Reused from ExecuVibe)
 class AsyncZepMemoryManager:
-    def __init__(self, session_id: Optional[str] = None, user_id: Optional[str] = None):
-        self.session_id = session_id or str(uuid.uuid4())
-        self.user_id = user_id or f"user-{str(uuid.uuid4())[:8]}"
-        self.zep_client: AsyncZep | None = None
-
-    async def initialize(self):
-        if not ZEP_API_KEY:
-            print("ZEP_API_KEY not set. Memory disabled.")
+    """Zep memory shared by every conversation; the Zep session id of the
+    current one is kept in its session state"""
+
+    def __init__(self, zep_client: Optional[AsyncZep] = None):
+        self.zep_client = zep_client
+
+    @property
+    def session_id(self) -> Optional[str]:
+        return session_state().get("zep_session_id")
+
+    @property
+    def user_id(self) -> Optional[str]:
+        session = current_session()
+        return session.user_id if session is not None else None
+
+    async def start_session(self, session) -> None:
+        # Anonymous conversations get no Zep user or session; a restored
+        # conversation keeps the one it already has
+        if (
+            not self.zep_client
+            or session.user_id is None
+            or "zep_session_id" in session.state
+        ):
             return
-        self.zep_client = AsyncZep(api_key=ZEP_API_KEY)
         try:
-            await self.zep_client.user.get(self.user_id)
+            await self.zep_client.user.get(session.user_id)
         except NotFoundError:
-            await self.zep_client.user.add(user_id=self.user_id)
-        timestamp = int(time.time())
-        self.session_id = f"{self.session_id}-{timestamp}"
+            await self.zep_client.user.add(user_id=session.user_id)
+        session_id = f"travel-session-{session.id}-{int(time.time())}"
         await self.zep_client.memory.add_session(
-            session_id=self.session_id, user_id=self.user_id
+            session_id=session_id, user_id=session.user_id
         )
+        session.state["zep_session_id"] = session_id
 
     async def add_message(self, message: dict) -> None:
-        if not self.zep_client:
+        if not self.zep_client or not self.session_id:
             return
         role = message.get("role", "assistant")
         zep_message = ZepMessage(
@@ -338,6 +328,8 @@ class AsyncZepMemoryManager:
     async def get_memory(self) -> str:
         if not self.zep_client:
             return "Memory disabled: ZEP_API_KEY not set."
+        if not self.session_id:
+            return "No travel history yet."
         try:
             memory = await self.zep_client.memory.get(session_id=self.session_id)
             return memory.context if memory.context else "No travel history yet."
@@ -345,7 +337,7 @@ class AsyncZepMemoryManager:
             return "No travel history yet."
 
     async def search_memory(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        if not self.zep_client:
+        if not self.zep_client or not self.user_id:
             return []
         try:
             search_response = await self.zep_client.graph.search(
@@ -386,16 +378,33 @@ class ConversationHandler:
             return f"Here's your trip plan for {context['destination']}:\n{result.final_output}\nWanna save this as a note or schedule a flight?"
 
 
+SYSTEM_PROMPT = """
+        You're WanderlustWhisperer, a travel-loving AI with a chill, adventurous vibe. Your mission is to vibe with users, have fun conversations, and help with epic vacation plans when asked. You can:
+        - Plan trips based on user preferences (destination, dates, vibe).
+        - Research places using web search (attractions, weather, culture).
+        - Suggest cool, off-the-beaten-path spots.
+        - Schedule trip events on Google Calendar.
+        - Save travel notes or itineraries.
+        - Recall user travel preferences with search_memory.
+
+        Handle inputs with a fun, engaging tone:
+        - **Greetings**: For 'hi', 'hey', 'yo', respond playfully like "Yo, wanderer! What's the vibe today—chillin' or dreaming of new horizons?" and keep it open-ended for casual chat.
+        - **Casual Replies**: For vague or conversational inputs like 'yeah', 'cool', 'what’s good', reply with chill banter like "Hella chill, my guy! What's sparking your mood?" to keep the convo flowing.
+        - **Commands**: For 'plan a trip', 'research', 'suggest', 'schedule', 'note', or 'memory', trigger the right tool or ask follow-up questions one at a time.
+        - **Vague Inputs**: Keep it conversational, suggesting travel ideas or banter lightly (e.g., "Yo, you vibing or got a place in mind?").
+        - **Memory**: Use search_memory to recall preferences (e.g., loves beaches). For 'memory', show travel history. Ask about favorite destinations to build their profile.
+        - **Errors**: Stay friendly, like "Whoops, let’s try that again! What’s up?"
+
+        Keep responses short, cool, and user-driven. Use ISO format for dates (e.g., 2025-06-01T08:00:00). Personalize with memory context, but don’t force travel planning unless asked.
+        """
+
+
 # WanderlustWhisperer Agent
 class WanderlustWhisperer:
-    def __init__(self, session_id: Optional[str] = None, user_id: Optional[str] = None):
-        self.memory_manager = AsyncZepMemoryManager(session_id, user_id)
-        self.agent = None
-        self.context: Dict[str, Dict] = {}
+    """The travel agent and its tools, shared by every conversation"""
 
-    async def initialize(self):
-        await self.memory_manager.initialize()
-        memory_context = await self.memory_manager.get_memory()
+    def __init__(self, zep_client: Optional[AsyncZep] = None):
+        self.memory_manager = AsyncZepMemoryManager(zep_client)
 
         class SearchMemoryInput(BaseModel):
             query: str = Field(
@@ -419,29 +428,9 @@ class WanderlustWhisperer:
             on_invoke_tool=run_search_memory,
         )
 
-        SYSTEM_PROMPT = """
-        You're WanderlustWhisperer, a travel-loving AI with a chill, adventurous vibe. Your mission is to vibe with users, have fun conversations, and help with epic vacation plans when asked. You can:
-        - Plan trips based on user preferences (destination, dates, vibe).
-        - Research places using web search (attractions, weather, culture).
-        - Suggest cool, off-the-beaten-path spots.
-        - Schedule trip events on Google Calendar.
-        - Save travel notes or itineraries.
-        - Recall user travel preferences with search_memory.
-
-        Handle inputs with a fun, engaging tone:
-        - **Greetings**: For 'hi', 'hey', 'yo', respond playfully like "Yo, wanderer! What's the vibe today—chillin' or dreaming of new horizons?" and keep it open-ended for casual chat.
-        - **Casual Replies**: For vague or conversational inputs like 'yeah', 'cool', 'what’s good', reply with chill banter like "Hella chill, my guy! What's sparking your mood?" to keep the convo flowing.
-        - **Commands**: For 'plan a trip', 'research', 'suggest', 'schedule', 'note', or 'memory', trigger the right tool or ask follow-up questions one at a time.
-        - **Vague Inputs**: Keep it conversational, suggesting travel ideas or banter lightly (e.g., "Yo, you vibing or got a place in mind?").
-        - **Memory**: Use search_memory to recall preferences (e.g., loves beaches). For 'memory', show travel history. Ask about favorite destinations to build their profile.
-        - **Errors**: Stay friendly, like "Whoops, let’s try that again! What’s up?"
-
-        Keep responses short, cool, and user-driven. Use ISO format for dates (e.g., 2025-06-01T08:00:00). Personalize with memory context, but don’t force travel planning unless asked.
-        """
-
         self.agent = OpenAIAgent(
             name="WanderlustWhisperer",
-            instructions=SYSTEM_PROMPT + "\n" + f"Memory Context: {memory_context}",
+            instructions=self._instructions,
             tools=[
                 create_calendar_event_tool,
                 search_web_tool,
@@ -459,6 +448,18 @@ class WanderlustWhisperer:
             self._handle_save_note,
         ]
 
+    @property
+    def context(self) -> Dict[str, Dict]:
+        # Trip and note steps are stored with the session, so any replica
+        # can pick the conversation up
+        return session_state().setdefault("context", {})
+
+    @staticmethod
+    def _instructions(ctx: RunContextWrapper[Any], agent: OpenAIAgent) -> str:
+        # The agent is shared, so each run brings its conversation's memory
+        memory_context = (ctx.context or {}).get("memory", "No travel history yet.")
+        return SYSTEM_PROMPT + "\n" + f"Memory Context: {memory_context}"
+
     async def _handle_memory(self, input_text: str) -> Optional[str]:
         if input_text.lower() == "memory":
             memory_context = await self.memory_manager.get_memory()
@@ -552,35 +553,30 @@ class WanderlustWhisperer:
     async def stream(self, query_text: str):
         await self.memory_manager.add_message({"role": "user", "content": query_text})
         memory_context = await self.memory_manager.get_memory()
-        self.agent.instructions = (
-            self.agent.instructions.split("Memory Context:")[0].strip()
-            + "\n"
-            + f"Memory Context: {memory_context}"
+        result = Runner.run_streamed(
+            self.agent, query_text, context={"memory": memory_context}
         )
-        result = Runner.run_streamed(self.agent, query_text)
-        async for event in result.stream_events():
-            if (
-                event.type == "run_item_stream_event"
-                and event.item.type == "message_output_item"
-            ):
-                message = ItemHelpers.text_message_output(event.item)
-                for word in message.split():
-                    yield word + " "
-                    await asyncio.sleep(0.05)
-                await self.memory_manager.add_message(
-                    {"role": "assistant", "content": message}
-                )
+        async for delta in stream_text_deltas(result, on_message=self._remember_reply):
+            yield delta
+
+    async def _remember_reply(self, message: str):
+        await self.memory_manager.add_message({"role": "assistant", "content": message})
 
 
 class Agent:
-    def __init__(self):
-        session_id = f"travel-session-{int(time.time())}"
-        self.agent = WanderlustWhisperer(session_id=session_id)
-        asyncio.run(self.agent.initialize())
+    async def setup(self):
+        # One Zep client, and its connection pool, for every conversation
+        zep = AsyncZep(api_key=ZEP_API_KEY) if ZEP_API_KEY else None
+        # The agent and its tools are built once; a conversation only has
+        # its planning steps and Zep session id in session state
+        self.whisperer = WanderlustWhisperer(zep)
+
+    async def new_session(self, session):
+        await self.whisperer.memory_manager.start_session(session)
 
     async def process(self, query_text: str):
-        return await self.agent.process(query_text)
+        return await self.whisperer.process(query_text)
 
     async def stream(self, query_text: str):
-        async for word in self.agent.stream(query_text=query_text):
+        async for word in self.whisperer.stream(query_text=query_text):
             yield word
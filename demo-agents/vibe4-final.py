@@ -1,31 +1,37 @@
 import os
 import json
 import time
-import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional, List, Any
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.auth.transport.requests import Request
 from pydantic import BaseModel, Field
-import asyncio
 import random
 import dotenv
-import base64
 import json
 from agents import (
     Agent as OpenAIAgent,
-    ItemHelpers,
     Runner,
     FunctionTool,
     RunContextWrapper,
     set_default_openai_key,
 )
+from agent_framework import (
+    CredentialsCache,
+    GoogleServices,
+    authorized_user_from_env,
+    current_session,
+    lazy_import,
+    offload,
+    session_state,
+    stream_text_deltas,
+)
 from zep_cloud.client import AsyncZep
 from zep_cloud.types import Message as ZepMessage
 from zep_cloud import NotFoundError
 
+# Only the calendar tools need the Google client libraries; importing them
+# on first use keeps them off the cold start path
+google_errors = lazy_import("googleapiclient.errors")
+
 # Load environment variables
 dotenv.load_dotenv()
 
@@ -69,27 +75,10 @@ def fix_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
 # Google Calendar Tools
 
 
-def get_credentials():
-    # Load the Base64-encoded token from the environment variable
-    token_base64 = os.environ.get("TOKEN_BASE64")
-
-    if not token_base64:
-        raise ValueError("TOKEN_BASE64 environment variable is not set.")
-
-    # Decode the Base64 string to get the token JSON
-    token_json = base64.b64decode(token_base64).decode("utf-8")
-
-    # Load the credentials from the token JSON
-    creds = Credentials.from_authorized_user_info(json.loads(token_json), SCOPES)
-
-    # Check if the credentials are valid and refresh if necessary
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            raise ValueError("Credentials are invalid and cannot be refreshed.")
-
-    return creds
+# Credentials are refreshed only when close to expiry and calendar clients are
+# reused per tool thread, instead of decoding the token and building the
+# client from a fetched discovery document on every call
+google_services = GoogleServices(CredentialsCache(authorized_user_from_env(SCOPES)))
 
 
 class CreateEventInput(BaseModel):
@@ -100,12 +89,12 @@ class CreateEventInput(BaseModel):
     )
 
 
-async def run_create_calendar_event(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_create_calendar_event(ctx: RunContextWrapper[Any], args: str) -> str:
     """Creates a Google Calendar event with a 1-hour duration."""
     try:
         parsed = CreateEventInput.model_validate_json(args)
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
+        service = google_services.service("calendar", "v3")
         event_datetime = datetime.fromisoformat(parsed.start_time)
         event = {
             "summary": parsed.title,
@@ -118,7 +107,7 @@ async def run_create_calendar_event(ctx: RunContextWrapper[Any], args: str) -> s
         }
         event = service.events().insert(calendarId="primary", body=event).execute()
         return f"Event '{parsed.title}' locked in! Event ID: {event.get('id')}"
-    except HttpError as error:
+    except google_errors.HttpError as error:
         return f"Oops, something went wrong: {error}"
     except ValueError as ve:
         return f"Invalid start time format. Use ISO format (e.g., 2025-05-15T10:00:00): {ve}"
@@ -137,12 +126,12 @@ class GetEventsInput(BaseModel):
     end_time: str = Field(..., description="End time in ISO format")
 
 
-async def run_get_calendar_events(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_get_calendar_events(ctx: RunContextWrapper[Any], args: str) -> str:
     """Fetches Google Calendar events within a time range."""
     try:
         parsed = GetEventsInput.model_validate_json(args)
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
+        service = google_services.service("calendar", "v3")
         start_datetime = datetime.fromisoformat(parsed.start_time).replace(
             tzinfo=timezone.utc
         )
@@ -167,7 +156,7 @@ async def run_get_calendar_events(ctx: RunContextWrapper[Any], args: str) -> str
             for event in events["items"]
         ]
         return "\n".join(event_list)
-    except HttpError as error:
+    except google_errors.HttpError as error:
         return f"Uh-oh, ran into an issue: {error}"
     except ValueError as ve:
         return f"Invalid time format. Use ISO format (e.g., 2025-05-15T10:00:00): {ve}"
@@ -186,7 +175,8 @@ class SaveNoteInput(BaseModel):
     category: str = Field(..., description="Note category")
 
 
-async def run_save_note(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_save_note(ctx: RunContextWrapper[Any], args: str) -> str:
     """Saves a note to a local JSON file with a timestamp and category."""
     try:
         parsed = SaveNoteInput.model_validate_json(args)
@@ -219,7 +209,8 @@ class GetNotesInput(BaseModel):
     category: str = Field(..., description="Note category or 'all' for all notes")
 
 
-async def run_get_notes(ctx: RunContextWrapper[Any], args: str) -> str:
+@offload()
+def run_get_notes(ctx: RunContextWrapper[Any], args: str) -> str:
     """Retrieves notes from a local JSON file, filtered by category or all notes if category is 'all'."""
     try:
         parsed = GetNotesInput.model_validate_json(args)
@@ -305,49 +296,62 @@ make_suggestion_tool = FunctionTool(
 
 
 class AsyncZepMemoryManager:
+    """Zep memory shared by every conversation; the Zep session id of the
+    current one is kept in its session state"""
+
     def __init__(
         self,
-        session_id: Optional[str] = None,
-        user_id: Optional[str] = None,
+        zep_client: Optional[AsyncZep] = None,
         email: Optional[str] = None,
         first_name: Optional[str] = None,
         last_name: Optional[str] = None,
         ignore_assistant: bool = False,
     ):
-        self.session_id = session_id or str(uuid.uuid4())
-        self.user_id = user_id or f"user-{str(uuid.uuid4())[:8]}"
+        self.zep_client = zep_client
         self.email = email
         self.first_name = first_name
         self.last_name = last_name
         self.ignore_assistant = ignore_assistant
-        self.zep_client: AsyncZep | None = None
 
-    async def initialize(self):
-        if not ZEP_API_KEY:
-            print("ZEP_API_KEY not set. Memory disabled.")
+    @property
+    def session_id(self) -> Optional[str]:
+        return session_state().get("zep_session_id")
+
+    @property
+    def user_id(self) -> Optional[str]:
+        session = current_session()
+        return session.user_id if session is not None else None
+
+    async def start_session(self, session) -> None:
+        # Anonymous conversations get no Zep user or session; a restored
+        # conversation keeps the one it already has
+        if (
+            not self.zep_client
+            or session.user_id is None
+            or "zep_session_id" in session.state
+        ):
             return
-        self.zep_client = AsyncZep(api_key=ZEP_API_KEY)
         try:
-            await self.zep_client.user.get(self.user_id)
-            print(f"Using existing user: {self.user_id}")
+            await self.zep_client.user.get(session.user_id)
+            print(f"Using existing user: {session.user_id}")
         except NotFoundError:
             await self.zep_client.user.add(
-                user_id=self.user_id,
+                user_id=session.user_id,
                 first_name=self.first_name,
                 last_name=self.last_name,
                 email=self.email,
             )
-            print(f"Created new user with ID: {self.user_id}")
-        timestamp = int(time.time())
-        self.session_id = f"{self.session_id}-{timestamp}"
-        print(f"Creating new session with ID: {self.session_id}")
+            print(f"Created new user with ID: {session.user_id}")
+        session_id = f"execuvibe-session-{session.id}-{int(time.time())}"
+        print(f"Creating new session with ID: {session_id}")
         await self.zep_client.memory.add_session(
-            session_id=self.session_id,
-            user_id=self.user_id,
+            session_id=session_id,
+            user_id=session.user_id,
         )
+        session.state["zep_session_id"] = session_id
 
     async def add_message(self, message: dict) -> None:
-        if not self.zep_client:
+        if not self.zep_client or not self.session_id:
             return
         role = message.get("role", None)
         zep_message_role = ""
@@ -369,6 +373,8 @@ class AsyncZepMemoryManager:
     async def get_memory(self) -> str:
         if not self.zep_client:
             return "Memory disabled: ZEP_API_KEY not set."
+        if not self.session_id:
+            return "No conversation history yet."
         try:
             memory = await self.zep_client.memory.get(session_id=self.session_id)
             return memory.context if memory.context else "No conversation history yet."
@@ -379,7 +385,7 @@ class AsyncZepMemoryManager:
             return "Error retrieving conversation history."
 
     async def search_memory(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        if not self.zep_client:
+        if not self.zep_client or not self.user_id:
             return []
         formatted_messages = []
         try:
@@ -505,30 +511,47 @@ class ConversationHandler:
                 return "Category's off. Try a word like 'Ideas', 'General', or 'all' for everything."
 
 
+# Agent system prompt
+SYSTEM_PROMPT = """
+        You're ExecuVibe, the ultimate executive assistant with a cool, upbeat vibe and memory powers. Your mission is to keep your user organized, inspired, and on top of their game. You can:
+        - Create and fetch Google Calendar events.
+        - Take and organize notes in categories.
+        - Offer smart, personalized suggestions to boost productivity or morale.
+        - Recall user details using the search_memory tool.
+        - Show conversation history with the 'memory' command.
+
+        Handle user inputs with flair and precision:
+        - **Greetings**: Recognize greetings (e.g., 'hi', 'hello', 'hey', 'yo', 'what's up') and respond with a friendly welcome, like "Yo, what's good?" Then, prompt for a task.
+        - **Commands**: For commands (e.g., 'schedule', 'jot a note', 'get notes', 'give a tip', 'memory'), execute the relevant tool or ask follow-up questions one at a time.
+        - **Vague Inputs**: For unclear inputs that aren’t greetings, suggest creating an event, taking a note, or getting a tip.
+        - **Memory**: Use search_memory to recall user details (e.g., name, location) when relevant. For 'memory', show the full conversation history. Ask questions about their life (e.g., where they live, favorite activities) to build their profile.
+        - **Defaults**: Suggest defaults to guide users:
+          - For note categories, suggest 'General' (e.g., "Categorize it? Suggested: 'General'").
+          - For fetching notes, suggest 'all' to see all categories.
+
+        Keep responses concise, professional, but fun—like a trusted sidekick. Ensure dates are in ISO format (e.g., 2025-05-15T10:00:00). If an error occurs, provide a clear, user-friendly message and suggest next steps. Use memory context to personalize responses.
+        """
+
+
 # ExecuVibe Memory Agent
 
 
 class ExecuVibeMemoryAgent:
+    """The assistant and its tools, shared by every conversation"""
+
     def __init__(
         self,
-        session_id: Optional[str] = None,
-        user_id: Optional[str] = None,
+        zep_client: Optional[AsyncZep] = None,
         email: Optional[str] = None,
         first_name: Optional[str] = None,
         last_name: Optional[str] = None,
         ignore_assistant: bool = False,
     ):
         self.memory_manager = AsyncZepMemoryManager(
-            session_id, user_id, email, first_name, last_name, ignore_assistant
+            zep_client, email, first_name, last_name, ignore_assistant
         )
-        self.agent = None
-        self.context: Dict[str, Dict] = {}
-
-    async def initialize(self):
-        await self.memory_manager.initialize()
-        memory_context = await self.memory_manager.get_memory()
 
-        # Define search_memory_tool inside initialize to access self.memory_manager
+        # search_memory_tool closes over self.memory_manager
         class SearchMemoryInput(BaseModel):
             query: str = Field(..., description="Query to search user memory")
 
@@ -552,30 +575,9 @@ class ExecuVibeMemoryAgent:
             on_invoke_tool=run_search_memory,
         )
 
-        # Agent system prompt
-        SYSTEM_PROMPT = """
-        You're ExecuVibe, the ultimate executive assistant with a cool, upbeat vibe and memory powers. Your mission is to keep your user organized, inspired, and on top of their game. You can:
-        - Create and fetch Google Calendar events.
-        - Take and organize notes in categories.
-        - Offer smart, personalized suggestions to boost productivity or morale.
-        - Recall user details using the search_memory tool.
-        - Show conversation history with the 'memory' command.
-
-        Handle user inputs with flair and precision:
-        - **Greetings**: Recognize greetings (e.g., 'hi', 'hello', 'hey', 'yo', 'what's up') and respond with a friendly welcome, like "Yo, what's good?" Then, prompt for a task.
-        - **Commands**: For commands (e.g., 'schedule', 'jot a note', 'get notes', 'give a tip', 'memory'), execute the relevant tool or ask follow-up questions one at a time.
-        - **Vague Inputs**: For unclear inputs that aren’t greetings, suggest creating an event, taking a note, or getting a tip.
-        - **Memory**: Use search_memory to recall user details (e.g., name, location) when relevant. For 'memory', show the full conversation history. Ask questions about their life (e.g., where they live, favorite activities) to build their profile.
-        - **Defaults**: Suggest defaults to guide users:
-          - For note categories, suggest 'General' (e.g., "Categorize it? Suggested: 'General'").
-          - For fetching notes, suggest 'all' to see all categories.
-
-        Keep responses concise, professional, but fun—like a trusted sidekick. Ensure dates are in ISO format (e.g., 2025-05-15T10:00:00). If an error occurs, provide a clear, user-friendly message and suggest next steps. Use memory context to personalize responses.
-        """
-
         self.agent = OpenAIAgent(
             name="ExecuVibe",
-            instructions=SYSTEM_PROMPT + "\n" + f"Memory Context: {memory_context}",
+            instructions=self._instructions,
             tools=[
                 create_calendar_event_tool,
                 get_calendar_events_tool,
@@ -595,6 +597,20 @@ class ExecuVibeMemoryAgent:
             self._handle_suggestion,
         ]
 
+    @property
+    def context(self) -> Dict[str, Dict]:
+        # Event and note steps are stored with the session, so any replica
+        # can pick the conversation up
+        return session_state().setdefault("context", {})
+
+    @staticmethod
+    def _instructions(ctx: RunContextWrapper[Any], agent: OpenAIAgent) -> str:
+        # The agent is shared, so each run brings its conversation's memory
+        memory_context = (ctx.context or {}).get(
+            "memory", "No conversation history yet."
+        )
+        return SYSTEM_PROMPT + "\n" + f"Memory Context: {memory_context}"
+
     async def _handle_memory(self, input_text: str) -> Optional[str]:
         """Handles the 'memory' command to display conversation history."""
         if input_text.lower() == "memory":
@@ -670,43 +686,40 @@ class ExecuVibeMemoryAgent:
                 return response
         return "Not sure what you need, boss! How about scheduling an event, saving a note, grabbing a tip, or checking our 'memory'? What's your favorite thing to do in your city?"
 
+    async def _remember_reply(self, message: str):
+        await self.memory_manager.add_message({"role": "assistant", "content": message})
+
     async def stream(self, query_text: str):
         try:
             await self.memory_manager.add_message(
                 {"role": "user", "content": query_text}
             )
             memory_context = await self.memory_manager.get_memory()
-            self.agent.instructions = (
-                self.agent.instructions.split("Memory Context:")[0].strip()
-                + "\n"
-                + f"Memory Context: {memory_context}"
+            result = Runner.run_streamed(
+                self.agent, query_text, context={"memory": memory_context}
             )
-            result = Runner.run_streamed(self.agent, query_text)
-            async for event in result.stream_events():
-                if (
-                    event.type == "run_item_stream_event"
-                    and event.item.type == "message_output_item"
-                ):
-                    message = ItemHelpers.text_message_output(event.item)
-                    for word in message.split():
-                        yield word + " "
-                        await asyncio.sleep(0.05)
-                    await self.memory_manager.add_message(
-                        {"role": "assistant", "content": message}
-                    )
+            async for delta in stream_text_deltas(
+                result, on_message=self._remember_reply
+            ):
+                yield delta
         except Exception as e:
             yield f"Oops, hit a snag: {str(e)}. Try something like 'Schedule a meeting', 'Jot a note', or 'memory'. "
 
 
 class Agent:
-    def __init__(self):
-        session_id = f"execuvibe-session-{int(time.time())}"
-        self.agent = ExecuVibeMemoryAgent(session_id)
-        asyncio.run(self.agent.initialize())
+    async def setup(self):
+        # One Zep client, and its connection pool, for every conversation
+        zep = AsyncZep(api_key=ZEP_API_KEY) if ZEP_API_KEY else None
+        # The agent and its tools are built once; a conversation only has
+        # its pending event and note steps and Zep session id in session state
+        self.vibe = ExecuVibeMemoryAgent(zep)
+
+    async def new_session(self, session):
+        await self.vibe.memory_manager.start_session(session)
 
     async def process(self, query: str):
-        return await self.agent.process(query)
+        return await self.vibe.process(query)
 
     async def stream(self, query: str):
-        async for word in self.agent.stream(query_text=query):
+        async for word in self.vibe.stream(query_text=query):
             yield word
@@ -1,2 +1,8 @@
-from base_agent import BaseAgent
-from types import *
+from .base_agent import BaseAgent
+from .executor import offload, run_sync
+from .google_apis import CredentialsCache, GoogleServices, authorized_user_from_env
+from .lazy import lazy_import
+from .session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+from .sessions import current_session, session_state
+from .streaming import stream_text_deltas
+from .types import *
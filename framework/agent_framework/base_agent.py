@@ -31,10 +31,13 @@
 #         result = self.process(data)
 #         yield str(result.get("response", str(result)))
 
-from typing import Dict, Any, AsyncGenerator
+from typing import Dict, Any, AsyncGenerator, Awaitable, Callable, Optional
 import json
 from datetime import datetime
 
+from .executor import run_sync
+from .streaming import stream_text_deltas
+
 
 class BaseAgent:
     """Base class for AI Agents with structured output format"""
@@ -86,3 +89,62 @@ class BaseAgent:
         # Default implementation: calls process and yields the result
         result = await self.process(data)
         yield json.dumps(result)
+
+    async def setup(self) -> None:
+        """
+        Open clients, warm caches and load models once the server is up.
+
+        Awaited in the server's lifespan after the agent is constructed; the
+        server answers liveness checks meanwhile and reports ready when this
+        returns. Keep __init__ cheap and do network I/O here, concurrently
+        where the steps are independent (asyncio.gather).
+        """
+
+    async def teardown(self) -> None:
+        """Close what setup() opened; awaited when the server shuts down"""
+
+    async def new_session(self, session: Any) -> None:
+        """
+        Prepare per-conversation state before a conversation's first request.
+
+        The agent instance is shared by every user; state that belongs to one
+        conversation goes in session.state (a dict) and is reached from
+        process/stream through agent_framework.current_session() or
+        session_state().
+
+        Args:
+            session: The Session, with .id, .user_id and .state
+        """
+
+    async def stream_deltas(
+        self,
+        result: Any,
+        coalesce_ms: Optional[float] = None,
+        coalesce_chars: Optional[int] = None,
+        on_message: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Forward the text deltas of Runner.run_streamed() as they arrive.
+
+        Args:
+            result: The object returned by Runner.run_streamed()
+            coalesce_ms: Optional window for merging deltas into one chunk
+            coalesce_chars: Optional size at which a merged chunk is sent early
+            on_message: Awaited with the full text of each completed message
+
+        Yields:
+            Text chunks
+        """
+        async for chunk in stream_text_deltas(
+            result, coalesce_ms, coalesce_chars, on_message
+        ):
+            yield chunk
+
+    async def run_blocking(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking call (requests, googleapiclient .execute(), file I/O)
+        on the bounded agent thread pool instead of the event loop.
+
+        Tools can also be marked once with agent_framework.offload().
+        """
+        return await run_sync(fn, *args, **kwargs)
@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import functools
+import importlib.util
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+THREAD_POOL_SIZE = int(os.getenv("NOVIX_THREAD_POOL_SIZE", "16"))
+PROCESS_POOL_SIZE = int(os.getenv("NOVIX_PROCESS_POOL_SIZE", "2"))
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Functions marked for the process pool, looked up by name in the workers:
+# agent modules are loaded from a file path and cannot be imported there by
+# name, so the functions themselves can't be pickled. Each worker loads the
+# files in _process_modules instead, which registers them again
+_process_functions: Dict[str, Callable] = {}
+_process_modules: Dict[str, str] = {}
+
+
+def thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=THREAD_POOL_SIZE, thread_name_prefix="agent-sync"
+        )
+    return _thread_pool
+
+
+def process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Workers start from a fresh interpreter: forking this process, with
+        # the event loop and thread pools already running, could copy a lock
+        # held by another thread into the child
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["agent_framework"])
+        else:
+            context = multiprocessing.get_context("spawn")
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_SIZE,
+            mp_context=context,
+            initializer=_load_process_modules,
+            initargs=(dict(_process_modules),),
+        )
+    return _process_pool
+
+
+def _load_process_modules(modules: Dict[str, str]):
+    for name, path in modules.items():
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+
+
+def _call_registered(key: str, args, kwargs):
+    return _process_functions[key](*args, **kwargs)
+
+
+async def run_sync(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the bounded agent thread pool"""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context so the session and trace id follow the call
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        thread_pool(), functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+def offload(kind: str = "thread"):
+    """Turn a blocking function into a coroutine function that runs off the loop.
+
+    ``kind="thread"`` suits I/O-bound calls such as ``requests`` or
+    ``googleapiclient``'s ``.execute()``. ``kind="process"`` is for CPU-bound
+    work; its arguments and return value must be picklable.
+
+        @offload()
+        def run_search_web(ctx, args: str) -> str:
+            return requests.post(...).text
+    """
+    if kind not in ("thread", "process"):
+        raise ValueError(f"Unknown executor kind: {kind}")
+
+    def decorator(fn: Callable):
+        if asyncio.iscoroutinefunction(fn):
+            raise TypeError(f"{fn.__qualname__} is already a coroutine function")
+
+        if kind == "process":
+            key = f"{fn.__module__}.{fn.__qualname__}"
+            _process_functions[key] = fn
+            _process_modules[fn.__module__] = os.path.abspath(
+                fn.__globals__["__file__"]
+            )
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    process_pool(), _call_registered, key, args, kwargs
+                )
+
+        else:
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                return await run_sync(fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def shutdown():
+    global _thread_pool, _process_pool
+    if _thread_pool:
+        _thread_pool.shutdown(wait=False)
+        _thread_pool = None
+    if _process_pool:
+        _process_pool.shutdown(wait=False)
+        _process_pool = None
@@ -0,0 +1,154 @@
+import base64
+import datetime
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from .lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+# Agents using these helpers list google-auth and google-api-python-client in
+# their own requirements; nothing is imported until a tool needs it
+_discovery = lazy_import("googleapiclient.discovery")
+_discovery_cache = lazy_import("googleapiclient.discovery_cache")
+_oauth2 = lazy_import("google.oauth2.credentials")
+_transport = lazy_import("google.auth.transport.requests")
+
+# Refresh this long before the access token expires
+REFRESH_MARGIN = float(os.getenv("NOVIX_GOOGLE_REFRESH_MARGIN", "300"))
+# {api}.{version}.json files for APIs the client library doesn't bundle
+DISCOVERY_DIR = os.getenv("NOVIX_GOOGLE_DISCOVERY_DIR", "")
+
+
+def authorized_user_from_env(
+    scopes: Sequence[str], variable: str = "TOKEN_BASE64"
+) -> Callable[[], Any]:
+    """Loader for OAuth user credentials kept base64-encoded in an env var"""
+
+    def load():
+        token = os.environ.get(variable)
+        if not token:
+            raise ValueError(f"{variable} environment variable is not set.")
+        info = json.loads(base64.b64decode(token).decode("utf-8"))
+        return _oauth2.Credentials.from_authorized_user_info(info, scopes)
+
+    return load
+
+
+class CredentialsCache:
+    """Google credentials loaded once and refreshed only near expiry.
+
+    ``get()`` is cheap while the token has more than ``refresh_margin``
+    seconds left. When it doesn't, one caller refreshes under a lock and
+    concurrent callers wait for that refresh instead of starting their own.
+    Blocking (the refresh is an HTTP call): use it from offloaded tools.
+    """
+
+    def __init__(self, load: Callable[[], Any], refresh_margin: float = REFRESH_MARGIN):
+        self.load = load
+        self.refresh_margin = refresh_margin
+        self.refreshes = 0
+        self._credentials = None
+        self._request = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        credentials = self._credentials
+        if self._fresh(credentials):
+            return credentials
+        with self._lock:
+            credentials = self._credentials
+            if self._fresh(credentials):
+                return credentials
+            if credentials is None:
+                credentials = self.load()
+            if not self._fresh(credentials):
+                if self._request is None:
+                    self._request = _transport.Request()
+                credentials.refresh(self._request)
+                self.refreshes += 1
+                logger.info(
+                    f"Refreshed Google credentials, expiry {credentials.expiry}"
+                )
+            self._credentials = credentials
+            return credentials
+
+    def _fresh(self, credentials) -> bool:
+        if credentials is None or not credentials.token:
+            return False
+        expiry = credentials.expiry
+        if expiry is None:
+            return True
+        # google-auth keeps expiry as naive UTC
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if expiry.tzinfo is None:
+            now = now.replace(tzinfo=None)
+        return (expiry - now).total_seconds() > self.refresh_margin
+
+
+class GoogleServices:
+    """Google API clients for tools, built without per-call discovery.
+
+    Discovery documents come from the client library's bundled copies (or
+    ``discovery_dir``) and are parsed once per process. httplib2 connections
+    are not thread-safe, so each thread gets its own client per API, reused
+    across calls and rebuilt only when the credentials object changes.
+
+        google = GoogleServices(CredentialsCache(authorized_user_from_env(SCOPES)))
+
+        @offload()
+        def list_events(ctx, args):
+            calendar = google.service("calendar", "v3")
+            return calendar.events().list(calendarId="primary").execute()
+    """
+
+    def __init__(
+        self, credentials: CredentialsCache, discovery_dir: str = DISCOVERY_DIR
+    ):
+        self.credentials = credentials
+        self.discovery_dir = discovery_dir
+        self._documents: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def service(self, api: str, version: str):
+        credentials = self.credentials.get()
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+        cached = services.get((api, version))
+        if cached is not None and cached[0] is credentials:
+            return cached[1]
+        service = _discovery.build_from_document(
+            self.document(api, version), credentials=credentials
+        )
+        services[(api, version)] = (credentials, service)
+        return service
+
+    def document(self, api: str, version: str) -> Dict:
+        key = (api, version)
+        document = self._documents.get(key)
+        if document is None:
+            with self._lock:
+                document = self._documents.get(key)
+                if document is None:
+                    document = json.loads(self._read_document(api, version))
+                    self._documents[key] = document
+        return document
+
+    def _read_document(self, api: str, version: str) -> str:
+        if self.discovery_dir:
+            path = os.path.join(self.discovery_dir, f"{api}.{version}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    return f.read()
+        document: Optional[str] = _discovery_cache.get_static_doc(api, version)
+        if document is None:
+            raise ValueError(
+                f"No local discovery document for {api} {version}; add "
+                f"{api}.{version}.json to NOVIX_GOOGLE_DISCOVERY_DIR"
+            )
+        return document
@@ -0,0 +1,283 @@
+import asyncio
+import gc
+import importlib.util
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set
+
+from .lifecycle import run_hook
+
+logger = logging.getLogger(__name__)
+
+MODULE_PREFIX = "novix_hosted_"
+
+
+class AgentLoadError(Exception):
+    pass
+
+
+class AgentBusy(Exception):
+    pass
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes, 0 where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class HostedAgent:
+    def __init__(self, agent_id: str, module, instance, env: Dict[str, str]):
+        self.agent_id = agent_id
+        self.module = module
+        self.instance = instance
+        self.env = env
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self.load_seconds = 0.0
+        self.rss_bytes = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded_at": self.loaded_at,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "load_seconds": round(self.load_seconds, 3),
+            "rss_bytes": self.rss_bytes,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class AgentHost:
+    """Many agents in one server process, each imported under its own module name.
+
+    Agents share the interpreter and whatever libraries they import, which is
+    where the memory saving over one container per agent comes from. Each one
+    is charged the RSS growth of its import, its requests and the time spent
+    serving them; the least recently used idle agent is unloaded when the host
+    runs past ``max_agents`` or ``max_rss_bytes``. The RSS of a process rarely
+    shrinks after an unload, so the memory limit applies to what is charged:
+    the host's RSS before its first agent plus each hosted agent's share.
+
+    Environment variables are process-wide, so an agent whose variables
+    conflict with an already hosted agent, or would override one the host
+    itself runs with, is refused rather than loaded. Variables an agent sets
+    are removed again once no hosted agent needs them.
+    """
+
+    def __init__(
+        self,
+        agents_dir: str = "./hosted_agents",
+        max_agents: int = 20,
+        max_rss_bytes: int = 0,
+        idle_ttl: float = 0,
+    ):
+        self.agents_dir = agents_dir
+        self.max_agents = max_agents
+        self.max_rss_bytes = max_rss_bytes
+        self.idle_ttl = idle_ttl
+        self.agents: Dict[str, HostedAgent] = {}
+        self.evictions = 0
+        # Variables set for hosted agents -> ids of the agents that need them
+        self._env_owners: Dict[str, Set[str]] = {}
+        self._base_rss: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    def get(self, agent_id: str) -> Optional[HostedAgent]:
+        return self.agents.get(agent_id)
+
+    async def load(self, agent_id: str, source: str, env: Dict[str, str]):
+        async with self._lock:
+            if agent_id in self.agents:
+                await self._unload(agent_id)
+            self._check_env(agent_id, env)
+            if self._base_rss is None:
+                self._base_rss = current_rss()
+            await self._make_room()
+
+            agent_dir = os.path.join(self.agents_dir, agent_id)
+            os.makedirs(agent_dir, exist_ok=True)
+            path = os.path.join(agent_dir, "agent.py")
+            with open(path, "w") as f:
+                f.write(source)
+
+            self._set_env(agent_id, env)
+            rss_before = current_rss()
+            started = time.monotonic()
+            try:
+                # Off the loop: agents may block or call asyncio.run() in __init__
+                module, instance = await asyncio.get_running_loop().run_in_executor(
+                    None, self._import, agent_id, path
+                )
+                try:
+                    await run_hook(instance, "setup")
+                except BaseException:
+                    sys.modules.pop(module.__name__, None)
+                    raise
+            except BaseException:
+                self._release_env(agent_id)
+                raise
+            hosted = HostedAgent(agent_id, module, instance, env)
+            hosted.load_seconds = time.monotonic() - started
+            hosted.rss_bytes = max(current_rss() - rss_before, 0)
+            self.agents[agent_id] = hosted
+            logger.info(
+                f"Hosted agent {agent_id} loaded in {hosted.load_seconds:.2f}s "
+                f"(+{hosted.rss_bytes // 1024} KiB)"
+            )
+
+    async def unload(self, agent_id: str) -> bool:
+        async with self._lock:
+            if agent_id not in self.agents:
+                return False
+            await self._unload(agent_id)
+            return True
+
+    @contextmanager
+    def serving(self, agent_id: str):
+        """Account one request to the agent and pin it against eviction meanwhile"""
+        hosted = self.agents.get(agent_id)
+        if hosted is None:
+            yield None
+            return
+        hosted.in_flight += 1
+        hosted.requests += 1
+        started = time.monotonic()
+        try:
+            yield hosted.instance
+        except BaseException:
+            hosted.errors += 1
+            raise
+        finally:
+            hosted.in_flight -= 1
+            hosted.busy_seconds += time.monotonic() - started
+            hosted.last_used = time.monotonic()
+
+    async def evict_idle(self) -> List[str]:
+        """Unload agents that have been idle for longer than ``idle_ttl``"""
+        if not self.idle_ttl:
+            return []
+        evicted = []
+        async with self._lock:
+            now = time.monotonic()
+            for agent_id, hosted in list(self.agents.items()):
+                if not hosted.in_flight and now - hosted.last_used > self.idle_ttl:
+                    await self._unload(agent_id)
+                    self.evictions += 1
+                    evicted.append(agent_id)
+        return evicted
+
+    def charged_bytes(self) -> int:
+        """Memory the host accounts for: its base RSS plus every agent's share"""
+        return (self._base_rss or 0) + sum(
+            hosted.rss_bytes for hosted in self.agents.values()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_agents": self.max_agents,
+            "max_rss_bytes": self.max_rss_bytes,
+            "rss_bytes": current_rss(),
+            "charged_bytes": self.charged_bytes(),
+            "evictions": self.evictions,
+            "agents": {
+                agent_id: hosted.stats() for agent_id, hosted in self.agents.items()
+            },
+        }
+
+    def _check_env(self, agent_id: str, env: Dict[str, str]):
+        for key, value in env.items():
+            current = os.environ.get(key)
+            if current is None or current == value:
+                continue
+            owners = self._env_owners.get(key)
+            if not owners:
+                raise AgentLoadError(
+                    f"Environment variable {key} is already set in the host"
+                )
+            others = ", ".join(sorted(owners - {agent_id}))
+            raise AgentLoadError(
+                f"Environment variable {key} conflicts with agent {others}"
+            )
+
+    def _set_env(self, agent_id: str, env: Dict[str, str]):
+        for key, value in env.items():
+            # The host's own variables (same value, or _check_env refused)
+            # are left alone and never removed
+            if key in self._env_owners or key not in os.environ:
+                os.environ[key] = value
+                self._env_owners.setdefault(key, set()).add(agent_id)
+
+    def _release_env(self, agent_id: str):
+        for key, owners in list(self._env_owners.items()):
+            owners.discard(agent_id)
+            if not owners:
+                del self._env_owners[key]
+                os.environ.pop(key, None)
+
+    async def _make_room(self):
+        while self.agents:
+            over_count = len(self.agents) >= self.max_agents
+            over_memory = bool(self.max_rss_bytes) and (
+                self.charged_bytes() >= self.max_rss_bytes
+            )
+            if not over_count and not over_memory:
+                return
+            idle = [hosted for hosted in self.agents.values() if not hosted.in_flight]
+            if not over_count:
+                # Unloading an agent that was charged nothing frees nothing
+                idle = [hosted for hosted in idle if hosted.rss_bytes > 0]
+                if not idle:
+                    logger.warning(
+                        f"Host is charged {self.charged_bytes() // 2**20} MiB, over "
+                        f"its {self.max_rss_bytes // 2**20} MiB limit, with no "
+                        f"idle agent to evict"
+                    )
+                    return
+            if not idle:
+                raise AgentBusy("Host is full and every agent is serving requests")
+            victim = min(idle, key=lambda hosted: hosted.last_used)
+            logger.info(f"Evicting hosted agent {victim.agent_id}")
+            await self._unload(victim.agent_id)
+            self.evictions += 1
+
+    def _import(self, agent_id: str, path: str):
+        module_name = MODULE_PREFIX + re.sub(r"\W", "_", agent_id)
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        # Registered so pickling, dataclasses and typing can resolve the module
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+            if not hasattr(module, "Agent"):
+                raise AgentLoadError("Agent class not found in agent.py")
+            return module, module.Agent()
+        except Exception:
+            sys.modules.pop(module_name, None)
+            raise
+
+    async def _unload(self, agent_id: str):
+        hosted = self.agents.pop(agent_id)
+        for hook in ("teardown", "close"):
+            try:
+                await run_hook(hosted.instance, hook)
+            except Exception as e:
+                logger.error(f"Error closing hosted agent {agent_id}: {str(e)}")
+        sys.modules.pop(hosted.module.__name__, None)
+        self._release_env(agent_id)
+        del hosted
+        gc.collect()
+        logger.info(f"Unloaded hosted agent {agent_id}")
@@ -0,0 +1,163 @@
+"""Import-time profile of an agent module.
+
+Runs at image build time::
+
+    python -m agent_framework.importtime agent.py --output import_profile.json
+
+agent.py is loaded in a child interpreter under ``-X importtime`` the way
+server.py loads it, after what server.py imports anyway, and the per-module
+costs the agent adds are written as JSON, served by the agent at /_imports.
+A summary goes to stdout, so it shows in the build log. Profiling never
+fails the build: errors are recorded in the report.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+# Rows before this marker are the interpreter's and the loader's own imports
+_MARKER = "novix: loading agent"
+
+# Executed in the child; prints the module's own load time on the last line
+_LOADER = """
+import importlib.util, json, sys, time
+for name in ("fastapi", "uvicorn", "agent_framework"):
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+sys.stderr.write(MARKER + "\\n")
+sys.stderr.flush()
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("agent_module", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({"load_ms": (time.perf_counter() - started) * 1000}))
+""".replace("MARKER", repr(_MARKER))
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of ``-X importtime`` output, in the order modules finished loading"""
+    if _MARKER in stderr:
+        stderr = stderr.split(_MARKER, 1)[1]
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # The header line
+            continue
+        name = parts[2].rstrip()
+        rows.append(
+            {
+                "module": name.strip(),
+                # Nesting is two spaces per level after the leading one
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_ms": self_us / 1000,
+                "cumulative_ms": cumulative_us / 1000,
+            }
+        )
+    return rows
+
+
+def build_report(rows: List[Dict[str, Any]], top: int = 50) -> Dict[str, Any]:
+    packages: Dict[str, float] = defaultdict(float)
+    for row in rows:
+        packages[row["module"].split(".")[0]] += row["self_ms"]
+    return {
+        "imports_ms": round(
+            sum(row["cumulative_ms"] for row in rows if row["depth"] == 0), 1
+        ),
+        "modules_imported": len(rows),
+        "packages": [
+            {"package": name, "self_ms": round(ms, 1)}
+            for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+        "slowest": [
+            {
+                **row,
+                "self_ms": round(row["self_ms"], 1),
+                "cumulative_ms": round(row["cumulative_ms"], 1),
+            }
+            for row in sorted(rows, key=lambda row: -row["cumulative_ms"])[:top]
+        ],
+    }
+
+
+def profile(path: str, timeout: float = 120.0, top: int = 50) -> Dict[str, Any]:
+    """Load ``path`` in a fresh interpreter and report what its imports cost"""
+    report: Dict[str, Any] = {
+        "agent": path,
+        "python": sys.version.split()[0],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _LOADER, path],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env=env,
+        )
+    except subprocess.TimeoutExpired:
+        report["error"] = f"Loading {path} took longer than {timeout:.0f}s"
+        return report
+    report["wall_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    report.update(build_report(parse_importtime(result.stderr), top))
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.splitlines() if line.strip()]
+        report["error"] = next(
+            (line for line in reversed(lines) if not line.startswith("import time:")),
+            f"exit status {result.returncode}",
+        )
+    else:
+        try:
+            report.update(json.loads(result.stdout.strip().splitlines()[-1]))
+            report["load_ms"] = round(report["load_ms"], 1)
+        except (ValueError, IndexError):
+            pass
+    return report
+
+
+def summary(report: Dict[str, Any], lines: int = 10) -> str:
+    out = [
+        f"Import profile of {report['agent']}: "
+        f"{report.get('load_ms', report.get('wall_ms', 0))}ms to load, "
+        f"{report.get('modules_imported', 0)} modules"
+    ]
+    if report.get("error"):
+        out.append(f"  error: {report['error']}")
+    for package in report.get("packages", [])[:lines]:
+        out.append(f"  {package['self_ms']:>9.1f}ms  {package['package']}")
+    return "\n".join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("agent", nargs="?", default="agent.py")
+    parser.add_argument("--output", default="import_profile.json")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--top", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    report = profile(args.agent, args.timeout, args.top)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(summary(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import importlib
+import sys
+import threading
+import types
+from typing import Any
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module until one of its attributes is used"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            # Tools may touch the module from several threads at once
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Import a module on first use instead of when the agent module loads.
+
+    For heavy libraries only some tools need (googleapiclient, google.auth,
+    pandas), so the server reports ready sooner after a cold start:
+
+        discovery = lazy_import("googleapiclient.discovery")
+        ...
+        service = discovery.build("calendar", "v3", credentials=creds)
+
+    Already imported modules are returned as they are. The import profile
+    written at build time (agent_framework.importtime) shows which imports
+    are worth deferring.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
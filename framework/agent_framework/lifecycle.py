@@ -0,0 +1,13 @@
+import inspect
+from typing import Any
+
+
+async def run_hook(instance: Any, name: str, *args) -> Any:
+    """Call ``instance.<name>(*args)`` if the agent defines it, sync or async"""
+    hook = getattr(instance, name, None)
+    if hook is None:
+        return None
+    result = hook(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class LagRecord:
+    def __init__(self):
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports what blocked the loop.
+
+    A heartbeat task wakes every ``interval`` and charges how late it woke
+    to every request in flight. A watchdog thread notices when the
+    heartbeat has been silent for ``stall_threshold`` and logs the loop
+    thread's stack while it is still stuck, which points at the blocking
+    call instead of at the request that happened to suffer from it.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        stall_threshold: float = 0.25,
+        on_lag: Optional[Callable[[float], None]] = None,
+        on_stall: Optional[Callable[[], None]] = None,
+    ):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.on_lag = on_lag
+        self.on_stall = on_stall
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._active: Set[LagRecord] = set()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @contextmanager
+    def track(self):
+        """Collect the loop lag seen while the block runs"""
+        record = LagRecord()
+        self._active.add(record)
+        try:
+            yield record
+        finally:
+            self._active.discard(record)
+
+    def stats(self) -> Dict:
+        return {
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "stall_threshold_ms": self.stall_threshold * 1000,
+        }
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(now - expected, 0.0)
+            self.max_lag = max(self.max_lag, lag)
+            if self.on_lag:
+                self.on_lag(lag)
+            for record in list(self._active):
+                record.max_lag = max(record.max_lag, lag)
+                record.total_lag += lag
+
+    def _watch(self):
+        reported = False
+        while not self._stopped.wait(self.stall_threshold / 2):
+            silent = time.monotonic() - self._beat
+            if silent < self.stall_threshold + self.interval:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True
+            self.stalls += 1
+            if self.on_stall:
+                self.on_stall()
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame, limit=10)) if frame else ""
+            logger.warning(
+                f"Event loop blocked for {silent * 1000:.0f}ms, currently in:\n{stack}"
+            )
@@ -0,0 +1,239 @@
+import bisect
+import contextvars
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition without a client library: observing is a dict
+# lookup and a few additions, cheap enough to leave on for every chunk
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "trace_id", default="-"
+)
+
+
+def new_trace_id(incoming: Optional[str] = None) -> str:
+    """Use the caller's trace id when it sent one, otherwise mint one"""
+    trace_id = (incoming or "").strip()[:64] or uuid.uuid4().hex
+    trace_id_var.set(trace_id)
+    return trace_id
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra="") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self.values.items()
+        ]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, function: Optional[Callable[[], float]] = None, **kw):
+        super().__init__(*args, **kw)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {self.function()}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self.values.items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kw):
+        super().__init__(*args, **kw)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count], sum
+        self.values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class StreamTimer:
+    """Collects TTFT, size and rate of one streamed answer"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_chunk: Optional[float] = None
+        self.chunks = 0
+        self.bytes = 0
+
+    def chunk(self, size: int):
+        if self.first_chunk is None:
+            self.first_chunk = time.monotonic()
+            stream_ttft_seconds.observe(self.first_chunk - self.started)
+        self.chunks += 1
+        self.bytes += size
+
+    def finish(self, outcome: str):
+        elapsed = time.monotonic() - self.started
+        stream_seconds.observe(elapsed, outcome=outcome)
+        stream_bytes.observe(self.bytes)
+        stream_chunks.inc(self.chunks)
+        if self.first_chunk is not None and self.chunks > 1:
+            streaming = time.monotonic() - self.first_chunk
+            if streaming > 0:
+                stream_chunk_rate.observe(self.chunks / streaming)
+
+
+REGISTRY: List[Metric] = []
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+http_request_seconds = Histogram(
+    "novix_http_request_duration_seconds",
+    "HTTP request latency by route",
+    labelnames=("method", "route", "status"),
+)
+process_seconds = Histogram(
+    "novix_agent_process_seconds",
+    "Time spent in Agent.process",
+    labelnames=("outcome",),
+)
+stream_seconds = Histogram(
+    "novix_agent_stream_seconds",
+    "Total time of one streamed answer",
+    labelnames=("outcome",),
+)
+stream_ttft_seconds = Histogram(
+    "novix_agent_stream_ttft_seconds", "Time from query to the first streamed chunk"
+)
+stream_bytes = Histogram(
+    "novix_agent_stream_bytes",
+    "Bytes sent for one streamed answer",
+    buckets=BYTES_BUCKETS,
+)
+stream_chunk_rate = Histogram(
+    "novix_agent_stream_chunks_per_second",
+    "Chunks per second over one streamed answer",
+    buckets=RATE_BUCKETS,
+)
+stream_chunks = Counter("novix_agent_stream_chunks_total", "Streamed chunks sent")
+slow_consumers = Counter(
+    "novix_ws_slow_consumers_total", "WebSockets closed for falling behind"
+)
+dropped_chunks = Counter(
+    "novix_ws_dropped_chunks_total", "Chunks dropped by the drop backpressure policy"
+)
+active_websockets = Gauge("novix_active_websockets", "Open agent WebSockets")
+agent_startup_seconds = Gauge(
+    "novix_agent_startup_seconds", "Time from server start to agent ready"
+)
+active_sessions = Gauge("novix_active_sessions", "Conversations in the session pool")
+session_evictions = Counter(
+    "novix_session_evictions_total",
+    "Sessions evicted from the pool",
+    labelnames=("reason",),
+)
+loop_lag_seconds = Histogram(
+    "novix_event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+loop_stalls = Counter(
+    "novix_event_loop_stalls_total", "Event loop stalls past the stall threshold"
+)
+worker_pid = Gauge(
+    "novix_worker_pid",
+    "Process id of the worker serving this scrape",
+    function=os.getpid,
+)
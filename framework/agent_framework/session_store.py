@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+_JSON = b"j"
+_MSGPACK = b"m"
+
+
+def _encode(value: Any) -> bytes:
+    if msgpack:
+        return _MSGPACK + msgpack.packb(value, use_bin_type=True)
+    return _JSON + json.dumps(value, separators=(",", ":")).encode()
+
+
+def dumps(state: Dict[str, Any]) -> bytes:
+    """Serialize session state; keys starting with "_" are runtime-only
+
+    Values the codec can't represent (clients, agent objects) are skipped
+    with a warning rather than failing the whole snapshot.
+    """
+    state = {key: value for key, value in state.items() if not key.startswith("_")}
+    try:
+        return _encode(state)
+    except (TypeError, ValueError, OverflowError):
+        kept = {}
+        for key, value in state.items():
+            try:
+                _encode(value)
+                kept[key] = value
+            except (TypeError, ValueError, OverflowError):
+                logger.warning(f"Session state {key!r} is not serializable, skipped")
+        return _encode(kept)
+
+
+def loads(data: bytes) -> Dict[str, Any]:
+    codec, payload = data[:1], data[1:]
+    if codec == _MSGPACK:
+        if msgpack is None:
+            raise ValueError("Session was stored with msgpack, which is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+class SessionStore:
+    """Where session state lives between requests and across replicas.
+
+    Snapshots are opaque bytes tagged with a ``stamp`` that changes on every
+    write; ``load`` returns nothing while the caller's stamp is current, so
+    checking for a newer copy costs one lookup. ``shared`` stores can be
+    written by other processes, so cached sessions are checked on each use.
+    """
+
+    shared = False
+
+    async def load(
+        self, key: str, stamp: Optional[str] = None
+    ) -> Optional[Tuple[str, bytes]]:
+        """The stored (stamp, data), or None when missing or still ``stamp``"""
+        raise NotImplementedError
+
+    async def save(self, items: Dict[str, Tuple[str, bytes]]):
+        """Write a batch of key -> (stamp, data) snapshots"""
+        raise NotImplementedError
+
+    async def expire(self, max_age: float) -> int:
+        """Delete snapshots not written for ``max_age`` seconds"""
+        return 0
+
+    async def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Snapshots in this process, for single-replica deployments and tests"""
+
+    def __init__(self):
+        self.items: Dict[str, Tuple[str, bytes, float]] = {}
+
+    async def load(self, key, stamp=None):
+        item = self.items.get(key)
+        if item is None or item[0] == stamp:
+            return None
+        return item[0], item[1]
+
+    async def save(self, items):
+        now = time.time()
+        for key, (stamp, data) in items.items():
+            self.items[key] = (stamp, data, now)
+
+    async def expire(self, max_age):
+        cutoff = time.time() - max_age
+        stale = [key for key, item in self.items.items() if item[2] < cutoff]
+        for key in stale:
+            del self.items[key]
+        return len(stale)
+
+
+class SqliteSessionStore(SessionStore):
+    """Snapshots in a SQLite file that every replica on the host (or on a
+    shared volume with working locks) can open.
+
+    All queries run on one dedicated thread, which owns the connection;
+    a batch of writes is one transaction.
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="session-store"
+        )
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "key TEXT PRIMARY KEY, stamp TEXT, data BLOB, updated REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)"
+            )
+            self._db.commit()
+        return self._db
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _load(self, key, stamp):
+        return (
+            self._connect()
+            .execute(
+                "SELECT stamp, data FROM sessions WHERE key = ? AND stamp IS NOT ?",
+                (key, stamp),
+            )
+            .fetchone()
+        )
+
+    def _save(self, items):
+        db = self._connect()
+        now = time.time()
+        with db:
+            db.executemany(
+                "INSERT INTO sessions (key, stamp, data, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET stamp = excluded.stamp, "
+                "data = excluded.data, updated = excluded.updated",
+                [(key, stamp, data, now) for key, (stamp, data) in items.items()],
+            )
+
+    def _expire(self, max_age):
+        db = self._connect()
+        with db:
+            cursor = db.execute(
+                "DELETE FROM sessions WHERE updated < ?", (time.time() - max_age,)
+            )
+        return cursor.rowcount
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def load(self, key, stamp=None):
+        row = await self._run(self._load, key, stamp)
+        return (row[0], row[1]) if row else None
+
+    async def save(self, items):
+        if items:
+            await self._run(self._save, items)
+
+    async def expire(self, max_age):
+        return await self._run(self._expire, max_age)
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+
+def open_store(url: str) -> Optional[SessionStore]:
+    """A store from NOVIX_SESSION_STORE: "memory" or "sqlite:///path/to.db"
+
+    An empty value keeps sessions in memory only, without snapshots.
+    """
+    if not url:
+        return None
+    if url == "memory":
+        return MemorySessionStore()
+    if url.startswith("sqlite://"):
+        return SqliteSessionStore(url[len("sqlite://") :])
+    raise ValueError(f"Unknown session store: {url}")
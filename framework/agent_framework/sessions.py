@@ -0,0 +1,351 @@
+import asyncio
+import contextvars
+import logging
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .lifecycle import run_hook
+from .session_store import SessionStore, dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["Session"]] = contextvars.ContextVar(
+    "novix_session", default=None
+)
+
+
+def current_session() -> Optional["Session"]:
+    """The session of the request being served, None outside of one"""
+    return _current.get()
+
+
+def session_state() -> Dict[str, Any]:
+    """State of the current conversation; a throwaway dict outside a request"""
+    session = _current.get()
+    return session.state if session is not None else {}
+
+
+def session_key(data: Any) -> Optional[str]:
+    """The conversation a request belongs to, by conversation_id then user_id"""
+    if not isinstance(data, dict):
+        return None
+    key = data.get("conversation_id") or data.get("user_id")
+    return str(key) if key else None
+
+
+def approx_size(obj: Any, depth: int = 4) -> int:
+    """Rough deep size of plain containers; other objects count shallowly"""
+    size = sys.getsizeof(obj, 64)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approx_size(key, depth - 1) + approx_size(value, depth - 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item, depth - 1)
+    return size
+
+
+class Session:
+    """Per-conversation state kept next to one shared agent instance"""
+
+    __slots__ = (
+        "key",
+        "user_id",
+        "state",
+        "created",
+        "last_used",
+        "size",
+        "in_use",
+        "started",
+        "lock",
+        "stamp",
+        "saved",
+    )
+
+    def __init__(self, key: Tuple[str, str], user_id: Optional[str] = None):
+        self.key = key
+        self.user_id = user_id
+        self.state: Dict[str, Any] = {}
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.size = 0
+        self.in_use = 0
+        self.started = False
+        self.lock = asyncio.Lock()
+        # Store stamp of the snapshot this state matches, and its bytes' hash
+        self.stamp: Optional[str] = None
+        self.saved: Optional[int] = None
+
+    @property
+    def id(self) -> str:
+        return self.key[1]
+
+
+class SessionPool:
+    """Conversation state for every client of an agent, bounded in size.
+
+    The agent is loaded once and shared; what differs between users lives
+    in a Session, reachable from agent code through current_session() or
+    session_state(). Requests of one conversation are served one at a time
+    so its state is never mutated concurrently.
+
+    An agent that needs more than a dict (a memory client per user, say)
+    defines ``new_session(session)``, sync or async, which runs before the
+    conversation's first request.
+
+    Idle sessions go after ``idle_ttl`` seconds; the least recently used are
+    evicted past ``max_sessions`` or ``max_bytes`` of estimated state.
+
+    With a ``store``, state is loaded on a conversation's first request in
+    this process and written behind: changed sessions are snapshotted every
+    ``flush_interval`` seconds, and on eviction, in one batch. Against a
+    shared store a cached session is refreshed when another replica wrote
+    it since, so no sticky routing is needed. Keys of session.state that
+    start with "_" hold runtime objects and are never stored.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        idle_ttl: float = 1800,
+        max_bytes: int = 0,
+        on_evict: Optional[Callable[[str], None]] = None,
+        store: Optional[SessionStore] = None,
+        flush_interval: float = 0.1,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.sessions: "OrderedDict[Tuple[str, str], Session]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self.store = store
+        self.flush_interval = flush_interval
+        self._dirty: Set[Session] = set()
+        # Snapshots taken but not yet written: key -> (stamp, data)
+        self._pending: Dict[str, Tuple[str, bytes]] = {}
+        self._saving: Dict[str, Tuple[str, bytes]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.store and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def stop(self):
+        """Write every outstanding change and close the store"""
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self.store:
+            await self.flush()
+            await self.store.close()
+
+    @asynccontextmanager
+    async def session(self, agent: Any, data: Any, namespace: str = ""):
+        """Serve one request of ``agent`` inside its conversation's session
+
+        Requests without a conversation_id or user_id get a session of their
+        own that is dropped afterwards.
+        """
+        session_id = session_key(data)
+        user_id = data.get("user_id") if isinstance(data, dict) else None
+        if session_id is None:
+            session = Session((namespace, ""), user_id)
+            await self._start(agent, session)
+            token = _current.set(session)
+            try:
+                yield session
+            finally:
+                _current.reset(token)
+            return
+
+        key = (namespace, session_id)
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = Session(key, user_id)
+        self.sessions.move_to_end(key)
+        session.in_use += 1
+        try:
+            async with session.lock:
+                if self.store:
+                    await self._restore(session)
+                if not session.started:
+                    await self._start(agent, session)
+                token = _current.set(session)
+                try:
+                    yield session
+                finally:
+                    _current.reset(token)
+        finally:
+            session.in_use -= 1
+            session.last_used = time.monotonic()
+            if session.started and self.sessions.get(key) is session:
+                size = approx_size(session.state)
+                self.bytes += size - session.size
+                session.size = size
+                if self.store:
+                    self._dirty.add(session)
+            self._make_room()
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle for longer than ``idle_ttl``"""
+        if not self.idle_ttl:
+            return 0
+        now = time.monotonic()
+        expired = [
+            session
+            for session in self.sessions.values()
+            if not session.in_use and now - session.last_used > self.idle_ttl
+        ]
+        for session in expired:
+            self._evict(session, "idle")
+        return len(expired)
+
+    def drop(self, namespace: str) -> int:
+        """Forget every session of one agent, e.g. when it is unloaded"""
+        stale = [
+            session
+            for key, session in self.sessions.items()
+            if key[0] == namespace and not session.in_use
+        ]
+        for session in stale:
+            self._remove(session)
+        return len(stale)
+
+    async def flush(self):
+        """Snapshot changed sessions and write them in one batch"""
+        for session in self._dirty:
+            self._snapshot(session)
+        self._dirty.clear()
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._saving = batch
+        try:
+            await self.store.save(batch)
+        except BaseException as e:
+            # Keep them for the next flush unless they changed meanwhile;
+            # rewriting a batch that did land is harmless
+            for key, item in batch.items():
+                self._pending.setdefault(key, item)
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"Failed to save {len(batch)} sessions: {e}")
+        finally:
+            self._saving = {}
+
+    async def expire_stored(self, max_age: float) -> int:
+        if not self.store or not max_age:
+            return 0
+        return await self.store.expire(max_age)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "bytes": self.bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "idle_ttl": self.idle_ttl,
+            "evictions": self.evictions,
+            "unsaved": len(
+                self._pending.keys() | {self._store_key(s) for s in self._dirty}
+            ),
+        }
+
+    @staticmethod
+    def _store_key(session: Session) -> str:
+        namespace, session_id = session.key
+        return f"{namespace}/{session_id}"
+
+    async def _restore(self, session: Session):
+        """Bring the state up to date with the store, loading it lazily"""
+        store_key = self._store_key(session)
+        pending = self._pending.get(store_key) or self._saving.get(store_key)
+        if pending or session in self._dirty:
+            # This process holds the newest copy
+            if pending and not session.started:
+                self._apply(session, *pending)
+            return
+        if session.started and not self.store.shared:
+            return
+        try:
+            snapshot = await self.store.load(store_key, session.stamp)
+        except Exception as e:
+            logger.error(f"Failed to load session {session.id}: {e}")
+            return
+        if snapshot:
+            self._apply(session, *snapshot)
+
+    def _apply(self, session: Session, stamp: str, data: bytes):
+        try:
+            state = loads(data)
+        except Exception as e:
+            logger.error(f"Discarding unreadable session {session.id}: {e}")
+            return
+        # Runtime objects made by new_session stay; stored keys are replaced
+        runtime = {k: v for k, v in session.state.items() if k.startswith("_")}
+        session.state.clear()
+        session.state.update(state)
+        session.state.update(runtime)
+        session.stamp = stamp
+        session.saved = hash(data)
+
+    def _snapshot(self, session: Session):
+        data = dumps(session.state)
+        digest = hash(data)
+        if digest == session.saved:
+            return
+        session.stamp = uuid.uuid4().hex
+        session.saved = digest
+        self._pending[self._store_key(session)] = (session.stamp, data)
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Session flush failed: {e}")
+
+    async def _start(self, agent: Any, session: Session):
+        await run_hook(agent, "new_session", session)
+        session.started = True
+
+    def _make_room(self):
+        over_count = len(self.sessions) - self.max_sessions
+        if over_count <= 0 and not (self.max_bytes and self.bytes > self.max_bytes):
+            return
+        victims: List[Tuple[Session, str]] = []
+        bytes_left = self.bytes
+        for session in self.sessions.values():
+            if over_count <= 0 and not (self.max_bytes and bytes_left > self.max_bytes):
+                break
+            if session.in_use:
+                continue
+            victims.append((session, "lru" if over_count > 0 else "memory"))
+            over_count -= 1
+            bytes_left -= session.size
+        for session, reason in victims:
+            self._evict(session, reason)
+
+    def _evict(self, session: Session, reason: str):
+        self._remove(session)
+        self.evictions += 1
+        if self.on_evict:
+            self.on_evict(reason)
+        logger.debug(f"Evicted session {session.id} ({reason})")
+
+    def _remove(self, session: Session):
+        if self.sessions.pop(session.key, None) is session:
+            self.bytes -= session.size
+        if session in self._dirty:
+            self._dirty.discard(session)
+            self._snapshot(session)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+
+# Server-wide defaults; 0 forwards every delta the moment it arrives
+COALESCE_MS = float(os.getenv("NOVIX_STREAM_COALESCE_MS", "0"))
+COALESCE_CHARS = int(os.getenv("NOVIX_STREAM_COALESCE_CHARS", "0"))
+
+_END = object()
+
+
+async def _text_deltas(
+    result: Any, on_message: Optional[Callable[[str], Awaitable[None]]]
+) -> AsyncGenerator[str, None]:
+    """Text deltas of a Runner.run_streamed() result, as the model emits them"""
+    message = []
+    async for event in result.stream_events():
+        if event.type == "raw_response_event":
+            data = event.data
+            if getattr(data, "type", None) == "response.output_text.delta":
+                message.append(data.delta)
+                yield data.delta
+        elif (
+            event.type == "run_item_stream_event"
+            and event.item.type == "message_output_item"
+        ):
+            if on_message:
+                await on_message("".join(message))
+            message = []
+
+
+async def stream_text_deltas(
+    result: Any,
+    coalesce_ms: Optional[float] = None,
+    coalesce_chars: Optional[int] = None,
+    on_message: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Stream the text of an OpenAI Agents SDK run token by token.
+
+    Args:
+        result: The object returned by Runner.run_streamed()
+        coalesce_ms: Hold deltas for up to this long and send them as one
+            chunk; fewer, larger frames for clients that can't keep up
+        coalesce_chars: Send early once this many characters are held
+        on_message: Awaited with the full text of each completed assistant
+            message, e.g. to store it in conversation memory
+
+    Yields:
+        Text chunks as soon as the model produces them
+    """
+    coalesce_ms = COALESCE_MS if coalesce_ms is None else coalesce_ms
+    coalesce_chars = COALESCE_CHARS if coalesce_chars is None else coalesce_chars
+    deltas = _text_deltas(result, on_message)
+    task = None
+    finished = False
+    try:
+        if not coalesce_ms and not coalesce_chars:
+            async for delta in deltas:
+                yield delta
+            finished = True
+            return
+
+        # Read the run in its own task so a quiet model (a tool call, a slow
+        # token) can't hold a partial chunk past the window
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for delta in deltas:
+                    await queue.put(delta)
+            except BaseException as e:
+                await queue.put(e)
+                return
+            await queue.put(_END)
+
+        task = asyncio.create_task(pump())
+        buffer = []
+        size = 0
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if isinstance(item, BaseException):
+                raise item
+            if item is not None and item is not _END:
+                if not buffer and coalesce_ms:
+                    deadline = time.monotonic() + coalesce_ms / 1000
+                buffer.append(item)
+                size += len(item)
+                if not coalesce_chars or size < coalesce_chars:
+                    continue
+
+            # Window elapsed, size reached or the run finished
+            if buffer:
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+            deadline = None
+            if item is _END:
+                finished = True
+                return
+    finally:
+        if not finished:
+            # The client went away or the request was cancelled: stop the
+            # SDK run too, or it keeps consuming the upstream model call
+            cancel = getattr(result, "cancel", None)
+            if cancel is not None:
+                cancel()
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await deltas.aclose()
@@ -0,0 +1,191 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EMPTY = 0
+STARTING = 1
+READY = 2
+FAILED = 3
+
+# Shared with every forked worker; one slot per worker process
+_readiness = None
+_slot: Optional[int] = None
+
+
+def set_worker_state(state: int):
+    if _readiness is not None and _slot is not None:
+        _readiness[_slot] = state
+
+
+def worker_readiness() -> Optional[Dict]:
+    """Readiness across the workers of this server, None when not pre-forked"""
+    if _readiness is None:
+        return None
+    states = list(_readiness)
+    return {
+        "worker": _slot,
+        "ready": states.count(READY),
+        "starting": states.count(STARTING),
+        "failed": states.count(FAILED),
+    }
+
+
+class WorkerSupervisor:
+    """Pre-fork process manager for server.py.
+
+    The parent binds the listening socket once and forks ``workers``
+    processes that each run their own event loop on it, so one worker stuck
+    in a blocking call no longer stalls every client. SIGHUP replaces the
+    workers one at a time, waiting for each replacement to report ready
+    before the old one is asked to finish its in-flight requests.
+    """
+
+    def __init__(
+        self,
+        serve: Callable[[socket.socket], None],
+        workers: int,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        prepare: Optional[Callable[[], None]] = None,
+        ready_timeout: float = 60.0,
+        stop_timeout: float = 30.0,
+    ):
+        self.serve = serve
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.prepare = prepare
+        self.ready_timeout = ready_timeout
+        self.stop_timeout = stop_timeout
+        self.children: Dict[int, int] = {}
+        self._reload = False
+        self._stopping = False
+
+    def run(self):
+        global _readiness
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+
+        # Twice the worker count so replacements can start beside old workers
+        _readiness = multiprocessing.RawArray("b", [EMPTY] * self.workers * 2)
+        for _ in range(self.workers):
+            self._spawn(sock)
+        logger.info(f"Started {self.workers} workers on {self.host}:{self.port}")
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._rolling_reload(sock)
+            self._reap(sock)
+            time.sleep(0.5)
+
+        self._shutdown()
+        sock.close()
+
+    def _spawn(self, sock: socket.socket) -> int:
+        global _slot
+        slot = next(
+            index
+            for index in range(len(_readiness))
+            if index not in self.children.values()
+        )
+        _readiness[slot] = STARTING
+        pid = os.fork()
+        if pid == 0:
+            _slot = slot
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                self.serve(sock)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+        return pid
+
+    def _reap(self, sock: socket.socket):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            _readiness[slot] = EMPTY
+            if not self._stopping:
+                logger.error(f"Worker {pid} exited with status {status}; restarting")
+                time.sleep(1)
+                self._spawn(sock)
+
+    def _rolling_reload(self, sock: socket.socket):
+        logger.info("Reloading workers")
+        if self.prepare:
+            try:
+                self.prepare()
+            except Exception as e:
+                logger.error(f"Reload aborted, agent failed to load: {e}")
+                return
+
+        for old_pid in list(self.children):
+            new_pid = self._spawn(sock)
+            slot = self.children[new_pid]
+            deadline = time.monotonic() + self.ready_timeout
+            while _readiness[slot] == STARTING and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if _readiness[slot] != READY:
+                logger.error("Replacement worker never became ready; reload aborted")
+                self._terminate(new_pid)
+                return
+            self._terminate(old_pid)
+        logger.info("Workers reloaded")
+
+    def _terminate(self, pid: int):
+        # uvicorn finishes in-flight requests on SIGTERM before exiting
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.stop_timeout
+        while time.monotonic() < deadline:
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    break
+            except ChildProcessError:
+                break
+            time.sleep(0.1)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        slot = self.children.pop(pid, None)
+        if slot is not None:
+            _readiness[slot] = EMPTY
+
+    def _shutdown(self):
+        logger.info("Stopping workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.children):
+            self._terminate(pid)
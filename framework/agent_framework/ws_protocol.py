@@ -0,0 +1,176 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Offered in Sec-WebSocket-Protocol; clients that offer nothing get TEXT
+TEXT = "novix.text.v1"
+MSGPACK = "novix.msgpack.v2"
+
+
+def supported_subprotocols() -> List[str]:
+    return ([MSGPACK] if msgpack else []) + [TEXT]
+
+
+def negotiate(offered: List[str]) -> Optional[str]:
+    """The first subprotocol the client offered that we speak"""
+    supported = supported_subprotocols()
+    for subprotocol in offered:
+        if subprotocol in supported:
+            return subprotocol
+    return None
+
+
+def structured(chunk: Any) -> Optional[Dict]:
+    """The chunk as a BaseAgent response dict, if it is one"""
+    if isinstance(chunk, str):
+        if not chunk.startswith("{"):
+            return None
+        try:
+            chunk = json.loads(chunk)
+        except ValueError:
+            return None
+    if isinstance(chunk, dict) and "content" in chunk:
+        return chunk
+    return None
+
+
+class TextProtocol:
+    """The original protocol: a text query in, text chunks and "[DONE]" out.
+
+    One query is answered at a time; request ids are accepted and ignored.
+    """
+
+    name = TEXT
+    multiplexed = False
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+
+    async def receive(self) -> Dict:
+        return {"query": await self.websocket.receive_text()}
+
+    async def begin(self, request_id: str):
+        pass
+
+    def finish(self, request_id: str):
+        pass
+
+    def text(self, chunk: Any) -> Optional[str]:
+        """Text to buffer for the chunk, or None to send it with send_structured"""
+        return chunk if isinstance(chunk, str) else json.dumps(chunk)
+
+    async def send_text(self, request_id: str, text: str):
+        await self.websocket.send_text(text)
+
+    async def send_structured(self, request_id: str, chunk: Dict):
+        await self.websocket.send_text(json.dumps(chunk))
+
+    async def end(self, request_id: str, stats: Dict):
+        await self.websocket.send_text("[DONE]")
+
+    async def error(self, request_id: str, message: str):
+        await self.websocket.send_text(f"Error: {message}")
+
+    async def cancelled(self, request_id: str):
+        pass
+
+    async def fatal(self, message: str):
+        """The connection can't be served at all"""
+        await self.websocket.send_json({"error": message, "type": "error"})
+
+
+class MsgpackProtocol(TextProtocol):
+    """Binary envelopes with explicit start/end/error frames, multiplexed.
+
+    Clients send msgpack maps: ``{"type": "query", "id": ..., "query": ...}``
+    or ``{"type": "cancel", "id": ...}``; a plain text frame is a query
+    without an id. Several queries may be in flight on one socket.
+
+    Server frames are msgpack maps carrying the request ``id`` and a type
+    ``t``: ``start``, ``meta`` (``m``, sent only when it changes),
+    ``chunk`` (``d``), ``end`` (``stats``), ``error`` (``e``) and
+    ``cancelled``. BaseAgent-style chunks ({"content", "metadata", ...}) are
+    split so their metadata crosses the wire once per message instead of
+    once per chunk.
+    """
+
+    name = MSGPACK
+    multiplexed = True
+
+    def __init__(self, websocket: WebSocket):
+        super().__init__(websocket)
+        self._meta: Dict[str, Dict] = {}
+
+    async def _send(self, request_id: str, frame: Dict):
+        frame["id"] = request_id
+        await self.websocket.send_bytes(msgpack.packb(frame))
+
+    async def receive(self) -> Dict:
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            data = msgpack.unpackb(message["bytes"])
+            return data if isinstance(data, dict) else {"query": data}
+        return {"query": message["text"]}
+
+    async def begin(self, request_id: str):
+        await self._send(request_id, {"t": "start"})
+
+    def finish(self, request_id: str):
+        self._meta.pop(request_id, None)
+
+    def text(self, chunk: Any) -> Optional[str]:
+        if isinstance(chunk, str) and structured(chunk) is None:
+            return chunk
+        return None
+
+    async def send_text(self, request_id: str, text: str):
+        await self._send(request_id, {"t": "chunk", "d": text})
+
+    async def send_structured(self, request_id: str, chunk: Dict):
+        chunk = structured(chunk) or {"content": chunk}
+        meta = {key: value for key, value in chunk.items() if key != "content"}
+        # Per-chunk timestamps alone don't make the metadata new
+        comparable = {
+            **meta,
+            "metadata": {
+                key: value
+                for key, value in (meta.get("metadata") or {}).items()
+                if key != "timestamp"
+            },
+        }
+        if comparable != self._meta.get(request_id):
+            self._meta[request_id] = comparable
+            await self._send(request_id, {"t": "meta", "m": meta})
+        await self._send(request_id, {"t": "chunk", "d": chunk["content"]})
+
+    async def end(self, request_id: str, stats: Dict):
+        await self._send(request_id, {"t": "end", "stats": stats})
+
+    async def error(self, request_id: str, message: str):
+        await self._send(request_id, {"t": "error", "e": message})
+
+    async def cancelled(self, request_id: str):
+        await self._send(request_id, {"t": "cancelled"})
+
+    async def fatal(self, message: str):
+        await self.error(None, message)
+
+
+async def accept(websocket: WebSocket) -> TextProtocol:
+    """Accept the WebSocket with the best subprotocol both sides speak"""
+    subprotocol = negotiate(websocket.scope.get("subprotocols") or [])
+    await websocket.accept(subprotocol=subprotocol)
+    if subprotocol == MSGPACK:
+        return MsgpackProtocol(websocket)
+    return TextProtocol(websocket)
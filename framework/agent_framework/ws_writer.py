@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop", "disconnect")
+
+
+class SlowConsumer(Exception):
+    pass
+
+
+def writer_options() -> Dict:
+    """FrameWriter settings from the NOVIX_WS_* environment variables"""
+    policy = os.getenv("NOVIX_WS_BACKPRESSURE", "block")
+    if policy not in POLICIES:
+        raise ValueError(f"NOVIX_WS_BACKPRESSURE must be one of {POLICIES}")
+    return {
+        "max_frame_bytes": int(os.getenv("NOVIX_WS_FRAME_BYTES", "0")),
+        "flush_interval": float(os.getenv("NOVIX_WS_FLUSH_MS", "0")) / 1000,
+        "max_buffer_bytes": int(os.getenv("NOVIX_WS_BUFFER_BYTES", str(1 << 20))),
+        "policy": policy,
+    }
+
+
+class FrameWriter:
+    """Bounded buffer between an agent's stream and a WebSocket.
+
+    The agent writes chunks without waiting on the socket; a sender task
+    drains them. With ``max_frame_bytes`` set, queued chunks are merged
+    into frames of up to that size. With ``flush_interval`` set, a frame is
+    given up to that long to fill before it is sent; on its own it merges
+    whatever arrived meanwhile into one frame. Merging concatenates text,
+    so leave both off (the default) for agents that yield one JSON document
+    per chunk.
+
+    Once ``max_buffer_bytes`` are queued the policy decides: ``block``
+    pauses the agent until the client catches up, ``drop`` discards the
+    oldest queued chunks (for streams where only the latest state
+    matters), ``disconnect`` raises SlowConsumer.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable],
+        max_frame_bytes: int = 0,
+        flush_interval: float = 0.0,
+        max_buffer_bytes: int = 1 << 20,
+        policy: str = "block",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.send = send
+        self.max_frame_bytes = max_frame_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.policy = policy
+        # Merge limit of a frame: none when only the flush interval is set
+        self._frame_bytes = max_frame_bytes or (float("inf") if flush_interval else 0)
+        self.frames = 0
+        self.dropped = 0
+        self._pending: deque = deque()
+        self._pending_bytes = 0
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._pending_bytes
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def write(self, chunk: str) -> int:
+        """Queue a chunk and return its size in bytes"""
+        if self._error:
+            raise self._error
+        size = len(chunk.encode())
+        if self._pending and self._pending_bytes + size > self.max_buffer_bytes:
+            if self.policy == "disconnect":
+                raise SlowConsumer(
+                    f"Client fell {self._pending_bytes} bytes behind the stream"
+                )
+            if self.policy == "drop":
+                while self._pending and (
+                    self._pending_bytes + size > self.max_buffer_bytes
+                ):
+                    self._pop()
+                    self.dropped += 1
+            else:
+                while self._pending and (
+                    self._pending_bytes + size > self.max_buffer_bytes
+                ):
+                    self._room.clear()
+                    await self._room.wait()
+                    if self._error:
+                        raise self._error
+
+        if self._task is None:
+            self.start()
+        self._pending.append((chunk, size))
+        self._pending_bytes += size
+        self._drained.clear()
+        self._wakeup.set()
+        return size
+
+    async def flush(self):
+        """Wait until everything written so far has been sent"""
+        await self._drained.wait()
+        if self._error:
+            raise self._error
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _pop(self):
+        chunk, size = self._pending.popleft()
+        self._pending_bytes -= size
+        return chunk, size
+
+    async def _run(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                if self.flush_interval:
+                    # Give the frame a moment to fill before sending it
+                    loop = asyncio.get_running_loop()
+                    deadline = loop.time() + self.flush_interval
+                    while (
+                        self._pending_bytes < self._frame_bytes
+                        and loop.time() < deadline
+                    ):
+                        try:
+                            await asyncio.wait_for(
+                                self._wakeup.wait(), deadline - loop.time()
+                            )
+                        except asyncio.TimeoutError:
+                            break
+                        self._wakeup.clear()
+
+                while self._pending:
+                    chunk, size = self._pop()
+                    frame = [chunk]
+                    while (
+                        self._pending
+                        and size + self._pending[0][1] <= self._frame_bytes
+                    ):
+                        chunk, chunk_size = self._pop()
+                        frame.append(chunk)
+                        size += chunk_size
+                    await self.send("".join(frame))
+                    self.frames += 1
+                    self._room.set()
+                self._drained.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+            self._room.set()
+            self._drained.set()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRegistry:
+    """Read-through cache of agent documents in front of MongoDB.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are
+    dropped past ``max_entries``. Writes made through :meth:`update` invalidate
+    locally; when MongoDB runs as a replica set a change stream also picks up
+    writes from other API replicas. Without change streams the TTL bounds how
+    stale another replica's write can be.
+    """
+
+    def __init__(self, collection, ttl: float = 30.0, max_entries: int = 10000):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.change_stream_active = False
+        self._ids_by_object_id: Dict = {}
+        self._invalidations = 0
+        self._watch_task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        # The port index is unique and owned by PortAllocator
+        try:
+            await self.collection.create_index("id", unique=True)
+            await self.collection.create_index("status")
+        except OperationFailure as e:
+            logger.error(f"Could not create agent indexes: {str(e)}")
+
+    def start(self):
+        self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+
+    async def get(self, agent_id: str) -> Optional[Dict]:
+        """Return a copy of the agent document, loading it on a miss"""
+        entry = self.entries.get(agent_id)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            self.entries.move_to_end(agent_id)
+            return dict(entry[1])
+
+        self.misses += 1
+        invalidations = self._invalidations
+        agent = await self.collection.find_one({"id": agent_id})
+        if agent is None:
+            self.entries.pop(agent_id, None)
+            return None
+        # Don't cache a read that raced with a write
+        if invalidations == self._invalidations:
+            self._store(agent)
+        return dict(agent)
+
+    async def update(self, agent_id: str, update: Dict):
+        """update_one on the agent with local write-through invalidation"""
+        result = await self.collection.update_one({"id": agent_id}, update)
+        self.invalidate(agent_id)
+        return result
+
+    def invalidate(self, agent_id: str):
+        self._invalidations += 1
+        entry = self.entries.pop(agent_id, None)
+        if entry:
+            self._ids_by_object_id.pop(entry[1].get("_id"), None)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "ttl": self.ttl,
+            "change_stream_active": self.change_stream_active,
+        }
+
+    def _store(self, agent: Dict):
+        self.entries[agent["id"]] = (time.monotonic() + self.ttl, agent)
+        self.entries.move_to_end(agent["id"])
+        self._ids_by_object_id[agent.get("_id")] = agent["id"]
+        while len(self.entries) > self.max_entries:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self._ids_by_object_id.pop(evicted.get("_id"), None)
+
+    async def _watch(self):
+        while True:
+            try:
+                async with self.collection.watch() as stream:
+                    self.change_stream_active = True
+                    logger.info("Agent registry following change stream")
+                    async for change in stream:
+                        object_id = change.get("documentKey", {}).get("_id")
+                        agent_id = self._ids_by_object_id.get(object_id)
+                        if agent_id:
+                            self.invalidate(agent_id)
+            except OperationFailure as e:
+                # Standalone servers have no change streams; rely on write-through
+                self.change_stream_active = False
+                logger.info(f"Change streams unavailable, using write-through: {e}")
+                return
+            except PyMongoError as e:
+                self.change_stream_active = False
+                self.entries.clear()
+                self._ids_by_object_id.clear()
+                logger.error(f"Agent change stream interrupted: {str(e)}")
+                await asyncio.sleep(5)
@@ -7,30 +7,75 @@ from fastapi import (
     File,
     Depends,
     UploadFile,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
 )
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketState
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pydantic import BaseModel
-import docker
 import os
 import shutil
 import asyncio
 import uuid
 import aiofiles
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from contextlib import asynccontextmanager
+import hashlib
 import httpx
+import websockets
 from cryptography.fernet import Fernet
 from datetime import datetime
 from bson import ObjectId
 import json
+import base64
+import re
 from dotenv import load_dotenv
+from build_cache import DependencyCache, requirements_within, run_docker
+from build_logs import BuildLogStore
+from container_runtime import ContainerNotFound, ImageNotFound, create_runtime
+from port_allocator import NoPortsAvailable, PortAllocator, parse_port_ranges
+from gateway import AgentGateway, AgentUnavailable
+from agent_registry import AgentRegistry
+from scaling import AgentScaler, ColdStartError
+from warm_pool import WarmPool
+from build_scheduler import BuildScheduler, PRIORITY_CREATE, PRIORITY_UPDATE
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Engine AI Agent Deployment")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await agent_registry.ensure_indexes()
+    agent_registry.start()
+    await dependency_cache.load()
+    await port_allocator.load()
+    await ensure_agent_list_indexes()
+    await agent_gateway.start()
+    agent_scaler.start()
+    await warm_pool.start(
+        await db[COLLECTION_NAME].distinct("port", {"port": {"$type": "int"}})
+    )
+    # Warm the shared base image so the first agent upload does not pay for it
+    base_image_task = asyncio.create_task(warm_base_image())
+    build_scheduler.start()
+    yield
+    await build_scheduler.stop()
+    base_image_task.cancel()
+    await container_runtime.close()
+    await agent_scaler.stop()
+    await warm_pool.stop()
+    await agent_gateway.close()
+    await agent_registry.stop()
+
+
+app = FastAPI(title="Engine AI Agent Deployment", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +91,9 @@ MONGODB_URL = os.getenv("MONGODB_URL", "")
 DATABASE_NAME = "novix_db_00"
 COLLECTION_NAME = "agents_fast"
 SERVER_IP = os.getenv("SERVER_IP", "localhost")
+API_PORT = int(os.getenv("API_PORT", "9000"))
+# Where this API reaches the published agent ports
+AGENT_HOST = os.getenv("AGENT_HOST", "localhost")
 
 mongo_client = AsyncIOMotorClient(MONGODB_URL)
 db = mongo_client[DATABASE_NAME]
@@ -73,7 +121,7 @@ async def get_db() -> AsyncIOMotorDatabase:
     return db
 
 
-client = docker.from_env()
+container_runtime = create_runtime(os.getenv("CONTAINER_RUNTIME", "docker"))
 
 AGENTS_DIR = os.path.join(os.getcwd(), "agents")
 os.makedirs(AGENTS_DIR, exist_ok=True)
@@ -81,29 +129,64 @@ os.makedirs(AGENTS_DIR, exist_ok=True)
 DOCKER_CONTEXTS_DIR = os.path.join(os.getcwd(), "docker_contexts")
 os.makedirs(DOCKER_CONTEXTS_DIR, exist_ok=True)
 
-PORT_RANGE_START = 8100
-PORT_RANGE_END = 8999
-DOCKER_FILE_INIT_DATA = """FROM python:3.10-slim
+PORT_RANGE_START = int(os.getenv("PORT_RANGE_START", "8100"))
+PORT_RANGE_END = int(os.getenv("PORT_RANGE_END", "8999"))
+# Extra ranges may be given as "8100-8999,9100-9199"
+PORT_RANGES = parse_port_ranges(
+    os.getenv("PORT_RANGES", f"{PORT_RANGE_START}-{PORT_RANGE_END}")
+)
+
+# Shared runtime image (python + base requirements + agent_framework + server.py).
+# It is built once per content digest and every agent image is layered on top,
+# so an agent build only has to install its own requirements and copy agent.py.
+BASE_IMAGE_REPO = os.getenv("BASE_IMAGE_REPO", "novix-agent-base")
+# Bump when DOCKER_FILE_BASE_DATA changes in a way the digest cannot see
+BASE_IMAGE_VERSION = "1"
+BASE_IMAGE_FILES = ["base_requirements.txt", "server.py"]
+BASE_IMAGE_DIRS = ["agent_framework"]
+
+DOCKER_FILE_BASE_DATA = """FROM python:3.10-slim
 
 WORKDIR /app
 
 COPY base_requirements.txt .
 RUN pip install --no-cache-dir -r base_requirements.txt
 
-COPY requirements.txt .
-RUN pip install --no-cache-dir -r requirements.txt
-
 COPY agent_framework/ ./agent_framework/
 
-COPY agent.py .
-
 COPY server.py .
 
 EXPOSE 8000
 
+# Liveness only: the agent may still be in setup(), see /health/ready
+HEALTHCHECK --interval=10s --timeout=3s \\
+    CMD python -c "import urllib.request; urllib.request.urlopen('http://localhost:8000/health/live')"
+
 CMD ["python", "server.py"]
 """
 
+# Agent images sit on a dependency layer shared by every agent with the same
+# requirements (see build_cache.py), so all that is left is agent.py
+DOCKER_FILE_INIT_DATA = """FROM {deps_image}
+
+COPY agent.py .
+
+# Per-module import cost of agent.py, kept in the image and served at /_imports
+RUN python -m agent_framework.importtime agent.py --output import_profile.json
+"""
+
+dependency_cache = DependencyCache(
+    db["dependency_cache"],
+    DOCKER_CONTEXTS_DIR,
+    max_entries=int(os.getenv("DEPS_CACHE_MAX_ENTRIES", "200")),
+    max_bytes=int(os.getenv("DEPS_CACHE_MAX_BYTES", str(20 * 1024**3))),
+    wheelhouse_max_bytes=(
+        int(os.getenv("WHEELHOUSE_MAX_BYTES"))
+        if os.getenv("WHEELHOUSE_MAX_BYTES")
+        else None
+    ),
+)
+
 
 def generate_encryption_key():
     if not os.path.exists(ENCRYPTION_KEY_PATH):
@@ -139,71 +222,226 @@ def decrypt_env_vars(encrypted_env_vars: str) -> Dict[str, str]:
     return env_vars
 
 
-async def get_next_available_port(db: AsyncIOMotorDatabase) -> int:
-    used_ports = await db[COLLECTION_NAME].distinct(
-        "port", {"status": {"$ne": "deleted"}}
+port_allocator = PortAllocator(db[COLLECTION_NAME], PORT_RANGES)
+agent_registry = AgentRegistry(
+    db[COLLECTION_NAME], ttl=float(os.getenv("AGENT_CACHE_TTL", "30"))
+)
+
+
+def compute_base_image_name() -> str:
+    """Tag the base image with a digest of everything that goes into it"""
+    digest = hashlib.sha256()
+    digest.update(DOCKER_FILE_BASE_DATA.encode())
+    paths = list(BASE_IMAGE_FILES)
+    for directory in BASE_IMAGE_DIRS:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            paths.extend(
+                os.path.join(root, name)
+                for name in sorted(files)
+                if not name.endswith(".pyc")
+            )
+    for path in paths:
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return f"{BASE_IMAGE_REPO}:{BASE_IMAGE_VERSION}-{digest.hexdigest()[:12]}"
+
+
+BASE_IMAGE_NAME = compute_base_image_name()
+base_image_lock = asyncio.Lock()
+
+
+async def docker_image_exists(image_name: str) -> bool:
+    process = await asyncio.create_subprocess_exec(
+        "docker",
+        "image",
+        "inspect",
+        image_name,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
     )
-    for port in range(PORT_RANGE_START, PORT_RANGE_END + 1):
-        if port not in used_ports:
-            return port
-    raise HTTPException(status_code=400, detail="No available ports")
+    return await process.wait() == 0
+
+
+async def ensure_base_image(on_line: Optional[Callable[[str], None]] = None) -> str:
+    """Build the shared base image once; concurrent callers wait for the same build"""
+    async with base_image_lock:
+        if await docker_image_exists(BASE_IMAGE_NAME):
+            return BASE_IMAGE_NAME
+
+        context_dir = os.path.join(DOCKER_CONTEXTS_DIR, "_base")
+        if os.path.exists(context_dir):
+            shutil.rmtree(context_dir)
+        os.makedirs(context_dir)
+
+        with open(os.path.join(context_dir, "Dockerfile"), "w") as f:
+            f.write(DOCKER_FILE_BASE_DATA)
+        for path in BASE_IMAGE_FILES:
+            shutil.copy(path, context_dir)
+        for directory in BASE_IMAGE_DIRS:
+            shutil.copytree(
+                directory,
+                os.path.join(context_dir, directory),
+                ignore=shutil.ignore_patterns("__pycache__", "*.pyc"),
+            )
+
+        logger.info(f"Building base image {BASE_IMAGE_NAME}")
+        returncode, _, stderr = await run_docker(
+            "build", "-t", BASE_IMAGE_NAME, context_dir, on_line=on_line
+        )
+        if returncode != 0:
+            raise RuntimeError(f"Base image build failed: {stderr}")
+
+        logger.info(f"Base image {BASE_IMAGE_NAME} built successfully")
+        return BASE_IMAGE_NAME
+
+
+warm_pool = WarmPool(
+    container_runtime,
+    ensure_base_image,
+    parse_port_ranges(os.getenv("POOL_PORT_RANGE", "9800-9899")),
+    host=AGENT_HOST,
+    size=int(os.getenv("WARM_POOL_SIZE", "2")),
+)
+
+
+async def release_agent_port(agent_id: str):
+    port = await port_allocator.release(agent_id)
+    warm_pool.reclaim(port)
+
+
+async def warm_base_image():
+    try:
+        await ensure_base_image()
+    except Exception as e:
+        logger.error(f"Error building base image: {str(e)}")
 
 
 async def build_agent_docker_image(
     agent_id: str, agent_name: str, db: AsyncIOMotorDatabase
 ):
+    build_log = build_logs.start(agent_id)
+    build_status = "build_failed"
     try:
+        build_log.set_phase("base")
+        base_image = await ensure_base_image(on_line=build_log.append)
+
         context_dir = os.path.join(DOCKER_CONTEXTS_DIR, agent_id)
         os.makedirs(context_dir, exist_ok=True)
 
         agent_dir = os.path.join(AGENTS_DIR, agent_id)
+        with open(os.path.join(agent_dir, "requirements.txt")) as f:
+            requirements = f.read()
+        with open("base_requirements.txt") as f:
+            pool_eligible = requirements_within(requirements, f.read())
+        build_log.set_phase("dependencies")
+        deps_image = await dependency_cache.ensure(
+            requirements, base_image, on_line=build_log.append
+        )
+
         shutil.copy(os.path.join(agent_dir, "agent.py"), context_dir)
-        shutil.copy(os.path.join(agent_dir, "requirements.txt"), context_dir)
 
         with open(os.path.join(context_dir, "Dockerfile"), "w") as f:
-            f.write(DOCKER_FILE_INIT_DATA)
-
-        shutil.copy("base_requirements.txt", context_dir)
-        shutil.copy("server.py", context_dir)
-        shutil.copytree("agent_framework", os.path.join(context_dir, "agent_framework"))
+            f.write(DOCKER_FILE_INIT_DATA.format(deps_image=deps_image))
 
         image_name = f"ai-agent-{agent_id}"
         logger.info(f"Building docker image for agent {agent_id}")
-        process = await asyncio.create_subprocess_shell(
-            f"docker build -t {image_name} {context_dir}",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+        build_log.set_phase("agent")
+        returncode, _, output_tail = await run_docker(
+            "build", "-t", image_name, context_dir, on_line=build_log.append
         )
-        stdout, stderr = await process.communicate()
 
-        if process.returncode != 0:
-            logger.error(f"Docker build failed: {stderr.decode()}")
-            await db[COLLECTION_NAME].update_one(
-                {"id": agent_id}, {"$set": {"status": "build_failed"}}
-            )
+        if returncode != 0:
+            logger.error(f"Docker build failed: {output_tail}")
+            await agent_registry.update(agent_id, {"$set": {"status": "build_failed"}})
             raise HTTPException(
-                status_code=500, detail=f"Docker build failed: {stderr.decode()}"
+                status_code=500, detail=f"Docker build failed: {output_tail}"
             )
 
         logger.info(f"Docker image built successfully for {agent_id}")
-        await db[COLLECTION_NAME].update_one(
-            {"id": agent_id}, {"$set": {"image_name": image_name, "status": "built"}}
+        await agent_registry.update(
+            agent_id,
+            {
+                "$set": {
+                    "image_name": image_name,
+                    "status": "built",
+                    "pool_eligible": pool_eligible,
+                }
+            },
         )
+        build_status = "built"
         return image_name
 
+    except asyncio.CancelledError:
+        # Superseded by a newer upload; run_docker has already killed the build
+        build_status = "cancelled"
+        raise
+
     except Exception as e:
         logger.error(f"Error building Docker image: {str(e)}")
-        await db[COLLECTION_NAME].update_one(
-            {"id": agent_id}, {"$set": {"status": "build_failed"}}
-        )
+        await agent_registry.update(agent_id, {"$set": {"status": "build_failed"}})
         raise HTTPException(
             status_code=500, detail=f"Error building Docker image: {str(e)}"
         )
 
+    finally:
+        await build_logs.finish(build_log, build_status)
+
+
+build_logs = BuildLogStore(
+    db["build_logs"], max_lines=int(os.getenv("BUILD_LOG_MAX_LINES", "500"))
+)
+
+
+async def resolve_agent_port(agent_id: str) -> Optional[int]:
+    agent = await agent_registry.get(agent_id)
+    if not agent or agent.get("status") != "running":
+        return None
+    return agent.get("port")
+
+
+async def cold_start_agent(agent_id: str) -> Optional[int]:
+    agent = await agent_registry.get(agent_id)
+    if not agent or agent.get("status") not in ("built", "running"):
+        return None
+    result = await start_agent_container(agent_id, db)
+    return result["port"]
+
+
+async def list_running_agents() -> List[Dict]:
+    return await (
+        db[COLLECTION_NAME]
+        .find({"status": "running"}, {"_id": 0, "id": 1, "idle_timeout": 1})
+        .to_list(length=None)
+    )
+
+
+agent_scaler = AgentScaler(
+    start=cold_start_agent,
+    stop=lambda agent_id: stop_agent_container(agent_id, db),
+    list_running=list_running_agents,
+    host=AGENT_HOST,
+    idle_timeout=float(os.getenv("IDLE_TIMEOUT", "900")),
+    interval=float(os.getenv("IDLE_REAP_INTERVAL", "30")),
+    cold_start_timeout=float(os.getenv("COLD_START_TIMEOUT", "60")),
+)
+
+agent_gateway = AgentGateway(
+    resolve_agent_port,
+    host=AGENT_HOST,
+    per_agent_limit=int(os.getenv("GATEWAY_PER_AGENT_LIMIT", "32")),
+    scaler=agent_scaler,
+)
+
+build_scheduler = BuildScheduler(
+    build_agent_docker_image, workers=int(os.getenv("BUILD_WORKERS", "2"))
+)
+
 
 async def start_agent_container(agent_id: str, db: AsyncIOMotorDatabase):
     try:
-        agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
+        agent = await agent_registry.get(agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         if agent.get("status") == "build_failed":
@@ -211,36 +449,54 @@ async def start_agent_container(agent_id: str, db: AsyncIOMotorDatabase):
         if agent.get("status") == "running":
             return {"container_id": agent["container_id"], "port": agent["port"]}
 
-        if not agent.get("port"):
-            port = await get_next_available_port(db)
-            await db[COLLECTION_NAME].update_one(
-                {"id": agent_id}, {"$set": {"port": port}}
-            )
-            agent["port"] = port
-
         env_vars = decrypt_env_vars(agent.get("env_vars"))
 
-        container = client.containers.run(
+        # Agents that need nothing beyond the base image can take a pre-booted
+        # runtime from the warm pool instead of booting their own container
+        if agent.get("pool_eligible") and not agent.get("port"):
+            async with aiofiles.open(
+                os.path.join(AGENTS_DIR, agent_id, "agent.py"), "r"
+            ) as f:
+                source = await f.read()
+            pooled = await warm_pool.activate(agent_id, source, env_vars)
+            if pooled:
+                container_id, port = pooled
+                await agent_registry.update(
+                    agent_id,
+                    {
+                        "$set": {
+                            "container_id": container_id,
+                            "port": port,
+                            "status": "running",
+                        }
+                    },
+                )
+                return {"container_id": container_id, "port": port}
+
+        if not agent.get("port"):
+            try:
+                agent["port"] = await port_allocator.reserve(agent_id)
+            except NoPortsAvailable as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        container_id = await container_runtime.run(
             agent["image_name"],
-            detach=True,
-            ports={"8000/tcp": agent["port"]},
             name=f"agent-{agent_id}",
+            ports={"8000/tcp": agent["port"]},
             environment=env_vars,
         )
 
-        await db[COLLECTION_NAME].update_one(
-            {"id": agent_id},
-            {"$set": {"container_id": container.id, "status": "running"}},
+        await agent_registry.update(
+            agent_id,
+            {"$set": {"container_id": container_id, "status": "running"}},
         )
 
         logger.info(f"Started container for agent {agent_id} on port {agent['port']}")
-        return {"container_id": container.id, "port": agent["port"]}
+        return {"container_id": container_id, "port": agent["port"]}
 
     except Exception as e:
         logger.error(f"Error starting container: {str(e)}")
-        await db[COLLECTION_NAME].update_one(
-            {"id": agent_id}, {"$set": {"status": "start_failed"}}
-        )
+        await agent_registry.update(agent_id, {"$set": {"status": "start_failed"}})
         raise HTTPException(
             status_code=500, detail=f"Error starting container: {str(e)}"
         )
@@ -248,21 +504,21 @@ async def start_agent_container(agent_id: str, db: AsyncIOMotorDatabase):
 
 async def stop_agent_container(agent_id: str, db: AsyncIOMotorDatabase):
     try:
-        agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
+        agent = await agent_registry.get(agent_id)
         if not agent or not agent.get("container_id"):
             return
 
+        agent_gateway.forget(agent_id)
         try:
-            container = client.containers.get(agent["container_id"])
-            container.stop(timeout=5)
-            container.remove()
-        except docker.errors.NotFound:
+            await container_runtime.stop(agent["container_id"], timeout=5)
+        except ContainerNotFound:
             pass
         except Exception as e:
             logger.error(f"Error stopping container: {str(e)}")
 
-        await db[COLLECTION_NAME].update_one(
-            {"id": agent_id}, {"$set": {"status": "built", "container_id": None}}
+        await release_agent_port(agent_id)
+        await agent_registry.update(
+            agent_id, {"$set": {"status": "built", "container_id": None}}
         )
         logger.info(f"Stopped container for agent {agent_id}")
 
@@ -277,9 +533,24 @@ async def stop_agent_container(agent_id: str, db: AsyncIOMotorDatabase):
 def read_root():
     return {"Hello": "World"}
 
+
+@app.get("/api/build-cache/")
+async def get_build_cache_stats():
+    return dependency_cache.stats()
+
+
+@app.get("/api/ports/")
+async def get_port_usage():
+    return port_allocator.stats()
+
+
+@app.get("/api/builds/")
+async def get_build_queue():
+    return build_scheduler.stats()
+
+
 @app.post("/api/agents/")
 async def create_agent(
-    background_tasks: BackgroundTasks,
     name: str = Form(...),
     description: str = Form(None),
     agent_file: UploadFile = File(...),
@@ -318,7 +589,7 @@ async def create_agent(
         }
 
         await db[COLLECTION_NAME].insert_one(agent)
-        background_tasks.add_task(build_agent_docker_image, agent_id, name, db)
+        build_scheduler.submit(agent_id, name, db, priority=PRIORITY_CREATE)
 
         return {"id": agent_id, "name": name, "status": "created"}
 
@@ -329,26 +600,110 @@ async def create_agent(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+AGENT_LIST_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "description": 1,
+    "status": 1,
+    "created_at": 1,
+    "port": 1,
+}
+AGENT_LIST_SORT = [("created_at", -1), ("id", -1)]
+
+
+async def ensure_agent_list_indexes():
+    collection = db[COLLECTION_NAME]
+    await collection.create_index(AGENT_LIST_SORT)
+    await collection.create_index([("status", 1)] + AGENT_LIST_SORT)
+    await collection.create_index([("name", 1)] + AGENT_LIST_SORT)
+
+
+def encode_list_cursor(agent: Dict) -> str:
+    payload = json.dumps(
+        {"created_at": agent["created_at"].isoformat(), "id": agent["id"]}
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_list_cursor(cursor: str) -> Dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            "created_at": datetime.fromisoformat(payload["created_at"]),
+            "id": payload["id"],
+        }
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def serialize_agent_summary(agent: Dict) -> Dict:
+    return {
+        "id": agent["id"],
+        "name": agent["name"],
+        "description": agent.get("description"),
+        "status": agent["status"],
+        "created_at": agent["created_at"].isoformat(),
+        "port": agent.get("port"),
+    }
+
+
 @app.get("/api/agents/")
-async def list_agents(db: AsyncIOMotorDatabase = Depends(get_db)):
-    agents = []
-    async for agent in db[COLLECTION_NAME].find({"status": {"$ne": "deleted"}}):
-        agents.append(
-            {
-                "id": agent["id"],
-                "name": agent["name"],
-                "description": agent.get("description"),
-                "status": agent["status"],
-                "created_at": agent["created_at"],
-                "port": agent.get("port"),
-            }
-        )
-    return agents
+async def list_agents(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+):
+    """List agents newest first.
+
+    Without ``limit`` or ``cursor`` this is the plain list of every matching
+    agent, as before. With either, one page of ``limit`` (default 50) comes
+    back as ``{"items", "next_cursor"}``; pass ``next_cursor`` back as
+    ``cursor`` for the next page. ``name`` matches a name prefix.
+    ``format=ndjson`` streams every matching agent, one JSON object per line.
+    """
+    query: Dict = {"status": status if status else {"$ne": "deleted"}}
+    if name:
+        query["name"] = {"$regex": f"^{re.escape(name)}"}
+    if cursor:
+        position = decode_list_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": position["created_at"]}},
+            {"created_at": position["created_at"], "id": {"$lt": position["id"]}},
+        ]
+
+    results = (
+        db[COLLECTION_NAME].find(query, AGENT_LIST_PROJECTION).sort(AGENT_LIST_SORT)
+    )
+
+    if output_format == "ndjson":
+
+        async def lines():
+            async for agent in results.batch_size(500):
+                yield json.dumps(serialize_agent_summary(agent)) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    if limit is None and cursor is None:
+        agents = await results.batch_size(500).to_list(length=None)
+        return [serialize_agent_summary(agent) for agent in agents]
+
+    limit = limit or 50
+    # One extra document tells us whether there is another page
+    agents = await results.limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_list_cursor(agents[limit - 1]) if len(agents) > limit else None
+    return {
+        "items": [serialize_agent_summary(agent) for agent in agents[:limit]],
+        "next_cursor": next_cursor,
+    }
 
 
 @app.get("/api/agents/{agent_id}")
 async def get_agent(agent_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
-    agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
+    agent = await agent_registry.get(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return {
@@ -361,6 +716,29 @@ async def get_agent(agent_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     }
 
 
+@app.get("/api/agents/{agent_id}/build/stream")
+async def stream_build_log_sse(agent_id: str):
+    """Follow an agent build as Server-Sent Events"""
+
+    async def events():
+        async for event in build_logs.follow(agent_id):
+            yield f"data: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.websocket("/api/agents/{agent_id}/build/stream")
+async def stream_build_log(websocket: WebSocket, agent_id: str):
+    """Follow an agent build: buffered lines first, then live output and progress"""
+    await websocket.accept()
+    try:
+        async for event in build_logs.follow(agent_id):
+            await websocket.send_text(json.dumps(event, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Build log client for {agent_id} disconnected")
+
+
 @app.post("/api/agents/{agent_id}/start")
 async def start_agent(
     agent_id: str,
@@ -384,7 +762,6 @@ async def stop_agent(
 @app.post("/api/agents/{agent_id}/update")
 async def update_agent(
     agent_id: str,
-    background_tasks: BackgroundTasks,
     agent_file: UploadFile = File(...),
     requirements_file: UploadFile = File(...),
     env_vars: Optional[str] = Form(None),
@@ -392,10 +769,13 @@ async def update_agent(
 ):
     """Update an agent's Docker image with new files"""
     try:
-        agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
+        agent = await agent_registry.get(agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
 
+        # A build still queued or running for the old files is now stale
+        build_scheduler.cancel(agent_id)
+
         # Stop and remove existing container
         await stop_agent_container(agent_id, db)
 
@@ -418,15 +798,15 @@ async def update_agent(
         if env_vars:
             env_vars_dict = json.loads(env_vars)
             encrypted_env_vars = encrypt_env_vars(env_vars_dict)
-            await db[COLLECTION_NAME].update_one(
-                {"id": agent_id}, {"$set": {"env_vars": encrypted_env_vars}}
+            await agent_registry.update(
+                agent_id, {"$set": {"env_vars": encrypted_env_vars}}
             )
 
         # Remove old Docker image if it exists
         try:
-            client.images.remove(agent["image_name"], force=True)
+            await container_runtime.remove_image(agent["image_name"], force=True)
             logger.info(f"Removed old Docker image: {agent['image_name']}")
-        except docker.errors.ImageNotFound:
+        except ImageNotFound:
             logger.info(f"No old Docker image found for {agent['image_name']}")
         except Exception as e:
             logger.error(f"Error removing old Docker image: {str(e)}")
@@ -438,11 +818,12 @@ async def update_agent(
             logger.info(f"Removed existing Docker context folder: {context_dir}")
 
         # Rebuild Docker image
-        await db[COLLECTION_NAME].update_one(
-            {"id": agent_id},
+        await release_agent_port(agent_id)
+        await agent_registry.update(
+            agent_id,
             {"$set": {"status": "created", "container_id": None, "port": None}},
         )
-        background_tasks.add_task(build_agent_docker_image, agent_id, agent["name"], db)
+        build_scheduler.submit(agent_id, agent["name"], db, priority=PRIORITY_UPDATE)
 
         return {"id": agent_id, "name": agent["name"], "status": "updating"}
 
@@ -453,21 +834,25 @@ async def update_agent(
 
 @app.delete("/api/agents/{agent_id}")
 async def delete_agent(agent_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
-    agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
+    agent = await agent_registry.get(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
+    build_scheduler.cancel(agent_id)
     await stop_agent_container(agent_id, db)
+    await release_agent_port(agent_id)
 
     try:
-        client.images.remove(agent["image_name"], force=True)
+        await container_runtime.remove_image(agent["image_name"], force=True)
     except Exception as e:
         logger.error(f"Error removing image: {str(e)}")
 
-    await db[COLLECTION_NAME].update_one(
-        {"id": agent_id}, {"$set": {"status": "deleted", "env_vars": None}}
+    await agent_registry.update(
+        agent_id, {"$set": {"status": "deleted", "env_vars": None}}
     )
 
+    await build_logs.remove(agent_id)
+
     agent_dir = os.path.join(AGENTS_DIR, agent_id)
     if os.path.exists(agent_dir):
         shutil.rmtree(agent_dir)
@@ -483,16 +868,13 @@ async def delete_agent(agent_id: str, db: AsyncIOMotorDatabase = Depends(get_db)
 async def test_agent(
     agent_id: str, request_data: Dict, db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
+    agent = await agent_registry.get(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"http://localhost:{agent['port']}/query", json=request_data
-            )
-            return response.json()
+        response = await agent_gateway.post_json(agent_id, request_data)
+        return response.json()
     except Exception as e:
         logger.error(f"Error testing agent: {str(e)}")
         raise HTTPException(
@@ -502,13 +884,101 @@ async def test_agent(
 
 @app.post("/api/agents/{agent_id}/test-stream")
 async def test_agent_stream(agent_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
-    agent = await db[COLLECTION_NAME].find_one({"id": agent_id})
-    if not agent or agent.get("status") != "running" or not agent.get("port"):
-        raise HTTPException(status_code=404, detail="Agent not running")
-    return {"websocket_url": f"ws://{SERVER_IP}:{agent['port']}/stream"}
+    agent = await agent_registry.get(agent_id)
+    # A stopped agent has no port; the gateway cold-starts it on connect
+    if not agent or agent.get("status") not in ("built", "running"):
+        raise HTTPException(status_code=404, detail="Agent not available")
+    return {"websocket_url": f"ws://{SERVER_IP}:{API_PORT}/agents/{agent_id}/stream"}
+
+
+@app.get("/api/registry/")
+async def get_registry_stats():
+    return agent_registry.stats()
+
+
+class IdleTimeoutUpdate(BaseModel):
+    # Seconds without traffic before the agent is stopped; 0 or null keeps it warm
+    idle_timeout: Optional[float] = None
+
+
+@app.put("/api/agents/{agent_id}/idle-timeout")
+async def set_agent_idle_timeout(agent_id: str, body: IdleTimeoutUpdate):
+    agent = await agent_registry.get(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    await agent_registry.update(agent_id, {"$set": {"idle_timeout": body.idle_timeout}})
+    return {"id": agent_id, "idle_timeout": body.idle_timeout}
+
+
+@app.get("/api/warm-pool/")
+async def get_warm_pool_stats():
+    return warm_pool.stats()
+
+
+@app.get("/api/scaling/")
+async def get_scaling_stats():
+    return agent_scaler.stats()
+
+
+@app.get("/api/gateway/")
+async def get_gateway_stats():
+    return agent_gateway.stats()
+
+
+@app.post("/agents/{agent_id}/query")
+async def proxy_agent_query(agent_id: str, request: Request):
+    """Proxy a query to the agent container, streaming the response through"""
+    return await proxy_agent_request(agent_id, "query", request)
+
+
+@app.post("/agents/{agent_id}/query/stream")
+async def proxy_agent_query_stream(agent_id: str, request: Request):
+    """Proxy an SSE / NDJSON streamed query to the agent container"""
+    return await proxy_agent_request(agent_id, "query/stream", request)
+
+
+async def proxy_agent_request(agent_id: str, path: str, request: Request):
+    try:
+        return await agent_gateway.proxy(agent_id, path, request)
+    except AgentUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ColdStartError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except httpx.HTTPError as e:
+        logger.error(f"Error proxying to agent {agent_id}: {str(e)}")
+        raise HTTPException(
+            status_code=502, detail=f"Error communicating with agent: {str(e)}"
+        )
+
+
+async def close_websocket(websocket: WebSocket, code: int, reason: str = ""):
+    if WebSocketState.DISCONNECTED in (
+        websocket.client_state,
+        websocket.application_state,
+    ):
+        return
+    # Closing before accept() reaches the client as a bare 403 on the
+    # handshake, without the code
+    if websocket.client_state == WebSocketState.CONNECTING:
+        await websocket.accept()
+    await websocket.close(code=code, reason=reason)
+
+
+@app.websocket("/agents/{agent_id}/stream")
+async def proxy_agent_stream(websocket: WebSocket, agent_id: str):
+    """Relay a streaming session to the agent container"""
+    try:
+        await agent_gateway.relay_websocket(agent_id, websocket)
+    except AgentUnavailable as e:
+        await close_websocket(websocket, 4404, str(e))
+    except ColdStartError as e:
+        await close_websocket(websocket, 1013, str(e))
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        logger.error(f"Error relaying stream to agent {agent_id}: {str(e)}")
+        await close_websocket(websocket, 1011)
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=9000)
+    uvicorn.run(app, host="0.0.0.0", port=API_PORT)
@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import weakref
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# The dependency layer installs from a wheelhouse kept in a BuildKit cache
+# mount, so a wheel is downloaded (or built from an sdist) only once per host
+# no matter how many agents ask for it.
+DOCKER_FILE_DEPS_DATA = """FROM {base_image}
+
+COPY requirements.txt .
+RUN --mount=type=cache,id=novix-wheelhouse,target=/wheelhouse \\
+    pip wheel --wheel-dir /wheelhouse --find-links /wheelhouse -r requirements.txt \\
+    && pip install --no-cache-dir --no-index --find-links /wheelhouse -r requirements.txt
+"""
+
+
+def _normalize_requirement(line: str) -> str:
+    """One requirement: canonical name, no whitespace inside the specifier"""
+    line, _, options = line.partition(" --")
+    spec, _, marker = line.partition(";")
+    spec = re.sub(r"\s+", "", spec)
+    match = re.match(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(.*)$", spec)
+    if match:
+        spec = re.sub(r"[-_.]+", "-", match.group(1)).lower() + match.group(2)
+    # Markers and per-requirement options (--hash) need their spaces
+    if marker.strip():
+        spec += "; " + " ".join(marker.split())
+    if options:
+        spec += " --" + " ".join(options.split())
+    return spec
+
+
+def normalize_requirements(requirements: str) -> str:
+    """Canonical form of a requirements file: no comments, sorted, deduplicated
+
+    pip option lines (--extra-index-url, -e, ...) are kept as written, in
+    their original order, ahead of the requirements. -r and -c includes are
+    refused, since the files they name are not part of the build context.
+    """
+    options = []
+    lines = set()
+    for line in requirements.splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("-"):
+            if re.match(r"^(-[rc]|--requirement\b|--constraint\b)", line):
+                raise ValueError(f"requirements.txt can't include other files: {line}")
+            if line not in options:
+                options.append(line)
+            continue
+        lines.add(_normalize_requirement(line))
+    return "".join(f"{line}\n" for line in options + sorted(lines))
+
+
+def requirements_within(requirements: str, base_requirements: str) -> bool:
+    """True when every requirement is already satisfied by the base requirements.
+
+    A bare package name is covered by any base line for that package; a line
+    with a version specifier must appear in the base set verbatim.
+    """
+    base_lines = set(normalize_requirements(base_requirements).splitlines())
+    base_names = {
+        re.match(r"^[a-z0-9][a-z0-9-]*", line).group(0)
+        for line in base_lines
+        if re.match(r"^[a-z0-9]", line)
+    }
+    for line in normalize_requirements(requirements).splitlines():
+        if line not in base_lines and line not in base_names:
+            return False
+    return True
+
+
+def requirements_hash(requirements: str, base_image: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(base_image.encode())
+    digest.update(b"\0")
+    digest.update(normalize_requirements(requirements).encode())
+    return digest.hexdigest()
+
+
+async def run_docker(
+    *args: str, on_line: Optional[Callable[[str], None]] = None
+) -> tuple:
+    """Run a docker CLI command.
+
+    Without ``on_line`` the output is collected and returned as usual. With it,
+    stdout and stderr are merged and handed over line by line as they are
+    produced, and only the last lines are kept for the error message.
+    """
+    env = {**os.environ, "DOCKER_BUILDKIT": "1", "BUILDKIT_PROGRESS": "plain"}
+    if on_line is None:
+        process = await asyncio.create_subprocess_exec(
+            "docker",
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        return process.returncode, stdout.decode(), stderr.decode()
+
+    process = await asyncio.create_subprocess_exec(
+        "docker",
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+        limit=1024 * 1024,
+    )
+    tail: deque = deque(maxlen=50)
+    try:
+        async for raw_line in process.stdout:
+            line = raw_line.decode(errors="replace").rstrip()
+            tail.append(line)
+            on_line(line)
+        await process.wait()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    return process.returncode, "", "\n".join(tail)
+
+
+class DependencyCache:
+    """Content-addressed cache of dependency-layer images keyed by requirements hash.
+
+    Entries are tracked in least-recently-used order and persisted to MongoDB so
+    the index survives restarts. When the cache grows past ``max_entries`` or
+    ``max_bytes`` the least recently used images are removed.
+    """
+
+    def __init__(
+        self,
+        collection,
+        contexts_dir: str,
+        image_repo: str = "novix-deps",
+        max_entries: int = 200,
+        max_bytes: int = 20 * 1024**3,
+        wheelhouse_max_bytes: Optional[int] = None,
+    ):
+        self.collection = collection
+        self.contexts_dir = contexts_dir
+        self.image_repo = image_repo
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.wheelhouse_max_bytes = wheelhouse_max_bytes
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # One lock per hash, alive while any caller holds or waits on it
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    async def load(self):
+        """Hydrate the in-memory LRU index from MongoDB"""
+        await self.collection.create_index("hash", unique=True)
+        async for entry in self.collection.find({}).sort("last_used", 1):
+            entry.pop("_id", None)
+            self.entries[entry["hash"]] = entry
+        logger.info(f"Loaded {len(self.entries)} dependency cache entries")
+
+    def image_name(self, deps_hash: str) -> str:
+        return f"{self.image_repo}:{deps_hash[:16]}"
+
+    async def ensure(
+        self,
+        requirements: str,
+        base_image: str,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """Return the dependency image for these requirements, building it on a miss"""
+        deps_hash = requirements_hash(requirements, base_image)
+        lock = self._locks.get(deps_hash)
+        if lock is None:
+            lock = self._locks[deps_hash] = asyncio.Lock()
+        async with lock:
+            entry = self.entries.get(deps_hash)
+            if entry and await self._image_exists(entry["image_name"]):
+                self.hits += 1
+                await self._touch(entry)
+                logger.info(f"Dependency cache hit for {deps_hash[:16]}")
+                return entry["image_name"]
+
+            self.misses += 1
+            logger.info(f"Dependency cache miss for {deps_hash[:16]}, building")
+            entry = await self._build(deps_hash, requirements, base_image, on_line)
+            self.entries[deps_hash] = entry
+            self.entries.move_to_end(deps_hash)
+            await self.collection.replace_one({"hash": deps_hash}, entry, upsert=True)
+        await self.evict()
+        return entry["image_name"]
+
+    async def evict(self):
+        """Drop least recently used entries until the cache fits its limits"""
+        while self.entries and (
+            len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes
+        ):
+            deps_hash, entry = self.entries.popitem(last=False)
+            await self.collection.delete_one({"hash": deps_hash})
+            returncode, _, stderr = await run_docker("image", "rm", entry["image_name"])
+            if returncode != 0:
+                # Still referenced by agent images; the layer is freed with them
+                logger.info(
+                    f"Dependency image {entry['image_name']} still in use: {stderr.strip()}"
+                )
+            self.evictions += 1
+            logger.info(f"Evicted dependency image {entry['image_name']}")
+
+        if self.wheelhouse_max_bytes is not None:
+            await run_docker(
+                "builder",
+                "prune",
+                "--force",
+                "--filter",
+                "type=exec.cachemount",
+                "--keep-storage",
+                str(self.wheelhouse_max_bytes),
+            )
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(entry.get("size", 0) for entry in self.entries.values())
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size_bytes": self.size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    async def _touch(self, entry: Dict):
+        entry["last_used"] = datetime.utcnow()
+        entry["uses"] = entry.get("uses", 0) + 1
+        self.entries.move_to_end(entry["hash"])
+        await self.collection.update_one(
+            {"hash": entry["hash"]},
+            {"$set": {"last_used": entry["last_used"]}, "$inc": {"uses": 1}},
+        )
+
+    async def _image_exists(self, image_name: str) -> bool:
+        returncode, _, _ = await run_docker("image", "inspect", image_name)
+        return returncode == 0
+
+    async def _image_size(self, image_name: str) -> int:
+        returncode, stdout, _ = await run_docker(
+            "image", "inspect", "--format", "{{.Size}}", image_name
+        )
+        return int(stdout.strip()) if returncode == 0 and stdout.strip() else 0
+
+    async def _build(
+        self,
+        deps_hash: str,
+        requirements: str,
+        base_image: str,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> Dict:
+        image_name = self.image_name(deps_hash)
+        context_dir = os.path.join(self.contexts_dir, f"_deps-{deps_hash[:16]}")
+        if os.path.exists(context_dir):
+            shutil.rmtree(context_dir)
+        os.makedirs(context_dir)
+        try:
+            with open(os.path.join(context_dir, "Dockerfile"), "w") as f:
+                f.write(DOCKER_FILE_DEPS_DATA.format(base_image=base_image))
+            with open(os.path.join(context_dir, "requirements.txt"), "w") as f:
+                f.write(normalize_requirements(requirements))
+
+            returncode, _, stderr = await run_docker(
+                "build", "-t", image_name, context_dir, on_line=on_line
+            )
+            if returncode != 0:
+                raise RuntimeError(f"Dependency layer build failed: {stderr}")
+        finally:
+            shutil.rmtree(context_dir, ignore_errors=True)
+
+        # Only count the layer itself, not the shared base image under it
+        size = max(
+            await self._image_size(image_name) - await self._image_size(base_image), 0
+        )
+        now = datetime.utcnow()
+        return {
+            "hash": deps_hash,
+            "image_name": image_name,
+            "base_image": base_image,
+            "size": size,
+            "created_at": now,
+            "last_used": now,
+            "uses": 1,
+        }
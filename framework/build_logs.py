@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from datetime import datetime
+from typing import AsyncGenerator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MAX_LINE_LENGTH = 4096
+
+# "Step 2/5 : RUN ..." from the classic builder, "#7 [2/3] RUN ..." from BuildKit
+STEP_PATTERNS = [
+    re.compile(r"^Step (\d+)/(\d+)"),
+    re.compile(r"^#\d+ \[(?:\S+ )?(\d+)/(\d+)\]"),
+]
+
+
+class BuildLog:
+    """Recent output of one build, kept in a ring buffer and fanned out to followers"""
+
+    def __init__(
+        self, agent_id: str, max_lines: int = 500, subscriber_queue: int = 1000
+    ):
+        self.agent_id = agent_id
+        self.lines: deque = deque(maxlen=max_lines)
+        self.total_lines = 0
+        self.phase: Optional[str] = None
+        self.step: Optional[int] = None
+        self.total_steps: Optional[int] = None
+        self.status = "building"
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.subscriber_queue = subscriber_queue
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def progress(self) -> Dict:
+        return {"phase": self.phase, "step": self.step, "total_steps": self.total_steps}
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+        self.step = None
+        self.total_steps = None
+        self._publish({"type": "progress", **self.progress()})
+
+    def append(self, line: str):
+        line = line.rstrip()[:MAX_LINE_LENGTH]
+        for pattern in STEP_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                self.step, self.total_steps = int(match.group(1)), int(match.group(2))
+                break
+        self.lines.append(line)
+        self.total_lines += 1
+        self._publish({"type": "log", "line": line, **self.progress()})
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = datetime.utcnow()
+        self._publish({"type": "status", "status": status})
+        for queue in list(self._subscribers):
+            self._close(queue)
+
+    async def follow(self) -> AsyncGenerator[Dict, None]:
+        """Yield the buffered lines, then live events until the build finishes"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_queue)
+        if not self.finished:
+            self._subscribers.add(queue)
+        try:
+            for line in list(self.lines):
+                yield {"type": "log", "line": line}
+            yield {"type": "progress", **self.progress()}
+            if self.finished:
+                yield {"type": "status", "status": self.status}
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._subscribers.discard(queue)
+
+    def to_document(self) -> Dict:
+        return {
+            "agent_id": self.agent_id,
+            "status": self.status,
+            "lines": list(self.lines),
+            "total_lines": self.total_lines,
+            **self.progress(),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def _publish(self, event: Dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A follower that can't keep up is dropped rather than buffered
+                logger.info(f"Dropping slow build log follower for {self.agent_id}")
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "error", "error": "Follower too slow"})
+                self._close(queue)
+
+    def _close(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.put_nowait(None)
+
+
+class BuildLogStore:
+    """Live build logs in memory, the tail of finished ones in MongoDB"""
+
+    def __init__(self, collection, max_lines: int = 500):
+        self.collection = collection
+        self.max_lines = max_lines
+        self.live: Dict[str, BuildLog] = {}
+
+    def start(self, agent_id: str) -> BuildLog:
+        build_log = BuildLog(agent_id, max_lines=self.max_lines)
+        self.live[agent_id] = build_log
+        return build_log
+
+    async def finish(self, build_log: BuildLog, status: str):
+        build_log.finish(status)
+        if self.live.get(build_log.agent_id) is build_log:
+            del self.live[build_log.agent_id]
+        try:
+            await self.collection.replace_one(
+                {"agent_id": build_log.agent_id}, build_log.to_document(), upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error saving build log for {build_log.agent_id}: {str(e)}")
+
+    async def follow(self, agent_id: str) -> AsyncGenerator[Dict, None]:
+        build_log = self.live.get(agent_id)
+        if build_log:
+            async for event in build_log.follow():
+                yield event
+            return
+
+        document = await self.collection.find_one({"agent_id": agent_id})
+        if not document:
+            yield {"type": "error", "error": "No build log found"}
+            return
+        for line in document["lines"]:
+            yield {"type": "log", "line": line}
+        yield {
+            "type": "progress",
+            "phase": document.get("phase"),
+            "step": document.get("step"),
+            "total_steps": document.get("total_steps"),
+        }
+        yield {"type": "status", "status": document["status"]}
+
+    async def remove(self, agent_id: str):
+        await self.collection.delete_one({"agent_id": agent_id})
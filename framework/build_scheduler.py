@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower value runs first: rebuilding an existing agent beats building a new one
+PRIORITY_UPDATE = 0
+PRIORITY_CREATE = 1
+
+
+class BuildJob:
+    def __init__(self, agent_id: str, priority: int, args: tuple):
+        self.agent_id = agent_id
+        self.priority = priority
+        self.args = args
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.cancelled = False
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def wait_time(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+class BuildScheduler:
+    """Runs image builds on a fixed number of workers fed by a priority queue.
+
+    Jobs with equal priority run in submission order. Only one job per agent
+    is kept: submitting a new build for an agent cancels the one already queued
+    or running, since its output would be stale anyway.
+    """
+
+    def __init__(
+        self, build: Callable[..., Awaitable], workers: int = 2, wait_samples: int = 100
+    ):
+        self.build = build
+        self.workers = workers
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.queued: Dict[str, BuildJob] = {}
+        self.running: Dict[str, BuildJob] = {}
+        self.completed = 0
+        self.failed = 0
+        self.superseded = 0
+        self._counter = itertools.count()
+        self._wait_times: List[float] = []
+        self._wait_samples = wait_samples
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(index)))
+        logger.info(f"Build scheduler started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, agent_id: str, *args, priority: int = PRIORITY_CREATE) -> BuildJob:
+        """Queue a build for an agent, superseding any build already pending for it"""
+        self.cancel(agent_id)
+        job = BuildJob(agent_id, priority, args)
+        self.queued[agent_id] = job
+        self.queue.put_nowait((priority, next(self._counter), job))
+        logger.info(
+            f"Queued build for agent {agent_id} (priority {priority}, depth {len(self.queued)})"
+        )
+        return job
+
+    def cancel(self, agent_id: str) -> bool:
+        """Cancel the queued or running build for an agent, if there is one"""
+        cancelled = False
+        job = self.queued.pop(agent_id, None)
+        if job:
+            # Left in the heap and skipped when a worker pops it
+            job.cancelled = True
+            cancelled = True
+        job = self.running.get(agent_id)
+        # A cancelled task stays "running" until it unwinds; count it once
+        if job and not job.cancelled and job.task and not job.task.done():
+            job.cancelled = True
+            job.task.cancel()
+            cancelled = True
+        if cancelled:
+            self.superseded += 1
+            logger.info(f"Cancelled pending build for agent {agent_id}")
+        return cancelled
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.workers,
+            "queue_depth": len(self.queued),
+            "running": len(self.running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "superseded": self.superseded,
+            "avg_wait_seconds": sum(waits) / len(waits) if waits else None,
+            "p95_wait_seconds": waits[int(len(waits) * 0.95)] if waits else None,
+            "queued": [
+                {
+                    "agent_id": job.agent_id,
+                    "priority": job.priority,
+                    "waiting_seconds": now - job.enqueued_at,
+                }
+                for job in self.queued.values()
+            ],
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                if job.cancelled:
+                    continue
+                self.queued.pop(job.agent_id, None)
+                job.started_at = time.monotonic()
+                self._record_wait(job.wait_time)
+                self.running[job.agent_id] = job
+                job.task = asyncio.create_task(self.build(job.agent_id, *job.args))
+                try:
+                    # wait() keeps a superseded build's cancellation apart
+                    # from the worker itself being stopped
+                    await asyncio.wait((job.task,))
+                except asyncio.CancelledError:
+                    job.task.cancel()
+                    raise
+                finally:
+                    if self.running.get(job.agent_id) is job:
+                        del self.running[job.agent_id]
+                if job.task.cancelled():
+                    logger.info(f"Build for agent {job.agent_id} superseded")
+                elif job.task.exception() is not None:
+                    self.failed += 1
+                    logger.error(
+                        f"Build worker {index} failed for {job.agent_id}: "
+                        f"{job.task.exception()}"
+                    )
+                else:
+                    self.completed += 1
+            finally:
+                self.queue.task_done()
+
+    def _record_wait(self, wait_time: float):
+        self._wait_times.append(wait_time)
+        if len(self._wait_times) > self._wait_samples:
+            del self._wait_times[0]
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerNotFound(Exception):
+    pass
+
+
+class ImageNotFound(Exception):
+    pass
+
+
+class ContainerRuntime:
+    """Async interface to the container engine used by the deployment API"""
+
+    async def run(
+        self,
+        image: str,
+        name: str,
+        ports: Dict[str, int],
+        environment: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Start a detached container and return its id"""
+        raise NotImplementedError
+
+    async def stop(self, container_id: str, timeout: int = 5):
+        """Stop and remove a container; raises ContainerNotFound if it is gone"""
+        raise NotImplementedError
+
+    async def is_running(self, container_id: str) -> bool:
+        raise NotImplementedError
+
+    async def rename(self, container_id: str, name: str):
+        raise NotImplementedError
+
+    async def remove_containers(self, name_prefix: str) -> int:
+        """Force-remove every container whose name starts with the prefix"""
+        raise NotImplementedError
+
+    async def remove_image(self, image_name: str, force: bool = True):
+        """Remove an image; raises ImageNotFound if it does not exist"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class DockerRuntime(ContainerRuntime):
+    """docker-py behind a dedicated thread pool so no Docker call blocks the event loop"""
+
+    def __init__(self, max_workers: int = 8):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="docker"
+        )
+        self._client = None
+
+    @property
+    def client(self):
+        # Created lazily on a pool thread: from_env() talks to the daemon
+        if self._client is None:
+            import docker
+
+            self._client = docker.from_env()
+        return self._client
+
+    async def _call(self, fn, *args, **kwargs):
+        import docker
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, lambda: fn(*args, **kwargs)
+            )
+        except docker.errors.ImageNotFound as e:
+            raise ImageNotFound(str(e))
+        except docker.errors.NotFound as e:
+            raise ContainerNotFound(str(e))
+
+    def _run(self, image, name, ports, environment):
+        container = self.client.containers.run(
+            image,
+            detach=True,
+            ports=ports,
+            name=name,
+            environment=environment,
+        )
+        return container.id
+
+    def _stop(self, container_id, timeout):
+        container = self.client.containers.get(container_id)
+        container.stop(timeout=timeout)
+        container.remove()
+
+    def _is_running(self, container_id):
+        container = self.client.containers.get(container_id)
+        return container.status == "running"
+
+    def _remove_containers(self, name_prefix):
+        containers = self.client.containers.list(
+            all=True, filters={"name": f"^{name_prefix}"}
+        )
+        for container in containers:
+            container.remove(force=True)
+        return len(containers)
+
+    async def run(self, image, name, ports, environment=None) -> str:
+        return await self._call(self._run, image, name, ports, environment)
+
+    async def stop(self, container_id: str, timeout: int = 5):
+        await self._call(self._stop, container_id, timeout)
+
+    async def is_running(self, container_id: str) -> bool:
+        try:
+            return await self._call(self._is_running, container_id)
+        except ContainerNotFound:
+            return False
+
+    async def rename(self, container_id: str, name: str):
+        await self._call(lambda: self.client.containers.get(container_id).rename(name))
+
+    async def remove_containers(self, name_prefix: str) -> int:
+        return await self._call(self._remove_containers, name_prefix)
+
+    async def remove_image(self, image_name: str, force: bool = True):
+        await self._call(lambda: self.client.images.remove(image_name, force=force))
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class FakeRuntime(ContainerRuntime):
+    """In-memory runtime for tests and for running the API without Docker"""
+
+    def __init__(self):
+        self.containers: Dict[str, Dict] = {}
+        self.images = set()
+
+    async def run(self, image, name, ports, environment=None) -> str:
+        if any(c["name"] == name for c in self.containers.values()):
+            raise RuntimeError(f"Container name {name} is already in use")
+        container_id = uuid.uuid4().hex
+        self.containers[container_id] = {
+            "image": image,
+            "name": name,
+            "ports": dict(ports),
+            "environment": dict(environment or {}),
+            "status": "running",
+        }
+        self.images.add(image)
+        return container_id
+
+    async def stop(self, container_id: str, timeout: int = 5):
+        if self.containers.pop(container_id, None) is None:
+            raise ContainerNotFound(container_id)
+
+    async def is_running(self, container_id: str) -> bool:
+        container = self.containers.get(container_id)
+        return bool(container) and container["status"] == "running"
+
+    async def rename(self, container_id: str, name: str):
+        if container_id not in self.containers:
+            raise ContainerNotFound(container_id)
+        self.containers[container_id]["name"] = name
+
+    async def remove_containers(self, name_prefix: str) -> int:
+        matching = [
+            container_id
+            for container_id, container in self.containers.items()
+            if container["name"].startswith(name_prefix)
+        ]
+        for container_id in matching:
+            del self.containers[container_id]
+        return len(matching)
+
+    async def remove_image(self, image_name: str, force: bool = True):
+        if image_name not in self.images:
+            raise ImageNotFound(image_name)
+        self.images.discard(image_name)
+
+
+def create_runtime(kind: str = "docker") -> ContainerRuntime:
+    if kind == "fake":
+        return FakeRuntime()
+    return DockerRuntime()
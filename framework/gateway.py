@@ -0,0 +1,243 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import websockets
+from fastapi import Request, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+}
+
+
+class AgentUnavailable(Exception):
+    pass
+
+
+def forward_headers(headers) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+class AgentGateway:
+    """Reverse proxy from the deployment API to the agent containers.
+
+    One long-lived httpx client keeps pooled keep-alive connections to every
+    agent, so a query no longer pays for a TCP handshake and a new pool.
+    Responses are passed through as they arrive, never buffered, and each
+    agent gets its own cap on in-flight requests.
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str], Awaitable[Optional[int]]],
+        host: str = "localhost",
+        max_connections: int = 500,
+        max_keepalive_connections: int = 100,
+        keepalive_expiry: float = 60.0,
+        per_agent_limit: int = 32,
+        timeout: float = 30.0,
+        scaler=None,
+    ):
+        self.resolve = resolve
+        self.scaler = scaler
+        self.host = host
+        self.per_agent_limit = per_agent_limit
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self.client: Optional[httpx.AsyncClient] = None
+        self.active_websockets = 0
+        self.in_flight: Dict[str, int] = {}
+        self._limiters: Dict[str, asyncio.Semaphore] = {}
+
+    async def start(self):
+        # Upstreams are plain http://, so HTTP/1.1 keep-alive it is: httpx
+        # negotiates HTTP/2 only through TLS ALPN
+        self.client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+
+    def forget(self, agent_id: str):
+        """Drop per-agent state once the agent stops
+
+        A limiter still held by in-flight requests or relays stays: a fresh
+        one would let new requests past the cap until they finish.
+        """
+        if not self.in_flight.get(agent_id):
+            self._limiters.pop(agent_id, None)
+
+    async def upstream(self, agent_id: str) -> str:
+        port = await self.resolve(agent_id)
+        if port is None and self.scaler:
+            # Stopped (e.g. reaped while idle): start it and wait until healthy
+            port = await self.scaler.ensure_running(agent_id)
+        if port is None:
+            raise AgentUnavailable(f"Agent {agent_id} is not running")
+        return f"http://{self.host}:{port}"
+
+    def _limiter(self, agent_id: str) -> asyncio.Semaphore:
+        limiter = self._limiters.get(agent_id)
+        if limiter is None:
+            limiter = self._limiters[agent_id] = asyncio.Semaphore(self.per_agent_limit)
+        return limiter
+
+    async def _acquire(self, agent_id: str) -> asyncio.Semaphore:
+        limiter = self._limiter(agent_id)
+        await limiter.acquire()
+        self.in_flight[agent_id] = self.in_flight.get(agent_id, 0) + 1
+        if self.scaler:
+            self.scaler.begin(agent_id)
+        return limiter
+
+    def _release(self, agent_id: str, limiter: asyncio.Semaphore):
+        limiter.release()
+        if self.scaler:
+            self.scaler.end(agent_id)
+        remaining = self.in_flight.get(agent_id, 1) - 1
+        if remaining:
+            self.in_flight[agent_id] = remaining
+        else:
+            self.in_flight.pop(agent_id, None)
+
+    async def post_json(self, agent_id: str, data: Any) -> httpx.Response:
+        """Buffered request for internal callers that need the parsed body"""
+        base_url = await self.upstream(agent_id)
+        limiter = await self._acquire(agent_id)
+        try:
+            return await self.client.post(f"{base_url}/query", json=data)
+        finally:
+            self._release(agent_id, limiter)
+
+    async def proxy(
+        self, agent_id: str, path: str, request: Request
+    ) -> StreamingResponse:
+        """Forward a request to the agent and stream the response straight back"""
+        base_url = await self.upstream(agent_id)
+        limiter = await self._acquire(agent_id)
+        released = False
+
+        async def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._release(agent_id, limiter)
+
+        try:
+            upstream_request = self.client.build_request(
+                request.method,
+                f"{base_url}/{path}",
+                params=request.query_params,
+                headers=forward_headers(request.headers),
+                content=request.stream(),
+            )
+            response = await self.client.send(upstream_request, stream=True)
+        except Exception:
+            await release()
+            raise
+
+        async def cleanup():
+            await response.aclose()
+            await release()
+
+        async def body():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await cleanup()
+
+        # The background task covers clients that leave before the body starts
+        return StreamingResponse(
+            body(),
+            status_code=response.status_code,
+            headers=forward_headers(response.headers),
+            background=BackgroundTask(cleanup),
+        )
+
+    async def relay_websocket(self, agent_id: str, websocket: WebSocket):
+        """Pipe a client WebSocket to the agent's /stream endpoint in both directions
+
+        An open relay holds one of the agent's in-flight slots, like a request.
+        """
+        base_url = await self.upstream(agent_id)
+        url = "ws" + base_url[len("http") :] + "/stream"
+        subprotocols = websocket.scope.get("subprotocols") or None
+
+        limiter = await self._acquire(agent_id)
+        try:
+            await self._relay(agent_id, websocket, url, subprotocols)
+        finally:
+            self._release(agent_id, limiter)
+
+    async def _relay(self, agent_id: str, websocket: WebSocket, url: str, subprotocols):
+        async with websockets.connect(
+            url, subprotocols=subprotocols, max_size=None, ping_interval=20
+        ) as upstream:
+            await websocket.accept(subprotocol=upstream.subprotocol)
+            self.active_websockets += 1
+
+            async def client_to_upstream():
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    if self.scaler:
+                        self.scaler.touch(agent_id)
+                    if message.get("text") is not None:
+                        await upstream.send(message["text"])
+                    elif message.get("bytes") is not None:
+                        await upstream.send(message["bytes"])
+
+            async def upstream_to_client():
+                async for message in upstream:
+                    if self.scaler:
+                        self.scaler.touch(agent_id)
+                    if isinstance(message, str):
+                        await websocket.send_text(message)
+                    else:
+                        await websocket.send_bytes(message)
+                await websocket.close()
+
+            tasks = [
+                asyncio.create_task(client_to_upstream()),
+                asyncio.create_task(upstream_to_client()),
+            ]
+            try:
+                done, pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.cancelled() and task.exception():
+                        logger.info(
+                            f"WebSocket relay for {agent_id} ended: {task.exception()}"
+                        )
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.active_websockets -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "active_websockets": self.active_websockets,
+            "per_agent_limit": self.per_agent_limit,
+            "in_flight": dict(self.in_flight),
+        }
@@ -0,0 +1,116 @@
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+class NoPortsAvailable(Exception):
+    pass
+
+
+def parse_port_ranges(spec: str) -> List[Tuple[int, int]]:
+    """Parse "8100-8999,9100-9199" into [(8100, 8999), (9100, 9199)]"""
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        ranges.append((int(start), int(end or start)))
+    return ranges
+
+
+class PortAllocator:
+    """Hands out host ports from an in-memory free list in constant time.
+
+    MongoDB stays the source of truth: a port is only ours once it has been
+    written to the agent document, and a unique index on ``port`` makes two
+    API replicas racing for the same port fail instead of sharing it.
+    """
+
+    def __init__(self, collection, ranges: List[Tuple[int, int]]):
+        self.collection = collection
+        self.ranges = ranges
+        self._free: deque = deque()
+        self._free_set = set()
+
+    def owns(self, port: int) -> bool:
+        return any(start <= port <= end for start, end in self.ranges)
+
+    async def load(self):
+        """Build the free list from the ports currently held in MongoDB"""
+        # Deleted agents used to keep their port, which the unique index forbids
+        await self.collection.update_many(
+            {"status": "deleted", "port": {"$ne": None}}, {"$set": {"port": None}}
+        )
+        try:
+            await self.collection.create_index(
+                "port",
+                unique=True,
+                partialFilterExpression={"port": {"$type": "int"}},
+            )
+        except OperationFailure as e:
+            logger.error(f"Could not create unique port index: {str(e)}")
+
+        used = set(await self.collection.distinct("port", {"port": {"$type": "int"}}))
+        self._free.clear()
+        self._free_set.clear()
+        for start, end in self.ranges:
+            for port in range(start, end + 1):
+                if port not in used:
+                    self._free.append(port)
+                    self._free_set.add(port)
+        logger.info(f"Port allocator ready with {len(self._free)} free ports")
+
+    async def reserve(self, agent_id: str) -> int:
+        """Assign a port to the agent, or return the one it already holds"""
+        while self._free:
+            port = self._free.popleft()
+            self._free_set.discard(port)
+            try:
+                agent = await self.collection.find_one_and_update(
+                    {"id": agent_id, "port": None},
+                    {"$set": {"port": port}},
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                # Taken by another API replica since we hydrated; try the next one
+                continue
+
+            if agent is None:
+                # Concurrent start won the race, or the agent is gone
+                self._give_back(port)
+                agent = await self.collection.find_one({"id": agent_id})
+                if agent and agent.get("port"):
+                    return agent["port"]
+                raise NoPortsAvailable(f"Agent {agent_id} not found")
+            return port
+
+        raise NoPortsAvailable("No available ports")
+
+    async def release(self, agent_id: str) -> Optional[int]:
+        agent = await self.collection.find_one_and_update(
+            {"id": agent_id, "port": {"$ne": None}}, {"$set": {"port": None}}
+        )
+        if not agent:
+            return None
+        self._give_back(agent["port"])
+        return agent["port"]
+
+    def stats(self) -> Dict:
+        total = sum(end - start + 1 for start, end in self.ranges)
+        return {
+            "ranges": [f"{start}-{end}" for start, end in self.ranges],
+            "total": total,
+            "free": len(self._free),
+            "used": total - len(self._free),
+        }
+
+    def _give_back(self, port: int):
+        if self.owns(port) and port not in self._free_set:
+            self._free.append(port)
+            self._free_set.add(port)
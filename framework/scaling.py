@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class ColdStartError(Exception):
+    pass
+
+
+class AgentScaler:
+    """Scale-to-zero for agent containers.
+
+    The gateway reports every proxied request and stream, and a reaper stops
+    running agents that have seen no traffic for their idle timeout. A request
+    for a stopped agent starts it on demand and waits for ``/health/ready`` before it
+    is forwarded; how long that takes is recorded per agent so keep-warm
+    policies can be tuned.
+    """
+
+    def __init__(
+        self,
+        start: Callable[[str], Awaitable[Optional[int]]],
+        stop: Callable[[str], Awaitable],
+        list_running: Callable[[], Awaitable[List[Dict]]],
+        host: str = "localhost",
+        idle_timeout: float = 900.0,
+        interval: float = 30.0,
+        cold_start_timeout: float = 60.0,
+        latency_samples: int = 200,
+    ):
+        self.start_agent = start
+        self.stop_agent = stop
+        self.list_running = list_running
+        self.host = host
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.cold_start_timeout = cold_start_timeout
+        self.last_activity: Dict[str, float] = {}
+        self.active: Dict[str, int] = {}
+        self.cold_starts = 0
+        self.cold_start_failures = 0
+        self.reaped = 0
+        self.latencies: deque = deque(maxlen=latency_samples)
+        self.agent_latencies: Dict[str, Dict] = {}
+        self._starting: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def start(self):
+        self._client = httpx.AsyncClient(timeout=2.0)
+        self._task = asyncio.create_task(self._reap_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._client:
+            await self._client.aclose()
+
+    def touch(self, agent_id: str):
+        self.last_activity[agent_id] = time.monotonic()
+
+    def begin(self, agent_id: str):
+        """A request or stream to the agent started; it can't be reaped meanwhile"""
+        self.active[agent_id] = self.active.get(agent_id, 0) + 1
+        self.touch(agent_id)
+
+    def end(self, agent_id: str):
+        remaining = self.active.get(agent_id, 1) - 1
+        if remaining:
+            self.active[agent_id] = remaining
+        else:
+            self.active.pop(agent_id, None)
+        self.touch(agent_id)
+
+    async def ensure_running(self, agent_id: str) -> Optional[int]:
+        """Cold-start a stopped agent; concurrent callers share one start"""
+        task = self._starting.get(agent_id)
+        if task is None:
+            task = asyncio.create_task(self._cold_start(agent_id))
+            self._starting[agent_id] = task
+            task.add_done_callback(lambda _: self._starting.pop(agent_id, None))
+        # Shielded so one caller giving up doesn't abort the start for the rest
+        return await asyncio.shield(task)
+
+    async def _cold_start(self, agent_id: str) -> Optional[int]:
+        started = time.monotonic()
+        port = await self.start_agent(agent_id)
+        if port is None:
+            return None
+        try:
+            await self._wait_healthy(port)
+        except ColdStartError:
+            self.cold_start_failures += 1
+            raise
+
+        latency = time.monotonic() - started
+        self.cold_starts += 1
+        self.latencies.append(latency)
+        stats = self.agent_latencies.setdefault(agent_id, {"count": 0, "total": 0.0})
+        stats["count"] += 1
+        stats["total"] += latency
+        stats["last"] = latency
+        self.touch(agent_id)
+        logger.info(f"Cold-started agent {agent_id} in {latency:.2f}s")
+        return port
+
+    async def _wait_healthy(self, port: int):
+        deadline = time.monotonic() + self.cold_start_timeout
+        delay = 0.1
+        while time.monotonic() < deadline:
+            try:
+                # Listening comes first; ready means the agent's setup() is done
+                response = await self._client.get(
+                    f"http://{self.host}:{port}/health/ready"
+                )
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        raise ColdStartError(
+            f"Agent on port {port} not healthy after {self.cold_start_timeout}s"
+        )
+
+    async def reap_once(self):
+        now = time.monotonic()
+        for agent in await self.list_running():
+            agent_id = agent["id"]
+            idle_timeout = agent.get("idle_timeout", self.idle_timeout)
+            # 0 or null keeps the agent warm
+            if not idle_timeout or self.active.get(agent_id):
+                continue
+            if agent_id in self._starting:
+                continue
+            # Agents we have never seen traffic for get a full window from now
+            last_activity = self.last_activity.setdefault(agent_id, now)
+            if now - last_activity < idle_timeout:
+                continue
+
+            logger.info(
+                f"Stopping agent {agent_id} after {now - last_activity:.0f}s idle"
+            )
+            try:
+                await self.stop_agent(agent_id)
+                self.reaped += 1
+                self.last_activity.pop(agent_id, None)
+            except Exception as e:
+                logger.error(f"Error reaping agent {agent_id}: {str(e)}")
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap_once()
+            except Exception as e:
+                logger.error(f"Idle reaper failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "idle_timeout": self.idle_timeout,
+            "reaped": self.reaped,
+            "cold_starts": self.cold_starts,
+            "cold_start_failures": self.cold_start_failures,
+            "cold_start_avg_seconds": (
+                sum(latencies) / len(latencies) if latencies else None
+            ),
+            "cold_start_p95_seconds": (
+                latencies[int(len(latencies) * 0.95)] if latencies else None
+            ),
+            "starting": list(self._starting),
+            "agents": {
+                agent_id: {
+                    "cold_starts": stats["count"],
+                    "avg_seconds": stats["total"] / stats["count"],
+                    "last_seconds": stats["last"],
+                }
+                for agent_id, stats in self.agent_latencies.items()
+            },
+        }
@@ -1,14 +1,195 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import (
+    FastAPI,
+    WebSocket,
+    WebSocketDisconnect,
+    HTTPException,
+    Header,
+    Request,
+)
 import logging
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import aclosing, asynccontextmanager, nullcontext
+import asyncio
+import hmac
 import importlib.util
+import json
+import os
+import threading
+import time
 import traceback
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, Optional
+
+from agent_framework import executor, metrics, ws_protocol
+from agent_framework.host import AgentBusy, AgentHost, AgentLoadError
+from agent_framework.lifecycle import run_hook
+from agent_framework.loop_monitor import LoopMonitor
+from agent_framework.session_store import open_store
+from agent_framework.sessions import SessionPool, session_key
+from agent_framework.ws_writer import FrameWriter, SlowConsumer, writer_options
+from agent_framework.workers import (
+    FAILED,
+    READY,
+    WorkerSupervisor,
+    set_worker_state,
+    worker_readiness,
+)
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(
+    level=logging.INFO, format="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s"
+)
+for handler in logging.getLogger().handlers:
+    handler.addFilter(metrics.TraceIdFilter())
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Engine AI Agent Deployment")
+# In pool mode the container boots without an agent and waits for the
+# deployment API to push one through /_activate
+POOL_MODE = os.getenv("NOVIX_POOL_MODE") == "1"
+ACTIVATION_TOKEN = os.getenv("NOVIX_ACTIVATION_TOKEN")
+
+# In host mode one process serves many agents under /agents/{agent_id}/...
+HOST_MODE = os.getenv("NOVIX_HOST_MODE") == "1"
+# Pre-forked workers. Pooled and hosted runtimes get their agents over HTTP,
+# which only reaches one process, so they always run a single worker
+WORKERS = 1 if POOL_MODE or HOST_MODE else max(int(os.getenv("NOVIX_WORKERS", "1")), 1)
+# Load agent.py in the parent so workers share it copy-on-write
+PRELOAD_AGENT = os.getenv("NOVIX_PRELOAD_AGENT", "1") == "1"
+preloaded_agent = None
+
+# The agent is loaded and set up after the server starts listening; the
+# global ``agent`` only exists once it is ready for requests
+agent_status = "pooled" if POOL_MODE else "starting"
+agent_error: Optional[str] = None
+
+agent_host = AgentHost(
+    agents_dir=os.getenv("NOVIX_HOST_AGENTS_DIR", "./hosted_agents"),
+    max_agents=int(os.getenv("NOVIX_HOST_MAX_AGENTS", "20")),
+    max_rss_bytes=int(os.getenv("NOVIX_HOST_MAX_RSS_MB", "0")) * 1024 * 1024,
+    idle_ttl=float(os.getenv("NOVIX_HOST_IDLE_TTL", "0")),
+)
+
+loop_monitor = LoopMonitor(
+    stall_threshold=float(os.getenv("NOVIX_LOOP_STALL_MS", "250")) / 1000,
+    on_lag=metrics.loop_lag_seconds.observe,
+    on_stall=metrics.loop_stalls.inc,
+)
+
+# Written by agent_framework.importtime when the agent image is built
+IMPORT_PROFILE = os.getenv("NOVIX_IMPORT_PROFILE", "./import_profile.json")
+
+# Buffering and backpressure between agent.stream and the socket
+WS_WRITER_OPTIONS = writer_options()
+# Queries one multiplexed WebSocket may have in flight at once
+WS_MAX_CONCURRENT = max(int(os.getenv("NOVIX_WS_MAX_CONCURRENT", "4")), 1)
+
+# Per-conversation agent state, keyed by conversation_id or user_id. With
+# a shared store (sqlite:///...) any worker or replica serves any session
+session_pool = SessionPool(
+    max_sessions=int(os.getenv("NOVIX_SESSION_MAX", "10000")),
+    idle_ttl=float(os.getenv("NOVIX_SESSION_TTL", "1800")),
+    max_bytes=int(os.getenv("NOVIX_SESSION_MAX_MB", "256")) * 1024 * 1024,
+    on_evict=lambda reason: metrics.session_evictions.inc(reason=reason),
+    store=open_store(os.getenv("NOVIX_SESSION_STORE", "")),
+    flush_interval=float(os.getenv("NOVIX_SESSION_FLUSH_MS", "100")) / 1000,
+)
+# Stored snapshots outlive the in-memory session for this long
+SESSION_STORE_TTL = float(os.getenv("NOVIX_SESSION_STORE_TTL", str(7 * 86400)))
+metrics.active_sessions.function = lambda: len(session_pool.sessions)
+
+
+async def evict_idle_agents():
+    while True:
+        await asyncio.sleep(30)
+        try:
+            await agent_host.evict_idle()
+        except Exception as e:
+            logger.error(f"Idle eviction failed: {e}")
+
+
+async def evict_idle_sessions():
+    while True:
+        await asyncio.sleep(30)
+        session_pool.evict_idle()
+        try:
+            await session_pool.expire_stored(SESSION_STORE_TTL)
+        except Exception as e:
+            logger.error(f"Expiring stored sessions failed: {e}")
+
+
+async def start_agent(instance=None):
+    """Load agent.py off the event loop, then await the agent's setup()
+
+    Runs while the server already listens: /health/live answers at once and
+    /health/ready once this returns.
+    """
+    global agent, agent_status, agent_error
+    agent_status = "starting"
+    agent_error = None
+    started = time.monotonic()
+    try:
+        if instance is None:
+            # Off the loop: agents may block or call asyncio.run() in __init__
+            instance = await asyncio.get_running_loop().run_in_executor(
+                None, load_agent
+            )
+        try:
+            await run_hook(instance, "setup")
+        except Exception:
+            logger.error(traceback.format_exc())
+            raise
+    except Exception as e:
+        agent_status = "failed"
+        agent_error = str(e)
+        logger.error(f"Failed to init agent: {e}")
+        set_worker_state(FAILED)
+        return
+    agent = instance
+    agent_status = "ready"
+    metrics.agent_startup_seconds.set(time.monotonic() - started)
+    logger.info(f"Agent ready in {time.monotonic() - started:.2f}s")
+    set_worker_state(READY)
+
+
+async def stop_agent():
+    if "agent" not in globals():
+        return
+    try:
+        await run_hook(agent, "teardown")
+    except Exception as e:
+        logger.error(f"Agent teardown failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    startup_task = None
+    if not POOL_MODE and not HOST_MODE:
+        startup_task = asyncio.create_task(start_agent(preloaded_agent))
+    if HOST_MODE and not ACTIVATION_TOKEN:
+        logger.warning("NOVIX_ACTIVATION_TOKEN is not set, agents can't be loaded")
+    eviction_task = None
+    if HOST_MODE and agent_host.idle_ttl:
+        eviction_task = asyncio.create_task(evict_idle_agents())
+    session_pool.start()
+    session_task = None
+    if session_pool.idle_ttl:
+        session_task = asyncio.create_task(evict_idle_sessions())
+    yield
+    if eviction_task:
+        eviction_task.cancel()
+    if session_task:
+        session_task.cancel()
+    if startup_task:
+        startup_task.cancel()
+        await asyncio.gather(startup_task, return_exceptions=True)
+    await stop_agent()
+    await session_pool.stop()
+    await loop_monitor.stop()
+    executor.shutdown()
+
+
+app = FastAPI(title="Engine AI Agent Deployment", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +200,31 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    trace_id = metrics.new_trace_id(
+        request.headers.get("x-trace-id") or request.headers.get("x-request-id")
+    )
+    started = time.monotonic()
+    with loop_monitor.track() as lag:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.http_request_seconds.observe(
+        time.monotonic() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    response.headers["X-Trace-Id"] = trace_id
+    response.headers["X-Loop-Lag-Ms"] = f"{lag.max_lag * 1000:.1f}"
+    if lag.max_lag >= loop_monitor.stall_threshold:
+        logger.warning(
+            f"{request.method} {request.url.path} saw {lag.max_lag * 1000:.0f}ms "
+            f"of event loop lag"
+        )
+    return response
+
+
 def load_agent():
     try:
         logger.info("Loading the agent")
@@ -40,35 +246,197 @@ def load_agent():
         raise
 
 
-# TTry to load the agent at start up
-try:
-    agent = load_agent()
-except Exception as e:
-    logger.error(f"Failed to init agent: {e}")
+def preload_agent():
+    """Load the agent in the supervisor before forking, where that is safe
+
+    setup() still runs in each worker, on its own event loop.
+    """
+    global preloaded_agent
+    preloaded_agent = None
+    if not PRELOAD_AGENT:
+        return
+    instance = load_agent()
+    # Threads don't survive fork(): an agent that started any while loading
+    # (HTTP pools, SDK background refreshers) is loaded again in each worker
+    if threading.active_count() > 1:
+        logger.warning("Agent started threads while loading; workers load their own")
+        return
+    preloaded_agent = instance
+
+
+def serve_worker(sock):
+    import uvicorn
+
+    # The lifespan sets the agent up and reports the worker ready
+    # permessage-deflate is negotiated with clients that offer it
+    config = uvicorn.Config(app, log_level="info", ws_per_message_deflate=True)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+activation_lock = asyncio.Lock()
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint"""
     try:
+        if HOST_MODE:
+            return {"status": "healthy", "agents": len(agent_host.agents)}
+        workers = worker_readiness()
         if "agent" not in globals():
-            return {"status": "unavailable", "error": "Agent not loaded"}
-        return {"status": "healthy"}
+            if agent_status in ("pooled", "starting"):
+                return {
+                    "status": agent_status,
+                    **({"workers": workers} if workers else {}),
+                }
+            return {
+                "status": "unavailable",
+                "error": agent_error or "Agent not loaded",
+                **({"workers": workers} if workers else {}),
+            }
+        return {"status": "healthy", **({"workers": workers} if workers else {})}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and its event loop is answering"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once the agent can take requests, 503 while loading or failed"""
+    if HOST_MODE or "agent" in globals():
+        return {"status": "ready"}
+    content = {"status": agent_status}
+    if agent_error:
+        content["error"] = agent_error
+    return JSONResponse(status_code=503, content=content)
+
+
+def check_activation_token(token: Optional[str]):
+    # Loading agent code is never open: without a configured token it is off
+    if not ACTIVATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Agent loading is disabled")
+    if token is None or not hmac.compare_digest(
+        token.encode(), ACTIVATION_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid activation token")
+
+
+@app.post("/_activate")
+async def activate(
+    bundle: Dict[str, Any], x_novix_activation_token: Optional[str] = Header(None)
+):
+    """Hot-load an agent into a pooled runtime: {"source": agent.py, "env": {...}}"""
+    if not POOL_MODE or not ACTIVATION_TOKEN:
+        raise HTTPException(status_code=404, detail="Not a pooled runtime")
+    check_activation_token(x_novix_activation_token)
+
+    async with activation_lock:
+        if "agent" in globals():
+            raise HTTPException(status_code=409, detail="Agent already loaded")
+
+        os.environ.update(bundle.get("env") or {})
+        with open("./agent.py", "w") as f:
+            f.write(bundle["source"])
+        await start_agent()
+        if "agent" not in globals():
+            raise HTTPException(
+                status_code=500, detail=f"Failed to load agent: {agent_error}"
+            )
+
+    return {"status": "healthy"}
+
+
 @app.post("/query")
 async def query(request_data: Dict[str, Any]):
     """Process a non-streaming request"""
     if "agent" not in globals():
         raise HTTPException(status_code=503, detail="Agent not loaded")
 
+    return await run_query(agent, request_data)
+
+
+@app.post("/query/stream")
+async def query_stream(request: Request, request_data: Dict[str, Any]):
+    """Stream the answer as Server-Sent Events, or NDJSON with ?format=ndjson"""
+    if "agent" not in globals():
+        raise HTTPException(status_code=503, detail="Agent not loaded")
+
+    return stream_response(request, request_data, lambda: nullcontext(agent))
+
+
+def encode_sse(event: str, data: Any) -> str:
+    if event == "chunk":
+        return f"data: {json.dumps(data)}\n\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def encode_ndjson(event: str, data: Any) -> str:
+    if event == "chunk":
+        return json.dumps({"type": event, "data": data}) + "\n"
+    return json.dumps({"type": event, **data}) + "\n"
+
+
+def stream_response(
+    request: Request, request_data: Dict[str, Any], acquire, namespace: str = ""
+):
+    """The agent's stream over plain HTTP, driven by the same agent.stream
+
+    Chunks are written as they are produced. A client that goes away cancels
+    the response, and aclosing() then shuts the agent generator down.
+    """
+    ndjson = request.query_params.get(
+        "format"
+    ) == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    encode = encode_ndjson if ndjson else encode_sse
+
+    async def events():
+        timer = metrics.StreamTimer()
+        outcome = "error"
+        try:
+            with acquire() as agent_instance:
+                async with session_pool.session(
+                    agent_instance, request_data, namespace
+                ):
+                    stream = agent_instance.stream(request_data.get("query"))
+                    async with aclosing(stream) as chunks:
+                        async for chunk in chunks:
+                            data = encode("chunk", chunk)
+                            timer.chunk(len(data))
+                            yield data
+            yield encode("end", {"chunks": timer.chunks, "bytes": timer.bytes})
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "disconnected"
+            raise
+        except Exception as e:
+            logger.error(f"Error in agent.stream: {e}")
+            yield encode("error", {"error": str(e)})
+        finally:
+            timer.finish(outcome)
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        # Proxies must not buffer or cache a live stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def run_query(agent_instance, request_data: Dict[str, Any], namespace: str = ""):
+    started = time.monotonic()
     try:
-        result = await agent.process(request_data)
+        async with session_pool.session(agent_instance, request_data, namespace):
+            result = await agent_instance.process(request_data)
+        metrics.process_seconds.observe(time.monotonic() - started, outcome="ok")
         return result
     except Exception as e:
+        metrics.process_seconds.observe(time.monotonic() - started, outcome="error")
         logger.error(f"Error processing query: {e}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
@@ -78,25 +446,74 @@ async def query(request_data: Dict[str, Any]):
 async def websocket_endpoint(websocket: WebSocket):
     """Handle streaming requests via websocket"""
     if "agent" not in globals():
-        await websocket.accept()
-        await websocket.send_json({"error": "Agent not loaded", "type": "error"})
+        protocol = await ws_protocol.accept(websocket)
+        await protocol.fatal("Agent not loaded")
         await websocket.close()
         return
 
-    await websocket.accept()
+    protocol = await ws_protocol.accept(websocket)
+    await serve_stream(protocol, lambda: nullcontext(agent))
 
+
+async def serve_stream(
+    protocol: ws_protocol.TextProtocol, acquire, namespace: str = ""
+):
+    """Answer each query with the agent's chunks and an end frame
+
+    ``acquire()`` is entered around every query and yields the agent to
+    use, or None once it is gone. Multiplexed protocols run each query as
+    its own task, up to WS_MAX_CONCURRENT per connection. Queries that name
+    no conversation share the connection's session; on multiplexed protocols
+    each gets a session of its own instead, since queries of one session
+    are served one at a time.
+    """
+    websocket = protocol.websocket
+    connection_id = websocket.headers.get("x-trace-id") or uuid.uuid4().hex
+    queries = 0
+    requests: Dict[str, asyncio.Task] = {}
+    cancelled = set()
+    options = dict(WS_WRITER_OPTIONS)
+    if protocol.multiplexed:
+        # The connection's buffer budget is shared by its concurrent requests
+        options["max_buffer_bytes"] //= WS_MAX_CONCURRENT
+    metrics.active_websockets.inc()
     try:
         while True:
-            query = await websocket.receive_text()
-            try:
-                async for chunk in agent.stream(query):
-                    await websocket.send_text(chunk)
+            message = await protocol.receive()
+            if message.get("type") == "cancel":
+                task = requests.get(str(message.get("id")))
+                if task:
+                    cancelled.add(task)
+                    task.cancel()
+                continue
 
-                await websocket.send_text("[DONE]")
+            queries += 1
+            request_id = str(message.get("id") or f"{connection_id}.{queries}")
+            if not protocol.multiplexed and not session_key(message):
+                message["conversation_id"] = connection_id
+            stream = run_stream(
+                protocol, acquire, request_id, message, options, cancelled, namespace
+            )
+            if not protocol.multiplexed:
+                await stream
+                continue
 
-            except Exception as e:
-                logger.error(f"Error in agent.stream: {e}")
-                await websocket.send_text(f"Error: {str(e)}")
+            if request_id in requests:
+                stream.close()
+                await protocol.error(request_id, "Request id already in flight")
+                continue
+            if len(requests) >= WS_MAX_CONCURRENT:
+                stream.close()
+                await protocol.error(request_id, "Too many concurrent requests")
+                continue
+            task = asyncio.create_task(stream)
+            requests[request_id] = task
+            task.add_done_callback(
+                lambda task, request_id=request_id: (
+                    requests.pop(request_id, None),
+                    cancelled.discard(task),
+                )
+            )
 
     except WebSocketDisconnect:
         logger.info("Client disconnected")
@@ -107,9 +524,200 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass
         await websocket.close()
+    finally:
+        for task in requests.values():
+            task.cancel()
+        await asyncio.gather(*requests.values(), return_exceptions=True)
+        metrics.active_websockets.dec()
+
+
+async def run_stream(
+    protocol: ws_protocol.TextProtocol,
+    acquire,
+    request_id: str,
+    message: Dict[str, Any],
+    options: Dict[str, Any],
+    cancelled: set,
+    namespace: str = "",
+):
+    """Stream one query's answer; the socket is closed if it can't be served"""
+    websocket = protocol.websocket
+    metrics.new_trace_id(request_id)
+    timer = metrics.StreamTimer()
+    outcome = "error"
+    writer = FrameWriter(lambda text: protocol.send_text(request_id, text), **options)
+    try:
+        with acquire() as agent_instance, loop_monitor.track() as lag:
+            if agent_instance is None:
+                await protocol.fatal("Agent not loaded")
+                await websocket.close()
+                return
+            async with session_pool.session(agent_instance, message, namespace):
+                await protocol.begin(request_id)
+                # aclosing() finalizes the generator, and with it any upstream
+                # LLM call it is awaiting, as soon as the request stops
+                stream = agent_instance.stream(message.get("query"))
+                async with aclosing(stream) as chunks:
+                    async for chunk in chunks:
+                        text = protocol.text(chunk)
+                        if text is None:
+                            await writer.flush()
+                            await protocol.send_structured(request_id, chunk)
+                            timer.chunk(len(str(chunk)))
+                        else:
+                            timer.chunk(await writer.write(text))
+
+        await writer.flush()
+        await protocol.end(request_id, {"chunks": timer.chunks, "bytes": timer.bytes})
+        outcome = "ok"
+        if lag.max_lag >= loop_monitor.stall_threshold:
+            logger.warning(f"Stream saw {lag.max_lag * 1000:.0f}ms of event loop lag")
+
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        # Only a client's cancel is answered; teardown cancels propagate
+        if asyncio.current_task() not in cancelled:
+            raise
+        await protocol.cancelled(request_id)
+    except WebSocketDisconnect:
+        outcome = "disconnected"
+        if not protocol.multiplexed:
+            raise
+    except SlowConsumer as e:
+        outcome = "disconnected"
+        logger.warning(f"Disconnecting slow client: {e}")
+        metrics.slow_consumers.inc()
+        await websocket.close(code=1008, reason="Client too slow")
+        if not protocol.multiplexed:
+            raise WebSocketDisconnect(1008)
+    except Exception as e:
+        logger.error(f"Error in agent.stream: {e}")
+        try:
+            await writer.flush()
+            await protocol.error(request_id, str(e))
+        except Exception:
+            if not protocol.multiplexed:
+                raise
+    finally:
+        timer.finish(outcome)
+        protocol.finish(request_id)
+        metrics.dropped_chunks.inc(writer.dropped)
+        await writer.close()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics of the worker that answers the scrape"""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/_loop")
+async def loop_stats():
+    """Event loop lag and stalls seen by this worker"""
+    return loop_monitor.stats()
+
+
+@app.get("/_imports")
+async def import_profile():
+    """Import-time profile of agent.py recorded when the image was built"""
+    try:
+        with open(IMPORT_PROFILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No import profile in this image")
+
+
+@app.get("/_sessions")
+async def session_stats():
+    """Conversations held by this worker's session pool"""
+    return session_pool.stats()
+
+
+@app.get("/_agents")
+async def list_hosted_agents():
+    """Per-agent resource accounting for host mode"""
+    return agent_host.stats()
+
+
+@app.put("/_agents/{agent_id}")
+async def load_hosted_agent(
+    agent_id: str,
+    bundle: Dict[str, Any],
+    x_novix_activation_token: Optional[str] = Header(None),
+):
+    """Load or replace an agent in this host: {"source": agent.py, "env": {...}}"""
+    if not HOST_MODE:
+        raise HTTPException(status_code=404, detail="Not an agent host")
+    check_activation_token(x_novix_activation_token)
+    try:
+        await agent_host.load(agent_id, bundle["source"], bundle.get("env") or {})
+    except AgentLoadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except AgentBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to load agent: {e}")
+    # Sessions built by the replaced agent don't belong to the new one
+    session_pool.drop(agent_id)
+    return {"status": "healthy", **agent_host.get(agent_id).stats()}
+
+
+@app.delete("/_agents/{agent_id}")
+async def unload_hosted_agent(
+    agent_id: str, x_novix_activation_token: Optional[str] = Header(None)
+):
+    if not HOST_MODE:
+        raise HTTPException(status_code=404, detail="Not an agent host")
+    check_activation_token(x_novix_activation_token)
+    if not await agent_host.unload(agent_id):
+        raise HTTPException(status_code=404, detail="Agent not hosted")
+    session_pool.drop(agent_id)
+    return {"status": "unloaded"}
+
+
+@app.post("/agents/{agent_id}/query")
+async def hosted_query(agent_id: str, request_data: Dict[str, Any]):
+    with agent_host.serving(agent_id) as agent_instance:
+        if agent_instance is None:
+            raise HTTPException(status_code=404, detail="Agent not hosted")
+        return await run_query(agent_instance, request_data, agent_id)
+
+
+@app.post("/agents/{agent_id}/query/stream")
+async def hosted_query_stream(
+    agent_id: str, request: Request, request_data: Dict[str, Any]
+):
+    if not agent_host.get(agent_id):
+        raise HTTPException(status_code=404, detail="Agent not hosted")
+    return stream_response(
+        request, request_data, lambda: agent_host.serving(agent_id), agent_id
+    )
+
+
+@app.websocket("/agents/{agent_id}/stream")
+async def hosted_stream(websocket: WebSocket, agent_id: str):
+    protocol = await ws_protocol.accept(websocket)
+    if not agent_host.get(agent_id):
+        await protocol.fatal("Agent not hosted")
+        await websocket.close()
+        return
+
+    await serve_stream(protocol, lambda: agent_host.serving(agent_id), agent_id)
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS > 1:
+        try:
+            preload_agent()
+        except Exception as e:
+            # Each worker tries again and reports the failure as not ready
+            logger.error(f"Failed to preload agent: {e}")
+        # SIGHUP reloads agent.py and replaces the workers one at a time
+        WorkerSupervisor(serve_worker, WORKERS, port=8000, prepare=preload_agent).run()
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
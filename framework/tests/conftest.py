@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+# The framework's modules are top-level scripts (app.py, server.py, ...)
+FRAMEWORK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRAMEWORK_DIR)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeCollection:
+    """Just enough of a motor collection for the allocator and caches"""
+
+    def __init__(self, docs=(), unique=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.unique = unique
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, condition in query.items():
+            value = doc.get(key)
+            if isinstance(condition, dict):
+                if "$ne" in condition and value == condition["$ne"]:
+                    return False
+                if "$type" in condition and not isinstance(value, int):
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def _check_unique(self, doc):
+        from pymongo.errors import DuplicateKeyError
+
+        for key in self.unique:
+            value = doc.get(key)
+            if value is None:
+                continue
+            for other in self.docs:
+                if other is not doc and other.get(key) == value:
+                    raise DuplicateKeyError(f"duplicate {key}: {value}")
+
+    def _update(self, doc, update):
+        changed = {**doc, **update.get("$set", {})}
+        for key, amount in update.get("$inc", {}).items():
+            changed[key] = changed.get(key, 0) + amount
+        self._check_unique(changed)
+        doc.update(changed)
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def find_one(self, query):
+        return next((dict(d) for d in self.docs if self._matches(d, query)), None)
+
+    async def distinct(self, key, query):
+        return list({d[key] for d in self.docs if self._matches(d, query)})
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                self._update(doc, update)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                self._update(doc, update)
+                return
+
+    async def find_one_and_update(self, query, update, return_document=False):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                before = dict(doc)
+                self._update(doc, update)
+                return dict(doc) if return_document else before
+        return None
+
+    async def replace_one(self, query, replacement, upsert=False):
+        for index, doc in enumerate(self.docs):
+            if self._matches(doc, query):
+                self.docs[index] = dict(replacement)
+                return
+        if upsert:
+            self.docs.append(dict(replacement))
+
+    async def delete_one(self, query):
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection
+
+
+@pytest.fixture
+def load_server(monkeypatch, tmp_path):
+    """Import a fresh server.py in ``tmp_path`` with the given env and agent.py"""
+
+    def load(agent_source=None, **env):
+        monkeypatch.chdir(tmp_path)
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        if agent_source is not None:
+            (tmp_path / "agent.py").write_text(agent_source)
+        sys.modules.pop("server", None)
+        import server
+
+        return server
+
+    yield load
+    sys.modules.pop("server", None)
+
+
+@pytest.fixture
+def start_agent(load_server):
+    """A TestClient for server.py serving ``source`` once the agent is ready"""
+    clients = []
+
+    def start(source):
+        client = TestClient(load_server(source).app)
+        client.__enter__()
+        clients.append(client)
+        deadline = time.monotonic() + 5
+        while client.get("/health/ready").status_code != 200:
+            assert time.monotonic() < deadline, "agent did not become ready"
+            time.sleep(0.01)
+        return client
+
+    yield start
+    for client in clients:
+        client.__exit__(None, None, None)
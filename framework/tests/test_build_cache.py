@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from build_cache import (
+    DependencyCache,
+    normalize_requirements,
+    requirements_hash,
+    requirements_within,
+)
+
+
+def test_normalize_sorts_dedupes_and_canonicalizes_names():
+    text = "Requests >= 2.0  # http\n\n# comment\nPyYAML==6.0\nrequests>=2.0\n"
+    assert normalize_requirements(text) == "pyyaml==6.0\nrequests>=2.0\n"
+
+
+def test_normalize_keeps_option_lines_first_and_as_written():
+    text = (
+        "fastapi\n"
+        "--extra-index-url https://x/simple\n"
+        "-e git+https://example.com/x.git#egg=x\n"
+        "--extra-index-url https://x/simple\n"
+    )
+    assert normalize_requirements(text) == (
+        "--extra-index-url https://x/simple\n"
+        "-e git+https://example.com/x.git#egg=x\n"
+        "fastapi\n"
+    )
+
+
+def test_normalize_keeps_spaces_in_markers_and_hashes():
+    text = (
+        'foo ;  python_version < "3.8" and sys_platform == "linux"\n'
+        "bar == 1.0   --hash=sha256:abc  --hash=sha256:def\n"
+    )
+    assert normalize_requirements(text) == (
+        "bar==1.0 --hash=sha256:abc --hash=sha256:def\n"
+        'foo; python_version < "3.8" and sys_platform == "linux"\n'
+    )
+
+
+@pytest.mark.parametrize(
+    "line", ["-r other.txt", "-rother.txt", "--requirement other.txt", "-c c.txt"]
+)
+def test_normalize_refuses_includes(line):
+    with pytest.raises(ValueError, match="can't include other files"):
+        normalize_requirements(f"fastapi\n{line}\n")
+
+
+def test_requirements_within_base():
+    base = "fastapi[standard]\nhttpx==0.27.0\n"
+    assert requirements_within("FastAPI\nhttpx == 0.27.0\n", base)
+    assert requirements_within("httpx\n", base)
+    assert not requirements_within("httpx>=0.28\n", base)
+    assert not requirements_within("pandas\n", base)
+    assert not requirements_within("--extra-index-url https://x/simple\n", base)
+
+
+def test_requirements_hash_ignores_formatting_but_not_base_image():
+    first = requirements_hash("a\nB==1\n", "base:1")
+    assert first == requirements_hash("# deps\nb == 1\na\n", "base:1")
+    assert first != requirements_hash("a\nB==1\n", "base:2")
+
+
+def make_cache(collection, builds, fail=False):
+    cache = DependencyCache(collection(), "/tmp")
+
+    async def build(deps_hash, requirements, base_image, on_line=None):
+        builds.append(deps_hash)
+        await asyncio.sleep(0.01)
+        if fail:
+            raise RuntimeError("Dependency layer build failed")
+        return {"hash": deps_hash, "image_name": cache.image_name(deps_hash)}
+
+    async def image_exists(image_name):
+        return True
+
+    async def evict():
+        pass
+
+    cache._build = build
+    cache._image_exists = image_exists
+    cache.evict = evict
+    return cache
+
+
+@pytest.mark.anyio
+async def test_ensure_builds_a_hash_once_for_concurrent_callers(collection):
+    builds = []
+    cache = make_cache(collection, builds)
+    images = await asyncio.gather(*(cache.ensure("httpx\n", "base") for _ in range(5)))
+    assert len(builds) == 1
+    assert len(set(images)) == 1
+    assert (cache.hits, cache.misses) == (4, 1)
+    # Locks only live while someone holds or waits on them
+    assert len(cache._locks) == 0
+
+
+@pytest.mark.anyio
+async def test_failed_build_lets_the_next_caller_retry(collection):
+    builds = []
+    cache = make_cache(collection, builds, fail=True)
+    results = await asyncio.gather(
+        *(cache.ensure("httpx\n", "base") for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # Each waiter retries in turn instead of building alongside another
+    assert len(builds) == 3
+    assert cache.entries == {}
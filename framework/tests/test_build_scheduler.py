@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from build_scheduler import PRIORITY_CREATE, PRIORITY_UPDATE, BuildScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+class Builds:
+    def __init__(self):
+        self.started = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, agent_id, *args):
+        self.started.append(agent_id)
+        await self.release.wait()
+        if agent_id.startswith("bad"):
+            raise RuntimeError("build failed")
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_updates_run_before_creates():
+    builds = Builds()
+    scheduler = BuildScheduler(builds, workers=1)
+    scheduler.start()
+    scheduler.submit("first")
+    await settle()
+    scheduler.submit("new", priority=PRIORITY_CREATE)
+    scheduler.submit("updated", priority=PRIORITY_UPDATE)
+    builds.release.set()
+    await scheduler.queue.join()
+    assert builds.started == ["first", "updated", "new"]
+    assert scheduler.completed == 3
+    await scheduler.stop()
+
+
+async def test_superseding_a_running_build_counts_once():
+    builds = Builds()
+    scheduler = BuildScheduler(builds, workers=1)
+    scheduler.start()
+    scheduler.submit("a")
+    await settle()
+    # update_agent cancels, then submit() cancels again
+    assert scheduler.cancel("a")
+    scheduler.submit("a", priority=PRIORITY_UPDATE)
+    assert scheduler.superseded == 1
+    builds.release.set()
+    await scheduler.queue.join()
+    assert builds.started == ["a", "a"]
+    assert (scheduler.completed, scheduler.failed) == (1, 0)
+    await scheduler.stop()
+
+
+async def test_superseding_a_queued_build():
+    builds = Builds()
+    scheduler = BuildScheduler(builds, workers=1)
+    scheduler.start()
+    scheduler.submit("busy")
+    await settle()
+    scheduler.submit("a")
+    scheduler.submit("a")
+    assert scheduler.superseded == 1
+    assert scheduler.stats()["queue_depth"] == 1
+    builds.release.set()
+    await scheduler.queue.join()
+    assert builds.started == ["busy", "a"]
+    await scheduler.stop()
+
+
+async def test_cancel_without_a_build_is_a_no_op():
+    scheduler = BuildScheduler(Builds(), workers=1)
+    assert not scheduler.cancel("a")
+    assert scheduler.superseded == 0
+
+
+async def test_failures_are_counted():
+    builds = Builds()
+    builds.release.set()
+    scheduler = BuildScheduler(builds, workers=2)
+    scheduler.start()
+    scheduler.submit("ok")
+    scheduler.submit("bad")
+    await scheduler.queue.join()
+    assert (scheduler.completed, scheduler.failed) == (1, 1)
+    await scheduler.stop()
+
+
+async def test_stop_right_after_a_supersede_does_not_hang():
+    builds = Builds()
+    scheduler = BuildScheduler(builds, workers=1)
+    scheduler.start()
+    scheduler.submit("a")
+    await settle()
+    scheduler.cancel("a")
+    scheduler.submit("a")
+    await asyncio.wait_for(scheduler.stop(), 1)
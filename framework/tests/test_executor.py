@@ -0,0 +1,32 @@
+import importlib.util
+
+import pytest
+
+from agent_framework import executor
+
+pytestmark = pytest.mark.anyio
+
+MODULE = """
+from agent_framework import offload
+
+@offload("process")
+def square(n):
+    return n * n
+"""
+
+
+async def test_process_offload_runs_functions_of_file_loaded_modules(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(executor, "_process_functions", {})
+    monkeypatch.setattr(executor, "_process_modules", {})
+    path = tmp_path / "agent.py"
+    path.write_text(MODULE)
+    # Loaded like server.py loads agent.py: not importable by name
+    spec = importlib.util.spec_from_file_location("agent_module", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    try:
+        assert await module.square(7) == 49
+    finally:
+        executor.shutdown()
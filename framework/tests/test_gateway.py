@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+import websockets
+
+from gateway import AgentGateway
+
+pytestmark = pytest.mark.anyio
+
+
+class ClientWebSocket:
+    """The FastAPI side of a relayed connection"""
+
+    def __init__(self):
+        self.scope = {}
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.accepted = asyncio.Event()
+
+    async def accept(self, subprotocol=None):
+        self.accepted.set()
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, message):
+        await self.sent.put(message)
+
+    async def send_bytes(self, message):
+        await self.sent.put(message)
+
+    async def close(self):
+        pass
+
+
+async def echo(ws):
+    async for message in ws:
+        await ws.send(message)
+
+
+async def test_relay_holds_a_slot_and_forget_keeps_held_limiters():
+    async with websockets.serve(echo, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+
+        async def resolve(agent_id):
+            return port
+
+        gateway = AgentGateway(resolve, host="127.0.0.1", per_agent_limit=1)
+        await gateway.start()
+        client = ClientWebSocket()
+        relay = asyncio.create_task(gateway.relay_websocket("a", client))
+        await client.accepted.wait()
+        await client.incoming.put({"type": "websocket.receive", "text": "hi"})
+        assert await client.sent.get() == "hi"
+        assert gateway.in_flight == {"a": 1}
+
+        # The agent stopped while the relay is open: its limiter must stay
+        gateway.forget("a")
+        assert gateway._limiter("a").locked()
+
+        await client.incoming.put({"type": "websocket.disconnect"})
+        await relay
+        assert gateway.in_flight == {}
+        gateway.forget("a")
+        assert "a" not in gateway._limiters
+        await gateway.close()
+
+
+async def test_failed_relay_releases_its_slot():
+    async def resolve(agent_id):
+        return 1
+
+    gateway = AgentGateway(resolve, host="127.0.0.1", per_agent_limit=1)
+    await gateway.start()
+    with pytest.raises(OSError):
+        await gateway.relay_websocket("a", ClientWebSocket())
+    assert gateway.in_flight == {}
+    assert not gateway._limiter("a").locked()
+    await gateway.close()
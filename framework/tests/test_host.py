@@ -0,0 +1,110 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent_framework import host as host_module
+from agent_framework.host import AgentBusy, AgentHost, AgentLoadError
+
+AGENT = "class Agent:\n    pass\n"
+FAILING_AGENT = "raise RuntimeError('boom')\n"
+
+
+@pytest.fixture
+def agent_host(tmp_path):
+    return AgentHost(agents_dir=str(tmp_path / "hosted"))
+
+
+@pytest.mark.anyio
+async def test_agents_may_not_override_host_variables(agent_host):
+    with pytest.raises(AgentLoadError, match="PATH is already set"):
+        await agent_host.load("a", AGENT, {"PATH": "/nowhere"})
+    # The same value is fine and stays when the agent goes
+    await agent_host.load("a", AGENT, {"PATH": os.environ["PATH"]})
+    await agent_host.unload("a")
+    assert "PATH" in os.environ
+
+
+@pytest.mark.anyio
+async def test_agent_variables_live_as_long_as_an_agent_needs_them(
+    agent_host, monkeypatch
+):
+    monkeypatch.delenv("NOVIX_TEST_SHARED", raising=False)
+    await agent_host.load("a", AGENT, {"NOVIX_TEST_SHARED": "1"})
+    await agent_host.load("b", AGENT, {"NOVIX_TEST_SHARED": "1"})
+    with pytest.raises(AgentLoadError, match="conflicts with agent a, b"):
+        await agent_host.load("c", AGENT, {"NOVIX_TEST_SHARED": "2"})
+    await agent_host.unload("a")
+    assert os.environ["NOVIX_TEST_SHARED"] == "1"
+    await agent_host.unload("b")
+    assert "NOVIX_TEST_SHARED" not in os.environ
+
+
+@pytest.mark.anyio
+async def test_reloading_an_agent_may_change_its_variables(agent_host, monkeypatch):
+    monkeypatch.delenv("NOVIX_TEST_VAR", raising=False)
+    await agent_host.load("a", AGENT, {"NOVIX_TEST_VAR": "1"})
+    await agent_host.load("a", AGENT, {"NOVIX_TEST_VAR": "2"})
+    assert os.environ["NOVIX_TEST_VAR"] == "2"
+    await agent_host.unload("a")
+    assert "NOVIX_TEST_VAR" not in os.environ
+
+
+@pytest.mark.anyio
+async def test_failed_load_removes_its_variables(agent_host, monkeypatch):
+    monkeypatch.delenv("NOVIX_TEST_VAR", raising=False)
+    with pytest.raises(RuntimeError, match="boom"):
+        await agent_host.load("a", FAILING_AGENT, {"NOVIX_TEST_VAR": "1"})
+    assert "NOVIX_TEST_VAR" not in os.environ
+    assert agent_host.get("a") is None
+
+
+@pytest.mark.anyio
+async def test_agent_limit_evicts_the_least_recently_used(tmp_path):
+    agent_host = AgentHost(agents_dir=str(tmp_path), max_agents=2)
+    for agent_id in ("a", "b"):
+        await agent_host.load(agent_id, AGENT, {})
+    with agent_host.serving("a"):
+        pass
+    await agent_host.load("c", AGENT, {})
+    assert sorted(agent_host.agents) == ["a", "c"]
+    with agent_host.serving("a"), agent_host.serving("c"):
+        with pytest.raises(AgentBusy):
+            await agent_host.load("d", AGENT, {})
+
+
+@pytest.mark.anyio
+async def test_memory_limit_counts_what_agents_are_charged(tmp_path, monkeypatch):
+    rss = [100]
+    monkeypatch.setattr(host_module, "current_rss", lambda: rss[0])
+
+    class GrowingHost(AgentHost):
+        def _import(self, agent_id, path):
+            # Loading grows RSS by 20; unloading never gives it back
+            rss[0] += 20
+            return super()._import(agent_id, path)
+
+    agent_host = GrowingHost(agents_dir=str(tmp_path), max_rss_bytes=130)
+    for agent_id in ("a", "b", "c", "d"):
+        await agent_host.load(agent_id, AGENT, {})
+    # Base 100 + 20 per agent: past the limit each load evicts exactly one
+    assert sorted(agent_host.agents) == ["c", "d"]
+    assert agent_host.evictions == 2
+    assert agent_host.charged_bytes() == 140
+    assert rss[0] == 180
+
+
+@pytest.mark.parametrize("token", ["", "secret"])
+def test_hosted_agents_need_the_activation_token(load_server, token):
+    server = load_server(NOVIX_HOST_MODE="1", NOVIX_ACTIVATION_TOKEN=token)
+    bundle = {"source": AGENT, "env": {}}
+    with TestClient(server.app) as client:
+        assert client.put("/_agents/a", json=bundle).status_code == 403
+        wrong = {"X-Novix-Activation-Token": "wrong"}
+        assert client.put("/_agents/a", json=bundle, headers=wrong).status_code == 403
+        right = {"X-Novix-Activation-Token": "secret"}
+        response = client.put("/_agents/a", json=bundle, headers=right)
+        assert response.status_code == (200 if token else 403)
+        assert client.delete("/_agents/a").status_code == 403
+        response = client.delete("/_agents/a", headers=right)
+        assert response.status_code == (200 if token else 403)
@@ -0,0 +1,77 @@
+import pytest
+
+from port_allocator import NoPortsAvailable, PortAllocator, parse_port_ranges
+
+pytestmark = pytest.mark.anyio
+
+
+def test_parse_port_ranges():
+    assert parse_port_ranges("8100-8102, 9000,") == [(8100, 8102), (9000, 9000)]
+
+
+async def make_allocator(collection, docs, ranges=((8100, 8102),)):
+    agents = collection(docs, unique=("port",))
+    allocator = PortAllocator(agents, list(ranges))
+    await allocator.load()
+    return agents, allocator
+
+
+async def test_reserve_skips_ports_held_in_mongo(collection):
+    agents, allocator = await make_allocator(
+        collection, [{"id": "a", "port": 8100}, {"id": "b", "port": None}]
+    )
+    assert await allocator.reserve("b") == 8101
+    assert await agents.find_one({"id": "b"}) == {"id": "b", "port": 8101}
+    assert allocator.stats()["free"] == 1
+
+
+async def test_deleted_agents_give_their_ports_back_on_load(collection):
+    agents, allocator = await make_allocator(
+        collection, [{"id": "a", "port": 8100, "status": "deleted"}]
+    )
+    assert (await agents.find_one({"id": "a"}))["port"] is None
+    assert allocator.stats()["free"] == 3
+
+
+async def test_reserve_returns_the_port_an_agent_already_holds(collection):
+    agents, allocator = await make_allocator(collection, [{"id": "a", "port": None}])
+    port = await allocator.reserve("a")
+    assert await allocator.reserve("a") == port
+    # The port popped for the second attempt went back on the free list
+    assert allocator.stats()["free"] == 2
+
+
+async def test_reserve_skips_ports_taken_by_another_replica(collection):
+    agents, allocator = await make_allocator(
+        collection, [{"id": "a", "port": None}, {"id": "b", "port": None}]
+    )
+    # Another API replica hands out 8100 after this one hydrated
+    agents.docs[1]["port"] = 8100
+    assert await allocator.reserve("a") == 8101
+    assert 8100 not in allocator._free_set
+
+
+async def test_release_returns_the_port_to_the_free_list(collection):
+    agents, allocator = await make_allocator(collection, [{"id": "a", "port": None}])
+    port = await allocator.reserve("a")
+    assert await allocator.release("a") == port
+    assert await allocator.release("a") is None
+    assert allocator.stats()["free"] == 3
+
+
+async def test_reserve_raises_when_exhausted(collection):
+    agents, allocator = await make_allocator(
+        collection,
+        [{"id": "a", "port": None}, {"id": "b", "port": None}],
+        ranges=((8100, 8100),),
+    )
+    await allocator.reserve("a")
+    with pytest.raises(NoPortsAvailable):
+        await allocator.reserve("b")
+
+
+async def test_reserve_for_a_missing_agent(collection):
+    agents, allocator = await make_allocator(collection, [])
+    with pytest.raises(NoPortsAvailable, match="not found"):
+        await allocator.reserve("ghost")
+    assert allocator.stats()["free"] == 3
@@ -0,0 +1,46 @@
+import json
+
+AGENT = """
+class Agent:
+    async def stream(self, query):
+        if query == "fail":
+            raise RuntimeError("boom")
+        yield f"{query}:"
+        yield "done"
+"""
+
+
+def test_sse_stream(start_agent):
+    client = start_agent(AGENT)
+    response = client.post("/query/stream", json={"query": "hi"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == (
+        'data: "hi:"\n\n'
+        'data: "done"\n\n'
+        'event: end\ndata: {"chunks": 2, "bytes": 27}\n\n'
+    )
+
+
+def test_ndjson_stream(start_agent):
+    client = start_agent(AGENT)
+    response = client.post("/query/stream?format=ndjson", json={"query": "hi"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[:2] == [
+        {"type": "chunk", "data": "hi:"},
+        {"type": "chunk", "data": "done"},
+    ]
+    assert lines[2]["type"] == "end"
+
+
+def test_errors_end_the_stream_with_an_error_event(start_agent):
+    client = start_agent(AGENT)
+    response = client.post(
+        "/query/stream",
+        json={"query": "fail"},
+        headers={"accept": "application/x-ndjson"},
+    )
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"type": "error", "error": "boom"}
+    ]
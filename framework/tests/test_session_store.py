@@ -0,0 +1,55 @@
+import pytest
+
+from agent_framework.session_store import MemorySessionStore, dumps, loads
+from agent_framework.sessions import SessionPool, session_state
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingAgent:
+    def __init__(self):
+        self.sessions = 0
+
+    async def new_session(self, session):
+        self.sessions += 1
+        session.state["_client"] = object()
+
+
+def test_dumps_skips_runtime_and_unserializable_values():
+    data = dumps({"n": 1, "_client": object(), "bad": object()})
+    assert loads(data) == {"n": 1}
+
+
+async def test_evicted_state_comes_back_from_the_store():
+    store = MemorySessionStore()
+    pool = SessionPool(max_sessions=1, store=store)
+    agent = CountingAgent()
+    async with pool.session(agent, {"conversation_id": "a"}):
+        session_state()["n"] = 1
+    # Evicting a snapshots it; the flush writes it out
+    async with pool.session(agent, {"conversation_id": "b"}):
+        pass
+    await pool.flush()
+    assert "/a" in store.items
+
+    async with pool.session(agent, {"conversation_id": "a"}) as session:
+        assert session.state["n"] == 1
+        # Runtime objects are rebuilt by new_session, never stored
+        assert "_client" in session.state
+    assert agent.sessions == 3
+    await pool.stop()
+
+
+async def test_unchanged_state_is_not_rewritten():
+    store = MemorySessionStore()
+    pool = SessionPool(store=store)
+    agent = CountingAgent()
+    async with pool.session(agent, {"conversation_id": "a"}):
+        session_state()["n"] = 1
+    await pool.flush()
+    stamp = store.items["/a"][0]
+    async with pool.session(agent, {"conversation_id": "a"}):
+        pass
+    await pool.flush()
+    assert store.items["/a"][0] == stamp
+    assert pool.stats()["unsaved"] == 0
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from agent_framework.sessions import SessionPool, session_key, session_state
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingAgent:
+    def __init__(self):
+        self.sessions = 0
+
+    async def new_session(self, session):
+        self.sessions += 1
+        session.state["_client"] = object()
+
+
+def test_session_key_prefers_conversation_id():
+    assert session_key({"conversation_id": 7, "user_id": "u"}) == "7"
+    assert session_key({"user_id": "u"}) == "u"
+    assert session_key({"query": "hi"}) is None
+    assert session_key("hi") is None
+
+
+async def test_state_belongs_to_the_conversation():
+    pool = SessionPool()
+    agent = CountingAgent()
+    for conversation in ("a", "a", "b"):
+        async with pool.session(agent, {"conversation_id": conversation}):
+            state = session_state()
+            state["n"] = state.get("n", 0) + 1
+    assert pool.sessions[("", "a")].state["n"] == 2
+    assert pool.sessions[("", "b")].state["n"] == 1
+    assert agent.sessions == 2
+
+
+async def test_anonymous_requests_get_a_throwaway_session():
+    pool = SessionPool()
+    agent = CountingAgent()
+    async with pool.session(agent, {"query": "hi"}) as session:
+        session.state["n"] = 1
+    async with pool.session(agent, {"query": "hi"}) as session:
+        assert "n" not in session.state
+    assert pool.sessions == {}
+    assert agent.sessions == 2
+    assert session_state() == {}
+
+
+async def test_least_recently_used_sessions_are_evicted():
+    reasons = []
+    pool = SessionPool(max_sessions=2, on_evict=reasons.append)
+    agent = CountingAgent()
+    for conversation in ("a", "b", "a", "c"):
+        async with pool.session(agent, {"conversation_id": conversation}):
+            pass
+    assert [key[1] for key in pool.sessions] == ["a", "c"]
+    assert reasons == ["lru"]
+    assert pool.evictions == 1
+
+
+async def test_sessions_in_use_are_not_evicted():
+    pool = SessionPool(max_sessions=1)
+    agent = CountingAgent()
+    async with pool.session(agent, {"conversation_id": "a"}):
+        async with pool.session(agent, {"conversation_id": "b"}):
+            pass
+        # b was the only idle one
+        assert [key[1] for key in pool.sessions] == ["a"]
+
+
+async def test_memory_limit_evicts_the_oldest():
+    reasons = []
+    pool = SessionPool(max_bytes=1, on_evict=reasons.append)
+    agent = CountingAgent()
+    for conversation in ("a", "b"):
+        async with pool.session(agent, {"conversation_id": conversation}):
+            session_state()["blob"] = "x" * 1000
+    assert pool.sessions == {}
+    assert reasons == ["memory", "memory"]
+    assert pool.bytes == 0
+
+
+async def test_idle_sessions_expire():
+    pool = SessionPool(idle_ttl=60)
+    agent = CountingAgent()
+    async with pool.session(agent, {"conversation_id": "a"}):
+        pass
+    assert pool.evict_idle() == 0
+    pool.sessions[("", "a")].last_used -= 61
+    assert pool.evict_idle() == 1
+    assert pool.sessions == {}
+
+
+async def test_requests_of_one_conversation_run_one_at_a_time():
+    pool = SessionPool()
+    agent = CountingAgent()
+    events = []
+
+    async def request(conversation, name):
+        async with pool.session(agent, {"conversation_id": conversation}):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    await asyncio.gather(request("a", "r1"), request("a", "r2"))
+    assert events == ["r1 start", "r1 end", "r2 start", "r2 end"]
+
+    events.clear()
+    await asyncio.gather(request("a", "r1"), request("b", "r2"))
+    assert events[:2] == ["r1 start", "r2 start"]
+
+
+async def test_drop_forgets_one_namespace():
+    pool = SessionPool()
+    agent = CountingAgent()
+    for namespace in ("x", "y"):
+        async with pool.session(agent, {"conversation_id": "a"}, namespace):
+            pass
+    assert pool.drop("x") == 1
+    assert list(pool.sessions) == [("y", "a")]
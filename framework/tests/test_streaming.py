@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent_framework.streaming import stream_text_deltas
+
+pytestmark = pytest.mark.anyio
+
+
+class StreamedRun:
+    """Runner.run_streamed() result yielding text deltas"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.cancelled = False
+
+    async def stream_events(self):
+        for delta in self.deltas:
+            await asyncio.sleep(0.001)
+            yield SimpleNamespace(
+                type="raw_response_event",
+                data=SimpleNamespace(type="response.output_text.delta", delta=delta),
+            )
+
+    def cancel(self):
+        self.cancelled = True
+
+
+async def test_deltas_are_forwarded_as_they_arrive():
+    run = StreamedRun(["a", "b", "c"])
+    assert [chunk async for chunk in stream_text_deltas(run, 0)] == ["a", "b", "c"]
+
+
+async def test_coalescing_by_size():
+    run = StreamedRun(["ab", "cd", "e"])
+    chunks = [chunk async for chunk in stream_text_deltas(run, 1000, 4)]
+    assert chunks == ["abcd", "e"]
+
+
+@pytest.mark.parametrize("coalesce_ms", [0, 20])
+async def test_abandoned_delta_stream_cancels_the_run(coalesce_ms):
+    run = StreamedRun([f"{i} " for i in range(100)])
+    stream = stream_text_deltas(run, coalesce_ms=coalesce_ms)
+    async for _ in stream:
+        break
+    await stream.aclose()
+    assert run.cancelled
+
+
+@pytest.mark.parametrize("coalesce_ms", [0, 20])
+async def test_finished_delta_stream_leaves_the_run_alone(coalesce_ms):
+    run = StreamedRun(["a", "b", "c"])
+    text = "".join([chunk async for chunk in stream_text_deltas(run, coalesce_ms)])
+    assert text == "abc"
+    assert not run.cancelled
@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+import pytest
+
+from container_runtime import FakeRuntime
+from warm_pool import POOL_CONTAINER_PREFIX, WarmPool
+
+pytestmark = pytest.mark.anyio
+
+
+async def base_image():
+    return "novix-base:test"
+
+
+async def start_pool(runtime, handler, size=2, ports=((9800, 9802),)):
+    pool = WarmPool(runtime, base_image, list(ports), size=size)
+    await pool.start()
+    # Swapped in before the refill task first runs
+    await pool._client.aclose()
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    while len(pool.ready) < size:
+        await asyncio.sleep(0.01)
+    return pool
+
+
+def pooled_runtime(activations, fail=False):
+    def handler(request):
+        if request.url.path == "/health":
+            return httpx.Response(200, json={"status": "pooled"})
+        activations.append(
+            (request.url.port, request.headers["x-novix-activation-token"])
+        )
+        return httpx.Response(500 if fail else 200, json={"status": "healthy"})
+
+    return handler
+
+
+async def test_pool_boots_containers_on_pool_ports():
+    runtime = FakeRuntime()
+    await runtime.run("old", f"{POOL_CONTAINER_PREFIX}stale", {})
+    pool = await start_pool(runtime, pooled_runtime([]))
+    # The stale container from an earlier run was removed first
+    assert len(runtime.containers) == 2
+    ports = sorted(entry["port"] for entry in pool.ready)
+    assert ports == [9800, 9801]
+    for container in runtime.containers.values():
+        assert container["environment"]["NOVIX_POOL_MODE"] == "1"
+    await pool.stop()
+    assert runtime.containers == {}
+
+
+async def test_activation_hands_a_container_to_the_agent():
+    activations = []
+    runtime = FakeRuntime()
+    pool = await start_pool(runtime, pooled_runtime(activations), size=1)
+    entry = pool.ready[0]
+    container_id, port = await pool.activate("a", "class Agent: pass", {})
+    assert (container_id, port) == (entry["container_id"], entry["port"])
+    assert activations == [(port, entry["token"])]
+    assert runtime.containers[container_id]["name"] == "agent-a"
+    assert pool.activations == 1
+    await pool.stop()
+
+
+async def test_failed_activation_discards_the_container():
+    runtime = FakeRuntime()
+    pool = await start_pool(runtime, pooled_runtime([], fail=True), size=1)
+    entry = pool.ready[0]
+    assert await pool.activate("a", "class Agent: pass", {}) is None
+    assert entry["container_id"] not in runtime.containers
+    assert entry["port"] in pool.free_ports
+    assert pool.activation_failures == 1
+    await pool.stop()
+
+
+async def test_empty_pool_reports_a_miss():
+    pool = WarmPool(FakeRuntime(), base_image, [(9800, 9800)], size=0)
+    await pool.start()
+    assert await pool.activate("a", "", {}) is None
+    assert pool.stats()["empty"] == 1
+    await pool.stop()
+
+
+async def test_failed_boots_back_off():
+    broken = True
+
+    async def image():
+        if broken:
+            raise RuntimeError("docker not reachable")
+        return "novix-base:test"
+
+    pool = WarmPool(
+        FakeRuntime(),
+        image,
+        [(9800, 9800)],
+        size=1,
+        retry_delay=0.001,
+        max_retry_delay=0.004,
+    )
+    await pool.start()
+    while pool.boot_failures < 4:
+        await asyncio.sleep(0.001)
+    assert pool._retry_delay() == 0.004
+    assert pool.stats()["boot_failures"] >= 4
+
+    await pool._client.aclose()
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(pooled_runtime([])))
+    broken = False
+    while not pool.ready:
+        await asyncio.sleep(0.001)
+    assert pool.boot_failures == 0
+    await pool.stop()
@@ -0,0 +1,75 @@
+import pytest
+
+from agent_framework import ws_protocol
+
+msgpack = pytest.importorskip("msgpack")
+
+AGENT = """
+import asyncio
+
+class Agent:
+    async def stream(self, query):
+        if query == "json":
+            for word in ("a", "b"):
+                yield {"content": word, "metadata": {"agent": "demo", "timestamp": word}}
+            return
+        if query == "forever":
+            await asyncio.sleep(60)
+        if query == "slow":
+            await asyncio.sleep(0.2)
+        yield f"{query}:"
+        yield "done"
+"""
+
+
+def frames(ws, count):
+    return [msgpack.unpackb(ws.receive_bytes()) for _ in range(count)]
+
+
+def send(ws, **message):
+    ws.send_bytes(msgpack.packb(message))
+
+
+def test_negotiate_prefers_the_clients_order():
+    assert ws_protocol.negotiate(["x", ws_protocol.TEXT]) == ws_protocol.TEXT
+    assert ws_protocol.negotiate([ws_protocol.MSGPACK]) == ws_protocol.MSGPACK
+    assert ws_protocol.negotiate(["x"]) is None
+
+
+def test_text_protocol(start_agent):
+    client = start_agent(AGENT)
+    with client.websocket_connect("/stream") as ws:
+        ws.send_text("hi")
+        assert [ws.receive_text() for _ in range(3)] == ["hi:", "done", "[DONE]"]
+
+
+def test_msgpack_frames(start_agent):
+    client = start_agent(AGENT)
+    with client.websocket_connect("/stream", subprotocols=[ws_protocol.MSGPACK]) as ws:
+        send(ws, type="query", id="r1", query="json")
+        start, meta, first, second, end = frames(ws, 5)
+        assert start == {"t": "start", "id": "r1"}
+        # Metadata crosses the wire once; per-chunk timestamps don't resend it
+        assert meta["t"] == "meta" and meta["m"]["metadata"]["agent"] == "demo"
+        assert (first["d"], second["d"]) == ("a", "b")
+        assert end["t"] == "end" and end["stats"]["chunks"] == 2
+
+
+def test_msgpack_cancel(start_agent):
+    client = start_agent(AGENT)
+    with client.websocket_connect("/stream", subprotocols=[ws_protocol.MSGPACK]) as ws:
+        send(ws, type="query", id="r1", query="forever")
+        assert frames(ws, 1) == [{"t": "start", "id": "r1"}]
+        send(ws, type="cancel", id="r1")
+        assert frames(ws, 1) == [{"t": "cancelled", "id": "r1"}]
+
+
+def test_unkeyed_multiplexed_queries_run_concurrently(start_agent):
+    client = start_agent(AGENT)
+    with client.websocket_connect("/stream", subprotocols=[ws_protocol.MSGPACK]) as ws:
+        send(ws, type="query", id="r1", query="slow")
+        send(ws, type="query", id="r2", query="slow")
+        received = frames(ws, 8)
+        # Both start before either finishes: no conversation key, no shared lock
+        assert [f["id"] for f in received[:2]] == ["r1", "r2"]
+        assert [f["t"] for f in received].count("end") == 2
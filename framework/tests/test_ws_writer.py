@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from agent_framework.ws_writer import FrameWriter, SlowConsumer
+
+pytestmark = pytest.mark.anyio
+
+
+async def write_all(writer, chunks, gap=0.002):
+    for chunk in chunks:
+        await writer.write(chunk)
+        await asyncio.sleep(gap)
+    await writer.flush()
+    await writer.close()
+
+
+@pytest.mark.parametrize(
+    "options, frames",
+    [
+        ({}, ["0a", "1a", "2a", "3a"]),
+        ({"flush_interval": 0.05}, ["0a1a2a3a"]),
+        ({"max_frame_bytes": 4, "flush_interval": 0.05}, ["0a1a", "2a3a"]),
+    ],
+)
+async def test_coalescing(options, frames):
+    sent = []
+
+    async def send(text):
+        sent.append(text)
+
+    writer = FrameWriter(send, **options)
+    await write_all(writer, [f"{i}a" for i in range(4)])
+    assert sent == frames
+    assert writer.frames == len(frames)
+
+
+async def test_frame_size_alone_merges_what_is_already_queued():
+    sent = []
+    release = asyncio.Event()
+
+    async def send(text):
+        sent.append(text)
+        await release.wait()
+
+    writer = FrameWriter(send, max_frame_bytes=4)
+    await writer.write("0a")
+    await asyncio.sleep(0)
+    for chunk in ("1a", "2a", "3a"):
+        await writer.write(chunk)
+    release.set()
+    await writer.flush()
+    await writer.close()
+    assert sent == ["0a", "1a2a", "3a"]
+
+
+async def test_drop_policy_discards_the_oldest_chunks():
+    sent = []
+    release = asyncio.Event()
+
+    async def send(text):
+        await release.wait()
+        sent.append(text)
+
+    writer = FrameWriter(send, max_buffer_bytes=4, policy="drop")
+    await writer.write("aa")
+    await asyncio.sleep(0)
+    for chunk in ("bb", "cc", "dd"):
+        await writer.write(chunk)
+    release.set()
+    await writer.flush()
+    await writer.close()
+    assert sent == ["aa", "cc", "dd"]
+    assert writer.dropped == 1
+
+
+async def test_disconnect_policy_raises_for_a_slow_client():
+    async def send(text):
+        await asyncio.sleep(1)
+
+    writer = FrameWriter(send, max_buffer_bytes=4, policy="disconnect")
+    await writer.write("aa")
+    await asyncio.sleep(0)
+    await writer.write("bb")
+    await writer.write("cc")
+    with pytest.raises(SlowConsumer):
+        await writer.write("dd")
+    await writer.close()
+
+
+async def test_send_errors_surface_on_flush():
+    async def send(text):
+        raise ConnectionError("gone")
+
+    writer = FrameWriter(send)
+    await writer.write("aa")
+    with pytest.raises(ConnectionError):
+        await writer.flush()
+    await writer.close()
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import secrets
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from container_runtime import ContainerNotFound, ContainerRuntime
+
+logger = logging.getLogger(__name__)
+
+POOL_CONTAINER_PREFIX = "novix-pool-"
+
+
+class WarmPool:
+    """Pre-booted generic runtime containers waiting to be handed an agent.
+
+    Each pooled container runs the base image's server.py in pool mode: python,
+    the base requirements and the framework are already imported, so
+    activating an agent whose requirements are covered by the base image only
+    costs importing agent.py. Taken containers are replaced in the background;
+    after failed boots (no Docker, a broken base image) the next attempt
+    waits twice as long, up to ``max_retry_delay``.
+    """
+
+    def __init__(
+        self,
+        runtime: ContainerRuntime,
+        image: Callable[[], Awaitable[str]],
+        ports: List[Tuple[int, int]],
+        host: str = "localhost",
+        size: int = 2,
+        boot_timeout: float = 60.0,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0,
+    ):
+        self.runtime = runtime
+        self.image = image
+        self.host = host
+        self.size = size
+        self.boot_timeout = boot_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.ranges = ports
+        self.free_ports: deque = deque(
+            port for start, end in ports for port in range(start, end + 1)
+        )
+        self.ready: deque = deque()
+        self.booting = 0
+        self.boot_failures = 0
+        self.activations = 0
+        self.activation_failures = 0
+        self.empty = 0
+        self.activation_times: deque = deque(maxlen=200)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def start(self, in_use: Iterable[int] = ()):
+        """Boot the pool; ports in ``in_use`` belong to activated agents"""
+        in_use = set(in_use)
+        self.free_ports = deque(port for port in self.free_ports if port not in in_use)
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=2.0))
+        # Pool containers left over from a previous run hold pool ports
+        removed = await self.runtime.remove_containers(POOL_CONTAINER_PREFIX)
+        if removed:
+            logger.info(f"Removed {removed} stale pool containers")
+        self.refill()
+
+    async def stop(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+        while self.ready:
+            entry = self.ready.popleft()
+            await self._discard(entry)
+        if self._client:
+            await self._client.aclose()
+
+    def owns(self, port: int) -> bool:
+        return any(start <= port <= end for start, end in self.ranges)
+
+    def reclaim(self, port: Optional[int]):
+        """Return the port of a stopped, previously pooled agent"""
+        if port is not None and self.owns(port) and port not in self.free_ports:
+            self.free_ports.append(port)
+            self.refill()
+
+    def refill(self):
+        if self.size and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def activate(
+        self, agent_id: str, source: str, env: Dict[str, str]
+    ) -> Optional[Tuple[str, int]]:
+        """Load the agent into a pooled container; None if none is ready"""
+        if not self.ready:
+            self.empty += 1
+            self.refill()
+            return None
+
+        entry = self.ready.popleft()
+        self.refill()
+        started = time.monotonic()
+        try:
+            response = await self._client.post(
+                f"http://{self.host}:{entry['port']}/_activate",
+                json={"source": source, "env": env},
+                headers={"X-Novix-Activation-Token": entry["token"]},
+            )
+            response.raise_for_status()
+            await self.runtime.rename(entry["container_id"], f"agent-{agent_id}")
+        except Exception as e:
+            self.activation_failures += 1
+            logger.error(f"Pooled activation failed for agent {agent_id}: {str(e)}")
+            await self._discard(entry)
+            return None
+
+        elapsed = time.monotonic() - started
+        self.activations += 1
+        self.activation_times.append(elapsed)
+        logger.info(
+            f"Activated agent {agent_id} in pooled container on port {entry['port']} "
+            f"in {elapsed * 1000:.0f}ms"
+        )
+        return entry["container_id"], entry["port"]
+
+    def stats(self) -> Dict:
+        times = self.activation_times
+        return {
+            "size": self.size,
+            "ready": len(self.ready),
+            "booting": self.booting,
+            "boot_failures": self.boot_failures,
+            "free_ports": len(self.free_ports),
+            "activations": self.activations,
+            "activation_failures": self.activation_failures,
+            "empty": self.empty,
+            "activation_avg_ms": (sum(times) / len(times) * 1000 if times else None),
+        }
+
+    async def _refill(self):
+        while len(self.ready) + self.booting < self.size and self.free_ports:
+            self.booting += 1
+            try:
+                entry = await self._boot()
+                self.ready.append(entry)
+                self.boot_failures = 0
+            except Exception as e:
+                self.boot_failures += 1
+                delay = self._retry_delay()
+                logger.error(
+                    f"Error booting pool container, retrying in {delay:.0f}s: {str(e)}"
+                )
+                await asyncio.sleep(delay)
+            finally:
+                self.booting -= 1
+
+    def _retry_delay(self) -> float:
+        """Seconds to wait after the current run of consecutive boot failures"""
+        exponent = min(self.boot_failures - 1, 32)
+        return min(self.retry_delay * 2**exponent, self.max_retry_delay)
+
+    async def _boot(self) -> Dict:
+        image = await self.image()
+        port = self.free_ports.popleft()
+        token = secrets.token_urlsafe(32)
+        try:
+            container_id = await self.runtime.run(
+                image,
+                name=f"{POOL_CONTAINER_PREFIX}{uuid.uuid4().hex[:12]}",
+                ports={"8000/tcp": port},
+                environment={
+                    "NOVIX_POOL_MODE": "1",
+                    "NOVIX_ACTIVATION_TOKEN": token,
+                },
+            )
+        except Exception:
+            self.free_ports.append(port)
+            raise
+
+        entry = {"container_id": container_id, "port": port, "token": token}
+        deadline = time.monotonic() + self.boot_timeout
+        while time.monotonic() < deadline:
+            try:
+                response = await self._client.get(
+                    f"http://{self.host}:{port}/health", timeout=2.0
+                )
+                if response.json().get("status") == "pooled":
+                    return entry
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.25)
+
+        await self._discard(entry)
+        raise TimeoutError(f"Pool container on port {port} did not boot")
+
+    async def _discard(self, entry: Dict):
+        try:
+            await self.runtime.stop(entry["container_id"], timeout=1)
+        except ContainerNotFound:
+            pass
+        except Exception as e:
+            logger.error(f"Error removing pool container: {str(e)}")
+        self.free_ports.append(entry["port"])